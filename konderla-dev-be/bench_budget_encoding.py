@@ -0,0 +1,113 @@
+"""
+Benchmark serializace odpovědi `GET /rounds/{round_id}/budgets/` na syntetickém kole.
+
+Porovnává původní cestu (pydantic validace `schemas.Budget` + jsonable_encoder +
+json.dumps) s rychlou cestou (`fast_json.budgets_to_list` + orjson) a velikost
+odpovědi po kompresi. Nepotřebuje databázi.
+
+Spuštění:  python bench_budget_encoding.py [--roots 12] [--items 2000] [--children 6]
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import fast_json
+import schemas
+
+
+def _synthetic_items(n: int, rnd: random.Random) -> List[dict]:
+    items = []
+    for i in range(n):
+        items.append({
+            "number": f"{i // 50 + 1}.{i % 50 + 1}",
+            "name": f"Položka rozpočtu č. {i} – beton C 25/30, výztuž B500B",
+            "unit": rnd.choice(["m3", "m2", "kg", "ks", "kpl"]),
+            "quantity": round(rnd.uniform(1, 500), 3),
+            "unit_price": round(rnd.uniform(10, 5000), 2),
+            "price": round(rnd.uniform(100, 2_000_000), 2),
+            "is_section_header": i % 50 == 0,
+        })
+    return items
+
+
+def build_round(roots: int, items: int, children: int, seed: int = 1) -> List[SimpleNamespace]:
+    rnd = random.Random(seed)
+    round_id, project_id = uuid.uuid4(), uuid.uuid4()
+    budgets = []
+    for r in range(roots):
+        root_id = uuid.uuid4()
+        common = dict(
+            round_id=round_id, project_id=project_id, notes=None, score=None,
+            file_path=f"uploads/firma_{r}.xlsx", client_name=f"Stavební firma {r}",
+            client_project_name="Bytový dům A", dynamic_fields={},
+        )
+        budgets.append(SimpleNamespace(
+            id=root_id, parent_budget_id=None, name=f"Rozpočet {r}",
+            labels={"type": "type3", "is_parent": True, "total_price": 1.0},
+            items=_synthetic_items(items, rnd), **common,
+        ))
+        for c in range(children):
+            budgets.append(SimpleNamespace(
+                id=uuid.uuid4(), parent_budget_id=root_id, name=f"SO 10{c}",
+                labels={"type": "type3", "is_child": True, "code": str(c + 1)},
+                items=_synthetic_items(items // 2, rnd), **common,
+            ))
+    return budgets
+
+
+def encode_before(budgets) -> bytes:
+    adapter = TypeAdapter(List[schemas.Budget])
+    validated = adapter.validate_python(budgets, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_after(budgets) -> bytes:
+    return fast_json.dumps(fast_json.budgets_to_list(budgets))
+
+
+def _best_of(fn, budgets, repeat: int):
+    best, out = float("inf"), b""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(budgets)
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roots", type=int, default=12)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--children", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    budgets = build_round(args.roots, args.items, args.children)
+    n_items = sum(len(b.items) for b in budgets)
+    print(f"Kolo: {len(budgets)} rozpočtů, {n_items} položek")
+
+    t_before, body_before = _best_of(encode_before, budgets, args.repeat)
+    t_after, body_after = _best_of(encode_after, budgets, args.repeat)
+    print(f"před (pydantic + json):  {t_before * 1000:8.1f} ms, {len(body_before) / 1e6:6.2f} MB")
+    print(f"po   (dict + orjson):    {t_after * 1000:8.1f} ms, {len(body_after) / 1e6:6.2f} MB")
+    print(f"zrychlení: {t_before / t_after:.1f}x")
+
+    t0 = time.perf_counter()
+    gz = gzip.compress(body_after, compresslevel=6)
+    print(f"gzip-6:    {(time.perf_counter() - t0) * 1000:8.1f} ms, {len(gz) / 1e6:6.2f} MB")
+    if fast_json.brotli is not None:
+        t0 = time.perf_counter()
+        br = fast_json.brotli.compress(body_after, quality=4)
+        print(f"brotli-4:  {(time.perf_counter() - t0) * 1000:8.1f} ms, {len(br) / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark detekce duplicitních názvů položek (`duplicates.detect_matches`) na
+syntetických názvech stavebních položek – sériově a na process poolu.
+Shodu s porovnáním všech dvojic hlídá tests/test_duplicates.py.
+Nepotřebuje databázi.
+
+Spuštění:  python bench_duplicates.py [--names 2000] [--skip-serial] [--workers 4] [--time-budget 1.5]
+"""
+import argparse
+import random
+import time
+from typing import List
+
+import duplicates
+
+_WORDS = [
+    "beton", "železobeton", "výztuž", "bednění", "zdivo", "omítka", "vápenocementová",
+    "sádrová", "izolace", "tepelná", "hydroizolace", "potěr", "anhydritový", "dlažba",
+    "keramická", "obklad", "nátěr", "penetrace", "lešení", "montáž", "demontáž", "dodávka",
+    "osazení", "vybourání", "odvoz", "suti", "příčky", "stropní", "deska", "základová",
+    "pas", "sloup", "průvlak", "schodiště", "okna", "dveře", "parapet", "klempířské",
+    "konstrukce", "truhlářské", "zámečnické", "podlahy", "povlakové", "malby", "C 25/30",
+    "C 30/37", "B500B", "tl. 150 mm", "tl. 200 mm", "XPS", "EPS", "minerální vata",
+]
+
+
+def synthetic_names(n: int, seed: int = 1) -> List[str]:
+    rnd = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        name = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(2, 7)))
+        roll = rnd.random()
+        if roll < 0.1:
+            name = name.upper()
+        elif roll < 0.25:
+            # Překlep / drobná odchylka jako u názvů od různých firem
+            pos = rnd.randrange(len(name))
+            name = name[:pos] + rnd.choice("aeiouy ") + name[pos + 1:]
+        names.add(name.strip())
+    return sorted(names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--names", type=int, default=2000)
+    parser.add_argument("--skip-serial", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="velikost process poolu (výchozí DUPLICATES_WORKERS)")
+    parser.add_argument("--time-budget", type=float, default=None, help="časový limit v sekundách")
+    args = parser.parse_args()
+
+    names = synthetic_names(args.names)
+    print(f"Názvů: {len(names)}, dvojic: {len(names) * (len(names) - 1) // 2}")
+
+    t0 = time.perf_counter()
+    fast, complete = duplicates.detect_matches(names, time_budget=args.time_budget, workers=args.workers)
+    t_fast = time.perf_counter() - t0
+    print(f"blocking:        {t_fast * 1000:10.1f} ms, shod: {len(fast)}" + ("" if complete else " (neúplné)"))
+
+    if not args.skip_serial:
+        t0 = time.perf_counter()
+        serial, _ = duplicates.detect_matches(names, workers=0)
+        t_serial = time.perf_counter() - t0
+        print(f"sériově:         {t_serial * 1000:10.1f} ms, shod: {len(serial)}")
+        print(f"zrychlení: {t_serial / t_fast:.1f}x, shodné výsledky: {fast == serial}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark vykreslení grafů pro PDF export kola (`pdf_export.render_budget_charts`):
+sériově vs. na process poolu, na syntetických rozpočtech. Ověřuje i to, že oba
+způsoby vrací stejné řádky grafů ve stejném pořadí a stejné obrázky.
+Nepotřebuje databázi.
+
+Spuštění:  python bench_pdf_charts.py [--budgets 10] [--items 300] [--workers 4]
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pdf_export
+
+_WORDS = [
+    "beton", "výztuž", "bednění", "zdivo", "omítka", "izolace", "hydroizolace", "potěr",
+    "dlažba", "obklad", "nátěr", "lešení", "montáž", "dodávka", "osazení", "odvoz",
+    "příčky", "stropní deska", "základová deska", "schodiště", "okna", "dveře",
+]
+
+
+def synthetic_budgets(n: int, items: int, seed: int = 1) -> List[SimpleNamespace]:
+    rnd = random.Random(seed)
+    budgets = []
+    for idx in range(n):
+        rows = [
+            {"number": str(k + 1), "name": f"{rnd.choice(_WORDS)} {rnd.choice(_WORDS)}",
+             "price": f"{rnd.uniform(1000, 2_000_000):.2f}"}
+            for k in range(items)
+        ]
+        budgets.append(SimpleNamespace(name=f"rozpocet_{idx + 1}.xlsx", client_name=f"Firma {idx + 1}",
+                                       labels=None, items=rows))
+    return budgets
+
+
+def _jobs(budgets: List[SimpleNamespace], out_dir: str, color_map) -> List[tuple]:
+    return [
+        (b, pdf_export._budget_chart_title(b),
+         os.path.join(out_dir, f"chart_{idx}_pie.png"), os.path.join(out_dir, f"chart_{idx}_bar.png"), color_map)
+        for idx, b in enumerate(budgets)
+    ]
+
+
+def _digests(rows) -> List[List[str]]:
+    result = []
+    for row in rows:
+        digests = []
+        for path, _title in row:
+            with open(path, "rb") as f:
+                digests.append(hashlib.sha256(f.read()).hexdigest())
+        result.append(digests)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budgets", type=int, default=10)
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=None, help="velikost process poolu (výchozí PDF_CHART_WORKERS)")
+    args = parser.parse_args()
+    workers = pdf_export.PDF_CHART_WORKERS if args.workers is None else args.workers
+
+    budgets = synthetic_budgets(args.budgets, args.items)
+    color_map = pdf_export._build_label_color_map(_WORDS)
+    print(f"Rozpočtů: {len(budgets)}, položek na rozpočet: {args.items}, workerů: {workers}")
+
+    with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as pool_dir:
+        t0 = time.perf_counter()
+        serial = pdf_export.render_budget_charts(_jobs(budgets, serial_dir, color_map), workers=0)
+        t_serial = time.perf_counter() - t0
+        print(f"sériově:  {t_serial * 1000:10.1f} ms")
+
+        # První volání poolu zahrnuje start procesů (spawn + import matplotlib)
+        for label in ("pool (start)", "pool"):
+            t0 = time.perf_counter()
+            pooled = pdf_export.render_budget_charts(_jobs(budgets, pool_dir, color_map), workers=workers)
+            t_pool = time.perf_counter() - t0
+            print(f"{label + ':':<14}{t_pool * 1000:10.1f} ms")
+        print(f"zrychlení: {t_serial / t_pool:.1f}x, "
+              f"shodné řádky: {[[t for _, t in r] for r in serial] == [[t for _, t in r] for r in pooled]}, "
+              f"shodné obrázky: {_digests(serial) == _digests(pooled)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Práce se seznamem položek rozpočtu (budget.items) mimo ORM: normalizace
+uloženého JSONu, výpočet celkové ceny, hromadné slučování položek podle názvu
+a dílčí úpravy položek (PATCH).
+"""
+import bisect
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def normalize_items(raw_items: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Jediná pravidla čtení uloženého budget.items – používá je API, PDF export, chat
+    i detekce duplicit. Vrátí položky jako list dictů. Zvládá obal {"list": [...]}
+    (stejně jako getBudgetItemsSafe na frontendu), dvojitě serializovaný JSON, jeden
+    dict místo listu i položky uložené jako JSON řetězce. None = data nejsou čitelná
+    a rozpočet se nesmí přepsat (hrozila by ztráta dat).
+    """
+    raw_items = raw_items or []
+    if isinstance(raw_items, str):
+        try:
+            raw_items = json.loads(raw_items)
+        except ValueError:
+            return None
+    if isinstance(raw_items, dict):
+        raw_items = raw_items["list"] if isinstance(raw_items.get("list"), list) else [raw_items]
+    if not isinstance(raw_items, list):
+        return None if raw_items else []
+
+    items = []
+    for item in raw_items:
+        if isinstance(item, dict):
+            items.append(item)
+        elif isinstance(item, str):
+            try:
+                parsed = json.loads(item)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                items.append(parsed)
+    return items
+
+
+def with_stored_shape(raw_items: Any, items: List[Dict[str, Any]]) -> Any:
+    """
+    Hodnota pro zápis upravených položek zpět do budget.items: obal {"list": [...]}
+    se zachová (i s ostatními klíči), jinak list. Dvojitě serializovaný JSON se
+    ukládá jako obyčejný list – ten čtou všichni.
+    """
+    if isinstance(raw_items, dict) and isinstance(raw_items.get("list"), list):
+        return {**raw_items, "list": items}
+    return items
+
+
+def item_names(raw_items: Any) -> set:
+    """Názvy položek (strip) jednoho rozpočtu – stejná pravidla jako detekce duplicit."""
+    return {
+        item["name"].strip()
+        for item in normalize_items(raw_items) or []
+        if item.get("name") and isinstance(item["name"], str)
+    }
+
+
+def compute_budget_total_price(items, include_subsections: bool = False) -> float:
+    if not isinstance(items, list):
+        return 0.0
+
+    def _as_float(v) -> float:
+        try:
+            return float(v or 0)
+        except Exception:
+            return 0.0
+
+    dict_items = [it for it in items if isinstance(it, dict)]
+    if include_subsections:
+        # Requested behavior for some Type2 files: count parent + subsection rows together.
+        base = dict_items
+    else:
+        section_items = [it for it in dict_items if it.get("is_section_header") is True]
+        base = section_items if section_items else dict_items
+    total = sum(_as_float(it.get("price")) for it in base)
+    if total != total or total in (float("inf"), float("-inf")):
+        return 0.0
+    return round(total, 2)
+
+
+def _price(item: Dict[str, Any]) -> float:
+    try:
+        return float(item.get("price") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _name_key(item: Dict[str, Any]) -> Any:
+    name = item.get("name")
+    return name if isinstance(name, (str, int, float, type(None))) else repr(name)
+
+
+def _price_by_name(items: Sequence[Dict[str, Any]]) -> Dict[Any, float]:
+    totals: Dict[Any, float] = defaultdict(float)
+    for item in items:
+        totals[_name_key(item)] += _price(item)
+    return totals
+
+
+def apply_merge_operations(items: List[Dict[str, Any]], operations: Sequence[Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Provede slučovací operace (source_name, target_name, new_name) postupně nad
+    jedním rozpočtem – se stejným výsledkem, jako kdyby se volaly jedna po druhé:
+      - všechny položky `source_name` se odstraní a jejich cena se přičte k první
+        zbývající položce `target_name` (případně přejmenované na `new_name`),
+      - když cíl neexistuje, vznikne nová položka z první zdrojové (na konci seznamu),
+      - když zdroj neexistuje, jen se přejmenuje první položka `target_name`.
+    Místo opakovaného procházení seznamu drží index název -> pozice, takže jde
+    o jeden průchod položkami bez ohledu na počet operací.
+    Vrací (nové položky, statistika pro každou operaci).
+    """
+    slots: List[Optional[Dict[str, Any]]] = [dict(item) for item in items]
+    positions: Dict[Any, List[int]] = defaultdict(list)
+    for idx, item in enumerate(slots):
+        positions[_name_key(item)].append(idx)
+
+    def move(idx: int, old_name: Any, new_name: Any) -> None:
+        positions[old_name].remove(idx)
+        bisect.insort(positions[new_name], idx)
+        slots[idx]["name"] = new_name
+
+    op_stats = []
+    for op in operations:
+        source_name, target_name, new_name = op.source_name, op.target_name, op.new_name
+        stats = {"items_merged": 0, "price_moved": 0.0, "renamed": 0, "created": 0}
+        source_positions = positions.pop(source_name, [])
+
+        if source_positions:
+            source_items = [slots[idx] for idx in source_positions]
+            total_source_price = sum((_price(i) for i in source_items), 0.0)
+            for idx in source_positions:
+                slots[idx] = None
+            stats["items_merged"] = len(source_items)
+            stats["price_moved"] = total_source_price
+
+            target_positions = positions.get(target_name)
+            if target_positions:
+                idx = target_positions[0]
+                slots[idx]["price"] = _price(slots[idx]) + total_source_price
+                if new_name and new_name != target_name:
+                    move(idx, target_name, new_name)
+                    stats["renamed"] = 1
+            else:
+                base_item = dict(source_items[0])
+                base_item["price"] = total_source_price
+                base_item["name"] = new_name if new_name else target_name
+                slots.append(base_item)
+                positions[base_item["name"]].append(len(slots) - 1)
+                stats["created"] = 1
+        elif target_name:
+            target_positions = positions.get(target_name)
+            if target_positions and new_name and new_name != target_name:
+                move(target_positions[0], target_name, new_name)
+                stats["renamed"] = 1
+        op_stats.append(stats)
+
+    return [item for item in slots if item is not None], op_stats
+
+
+def price_deltas(before: Sequence[Dict[str, Any]], after: Sequence[Dict[str, Any]]) -> Dict[str, float]:
+    """Změna součtu cen podle názvu položky (jen nenulové rozdíly)."""
+    price_before, price_after = _price_by_name(before), _price_by_name(after)
+    deltas = {}
+    for name in set(price_before) | set(price_after):
+        delta = price_after.get(name, 0.0) - price_before.get(name, 0.0)
+        if abs(delta) > 1e-9:
+            deltas["" if name is None else str(name)] = delta
+    return deltas
+
+
+# --- Dílčí úpravy položek (PATCH /budgets/{budget_id}/items) ---
+
+class ItemPatchError(ValueError):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, expected: int, actual: int):
+        super().__init__(f"Budget version mismatch: expected {expected}, current {actual}")
+        self.expected = expected
+        self.actual = actual
+
+
+def _is_section_header(item: Any) -> bool:
+    return isinstance(item, dict) and item.get("is_section_header") is True
+
+
+def _locate(items: List[Any], op: Any) -> int:
+    if op.index is not None:
+        if not 0 <= op.index < len(items):
+            raise ItemPatchError(f"Item index {op.index} out of range (0..{len(items) - 1})")
+        return op.index
+    if op.number is not None:
+        number = str(op.number).strip()
+        for idx, item in enumerate(items):
+            if isinstance(item, dict) and str(item.get("number") or "").strip() == number:
+                return idx
+        raise ItemPatchError(f"Item with number '{op.number}' not found")
+    raise ItemPatchError(f"Operation '{op.op}' needs 'index' or 'number'")
+
+
+def apply_item_operations(items: List[Any], operations: Sequence[Any],
+                          include_subsections: bool = False) -> Tuple[List[Any], Optional[float]]:
+    """
+    Aplikuje operace set_price / rename / insert / delete (cíl podle pozice `index`
+    nebo čísla položky `number`) na kopii seznamu. Chyba v kterékoliv operaci
+    = ItemPatchError a nic se nemění.
+
+    Vrací (nové položky, změna celkové ceny). Změna se počítá přírůstkově podle
+    stejných pravidel jako compute_budget_total_price (sekční hlavičky, nebo vše).
+    None = změnil se základ výpočtu (přibyla první / zmizela poslední sekční
+    hlavička) a celkovou cenu je potřeba přepočítat celou.
+    """
+    items = list(items)
+    had_headers = any(_is_section_header(it) for it in items)
+
+    def counted_price(item: Any) -> float:
+        if not isinstance(item, dict):
+            return 0.0
+        if include_subsections or not had_headers or _is_section_header(item):
+            return _price(item)
+        return 0.0
+
+    delta = 0.0
+    for op in operations:
+        if op.op == "insert":
+            if not isinstance(op.item, dict):
+                raise ItemPatchError("Operation 'insert' needs 'item'")
+            position = len(items) if op.index is None else op.index
+            if not 0 <= position <= len(items):
+                raise ItemPatchError(f"Insert position {position} out of range (0..{len(items)})")
+            new_item = dict(op.item)
+            items.insert(position, new_item)
+            delta += counted_price(new_item)
+            continue
+
+        idx = _locate(items, op)
+        old_item = items[idx]
+        if op.op == "delete":
+            del items[idx]
+            delta -= counted_price(old_item)
+        elif op.op == "set_price":
+            if op.price is None:
+                raise ItemPatchError("Operation 'set_price' needs 'price'")
+            new_item = dict(old_item)
+            new_item["price"] = op.price
+            items[idx] = new_item
+            delta += counted_price(new_item) - counted_price(old_item)
+        elif op.op == "rename":
+            if op.name is None:
+                raise ItemPatchError("Operation 'rename' needs 'name'")
+            items[idx] = {**old_item, "name": op.name}
+        else:
+            raise ItemPatchError(f"Unknown operation '{op.op}'")
+
+    if not include_subsections and had_headers != any(_is_section_header(it) for it in items):
+        return items, None
+    return items, delta
@@ -0,0 +1,153 @@
+"""
+Diskový cache vykreslených grafů PDF exportu (content-addressed).
+
+Klíč je SHA-256 všech vstupů grafu – řádky, které graf kreslí, titulek, barvy
+použitých labelů, celková cena a nastavení vykreslování (DPI, rozměr, fonty, verze
+kódu grafů) – takže stejný graf z opakovaného exportu kola nebo z povýšeného rozpočtu
+v jiném kole se kreslí jen jednou. Soubory leží v PDF_CHART_CACHE_DIR; při překročení
+PDF_CHART_CACHE_MAX_BYTES se mažou nejdéle nepoužité (podle mtime, který se při
+každém zásahu obnoví – platí tedy i mezi více procesy serveru).
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+_DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_SUFFIX = ".png"
+
+
+def make_key(material: Dict[str, Any]) -> str:
+    """SHA-256 kanonického JSONu vstupů grafu."""
+    canonical = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    def __init__(self, directory: str, max_bytes: int = _DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes: Optional[int] = None  # odhad velikosti; None = ještě nespočítáno z disku
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key: str) -> Optional[str]:
+        """Cesta k uloženému grafu, nebo None. Zásah obnoví mtime (LRU)."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def copy_to(self, key: str, target_path: str) -> bool:
+        """Zkopíruje uložený graf na `target_path`; False = v cache není."""
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, target_path)
+            return True
+        except OSError:
+            # Mezitím vyhozený jiným procesem
+            return False
+
+    def put(self, key: str, source_path: str) -> None:
+        """Uloží vykreslený graf (kopie přes dočasný soubor a atomický rename)."""
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+            shutil.copyfile(source_path, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"[ChartCache] Could not store chart {key}: {e}")
+            return
+        with self._lock:
+            self.stores += 1
+            if self._bytes is None:
+                self._bytes = self._disk_usage()
+            else:
+                self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(_SUFFIX):
+                        stat = entry.stat()
+                        yield entry.path, stat.st_size, stat.st_mtime
+        except FileNotFoundError:
+            return
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self) -> None:
+        # Disk je zdroj pravdy (cache může sdílet víc procesů) – přepočítat a mazat od nejstarších
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._entries())
+            lookups = self.hits + self.misses
+            return {
+                "directory": self.directory,
+                "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+cache = ChartCache(
+    os.getenv("PDF_CHART_CACHE_DIR", os.path.join("uploads", "chart_cache")),
+    max_bytes=int(os.getenv("PDF_CHART_CACHE_MAX_BYTES", str(_DEFAULT_MAX_BYTES))),
+)
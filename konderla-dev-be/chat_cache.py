@@ -0,0 +1,91 @@
+"""
+Cache odpovědí chatu na opakované otázky nad nezměněnými daty.
+
+Prompt obsahuje jen data projektu a otázku (ne historii session), takže stejná otázka
+nad stejnou revizí projektu dostane od modelu v podstatě stejnou odpověď. Klíč je
+(project_id, revize projektu, normalizovaná otázka) – jakýkoliv zápis rozpočtu zvýší
+revizi projektu (crud.touch_round / touch_project) a staré odpovědi už nikdo nepřečte.
+Záznamy navíc stárnou (CHAT_ANSWER_CACHE_TTL) a při plné cache se vyhazují nejdéle
+nepoužité (CHAT_ANSWER_CACHE_SIZE). Chybové a zablokované odpovědi se neukládají.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+from uuid import UUID
+
+from item_catalog import fold_text
+
+DEFAULT_TTL = float(os.getenv("CHAT_ANSWER_CACHE_TTL", "3600"))
+DEFAULT_SIZE = int(os.getenv("CHAT_ANSWER_CACHE_SIZE", "512"))
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Bez diakritiky, casefold, sloučené mezery, bez interpunkce na konci."""
+    return _TRAILING_PUNCTUATION.sub("", " ".join(fold_text(question).split()))
+
+
+def make_key(project_id: UUID, revision: int, question: str) -> Tuple[Hashable, ...]:
+    return (project_id, revision, normalize_question(question))
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = DEFAULT_SIZE, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            answer, stored_at = entry
+            if now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def set(self, key: Tuple[Hashable, ...], answer: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+cache = AnswerCache()
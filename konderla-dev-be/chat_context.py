@@ -0,0 +1,159 @@
+"""
+Kontext projektu pro chat (data do promptu Gemini).
+
+Dřív se do promptu vkládal celý JSON položek každého rozpočtu, takže velikost promptu
+(a s ní latence i cena odpovědi) rostla s počtem položek. Tady se místo toho pro každý
+rozpočet posílá souhrn: celková cena (stejně jako řádek CELKOVÁ CENA), počet položek,
+rozpad podle sekcí a N nejdražších položek. Když by text i tak přesáhl limit znaků,
+postupně se ubírají položky a sekce (a v krajním případě se text zkrátí).
+
+Kontext se sestaví jednou pro revizi projektu a drží se v round_cache; spolu s textem
+se ukládá i report velikosti (znaky, odhad tokenů, kolik položek se do textu dostalo).
+"""
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+import crud
+import fast_json
+from pdf_export import (
+    _budget_display_name,
+    _format_kc_space,
+    _get_budget_items_fe,
+    _parse_price_fe,
+    budget_total_round_celek_row,
+)
+from round_cache import cache as round_cache
+
+TOP_ITEMS = int(os.getenv("CHAT_CONTEXT_TOP_ITEMS", "10"))
+MAX_SECTIONS = int(os.getenv("CHAT_CONTEXT_MAX_SECTIONS", "15"))
+MAX_CHARS = int(os.getenv("CHAT_CONTEXT_MAX_CHARS", "60000"))
+# Hrubý odhad pro report – přesný počet tokenů závisí na tokenizeru modelu
+CHARS_PER_TOKEN = 4
+
+_TRUNCATED_NOTE = "\n… (kontext zkrácen na limit velikosti)\n"
+
+
+def _kc(value: float) -> str:
+    return f"{_format_kc_space(value)} Kč"
+
+
+def _item_label(item: Dict[str, Any]) -> str:
+    name = " ".join(str(item.get("name") or "").split()) or "(bez názvu)"
+    number = str(item.get("number") or "").strip()
+    return f"{number} {name}" if number else name
+
+
+def _budget_lines(budget: Any, parent_name: Optional[str], top_items: int, max_sections: int,
+                  stats: Dict[str, int]) -> List[str]:
+    items = _get_budget_items_fe(budget)
+    stats["items_total"] += len(items)
+
+    header = f"  - Rozpočet: {budget.name}"
+    display_name = _budget_display_name(budget, empty_fallback="")
+    if display_name and display_name != budget.name:
+        header += f" (firma: {display_name})"
+    header += f" | celkem {_kc(budget_total_round_celek_row(budget))} | položek {len(items)}"
+    if budget.score is not None:
+        header += f" | skóre {budget.score}"
+    lines = [header]
+    if parent_name is not None:
+        lines.append(f"    Podrozpočet rozpočtu: {parent_name}")
+
+    priced = [(item, _parse_price_fe(item.get("price")) or 0.0) for item in items]
+    sections = [(item, price) for item, price in priced if item.get("is_section_header") is True]
+    if sections and max_sections > 0:
+        shown = sorted(sections, key=lambda pair: -pair[1])[:max_sections]
+        text = "; ".join(f"{_item_label(item)}: {_kc(price)}" for item, price in shown)
+        if len(sections) > len(shown):
+            text += f"; … a {len(sections) - len(shown)} dalších"
+        lines.append(f"    Sekce: {text}")
+        stats["sections_listed"] += len(shown)
+
+    # Nejdražší položky – bez sekčních hlaviček, pokud rozpočet má i běžné řádky
+    rows = [(item, price) for item, price in priced if item.get("is_section_header") is not True] or priced
+    if rows and top_items > 0:
+        shown = sorted(rows, key=lambda pair: -pair[1])[:top_items]
+        text = "; ".join(f"{_item_label(item)}: {_kc(price)}" for item, price in shown)
+        lines.append(f"    Nejdražší položky: {text}")
+        stats["items_listed"] += len(shown)
+    return lines
+
+
+def _render(project: Any, rounds: List[Any], budgets_by_round: Dict[Any, List[Any]],
+            names_by_id: Dict[Any, str], top_items: int, max_sections: int) -> Tuple[str, Dict[str, int]]:
+    stats = {"items_total": 0, "items_listed": 0, "sections_listed": 0}
+    lines = [f"Projekt: {project.name}", f"Popis: {project.description or ''}", ""]
+    for r in rounds:
+        budgets = budgets_by_round.get(r.id, [])
+        round_budget_ids = {b.id for b in budgets}
+        lines.append(f"Kolo: {r.name} (pořadí {r.order}, stav {r.status}, rozpočtů {len(budgets)})")
+        for budget in budgets:
+            parent_id = budget.parent_budget_id
+            # Povýšené rozpočty ukazují na rodiče v předchozím kole – ten do souhrnu kola nepatří
+            parent_name = names_by_id.get(parent_id) if parent_id in round_budget_ids else None
+            lines.extend(_budget_lines(budget, parent_name, top_items, max_sections, stats))
+        lines.append("")
+    return "\n".join(lines) + "\n", stats
+
+
+def build_project_context(db: Session, project_id: UUID, max_chars: int = MAX_CHARS) -> Optional[Dict[str, Any]]:
+    """Sestaví kontext projektu: {"text": ..., "report": {...}}. None = projekt neexistuje."""
+    started = time.perf_counter()
+    project = crud.get_project(db, project_id)
+    if project is None:
+        return None
+    rounds = crud.get_rounds_by_project(db, project_id)
+    budgets = crud.get_budgets_by_project(db, project_id)
+
+    budgets_by_round: Dict[Any, List[Any]] = defaultdict(list)
+    for budget in budgets:
+        budgets_by_round[budget.round_id].append(budget)
+    names_by_id = {b.id: b.name for b in budgets}
+
+    # Méně položek a sekcí, dokud se text nevejde do limitu
+    levels = [(TOP_ITEMS, MAX_SECTIONS), (min(TOP_ITEMS, 5), MAX_SECTIONS), (min(TOP_ITEMS, 3), min(MAX_SECTIONS, 5)), (0, 0)]
+    for top_items, max_sections in levels:
+        text, stats = _render(project, rounds, budgets_by_round, names_by_id, top_items, max_sections)
+        if len(text) <= max_chars:
+            break
+    truncated = len(text) > max_chars
+    if truncated:
+        text = text[:max(max_chars - len(_TRUNCATED_NOTE), 0)] + _TRUNCATED_NOTE
+
+    raw_items_bytes = sum(len(fast_json.dumps(b.items)) for b in budgets if b.items)
+    report = {
+        "project_id": str(project_id),
+        "chars": len(text),
+        "approx_tokens": len(text) // CHARS_PER_TOKEN,
+        "max_chars": max_chars,
+        "rounds": len(rounds),
+        "budgets": len(budgets),
+        **stats,
+        "top_items": top_items,
+        "max_sections": max_sections,
+        "truncated": truncated,
+        # Velikost samotného JSONu položek, který se do promptu posílal dřív
+        "raw_items_bytes": raw_items_bytes,
+        "build_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+    return {"text": text, "report": report}
+
+
+def get_project_context(db: Session, project_id: UUID) -> Optional[Dict[str, Any]]:
+    """Kontext z cache podle revize projektu, případně ho sestaví. None = projekt neexistuje."""
+    revision = crud.get_project_revision(db, project_id)
+    if revision is None:
+        return None
+
+    def compute():
+        context = build_project_context(db, project_id)
+        if context is not None:
+            context["report"]["revision"] = revision
+        return context
+
+    return round_cache.get_or_compute("chat_context", project_id, revision, compute)
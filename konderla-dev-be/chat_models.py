@@ -0,0 +1,221 @@
+"""
+Volání jazykového modelu pro chat mimo event loop.
+
+`generate_content` z google.generativeai je blokující; volaný přímo z `async def`
+endpointu držel event loop po celou dobu odpovědi modelu a stály všechny ostatní
+requesty workeru. Tady se volání spouští ve vláknech, s limitem souběžných volání
+(CHAT_MODEL_CONCURRENCY; slot se uvolní až doběhnutím vlákna) a časovým limitem
+(CHAT_MODEL_TIMEOUT).
+Streamování předává části odpovědi z vlákna do event loopu přes asyncio.Queue.
+
+Model se vybírá přes CHAT_MODEL_PROVIDER: "gemini" (výchozí, potřebuje GOOGLE_API_KEY)
+nebo "fake" – lokální model bez sítě se simulovanou latencí a rychlostí generování
+pro vývoj a zátěžové testy (loadtest_chat.py).
+"""
+import abc
+import asyncio
+import os
+import threading
+import time
+from typing import AsyncIterator, Iterator, List, Optional
+
+MODEL_CONCURRENCY = int(os.getenv("CHAT_MODEL_CONCURRENCY", "4"))
+MODEL_TIMEOUT = float(os.getenv("CHAT_MODEL_TIMEOUT", "60"))
+
+BLOCKED_RESPONSE = "I'm sorry, I couldn't generate a response (Safety/Filter)."
+
+
+class ChatModel(abc.ABC):
+    """Rozhraní modelu: blokující volání, spouští je generate_async / stream_async."""
+
+    name = "base"
+
+    def generate(self, prompt: str) -> Optional[str]:
+        """Celá odpověď; None = model odpověď zablokoval (safety filtr)."""
+        parts = list(self.stream(prompt))
+        return "".join(parts) if parts else None
+
+    @abc.abstractmethod
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Části odpovědi v pořadí generování; bez částí = zablokovaná odpověď."""
+
+
+def _response_text(response) -> Optional[str]:
+    # .text vyhazuje ValueError, když je odpověď zablokovaná nebo nemá žádnou část
+    try:
+        return response.text
+    except (ValueError, AttributeError):
+        return None
+
+
+class GeminiChatModel(ChatModel):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str = "gemini-2.0-flash"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> Optional[str]:
+        return _response_text(self._model.generate_content(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self._model.generate_content(prompt, stream=True):
+            text = _response_text(chunk)
+            if text:
+                yield text
+
+
+_FILLER_WORDS = ("položka", "rozpočet", "cena", "dodavatel", "kolo", "celkem", "sekce", "výkaz")
+
+
+class FakeChatModel(ChatModel):
+    """
+    Lokální model bez sítě: po `latency` sekundách (čas do první části) vrací odpověď
+    po slovech rychlostí `tokens_per_sec` (slovo ~ token; 0 = bez prodlevy). Odpověď
+    odkazuje na konec promptu (otázku) a doplní se výplní na `reply_tokens` slov.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.5, tokens_per_sec: float = 50.0, reply_tokens: int = 0,
+                 reply: Optional[str] = None):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_tokens = reply_tokens
+        self.reply = reply
+
+    def _reply_for(self, prompt: str) -> List[str]:
+        if self.reply is not None:
+            return self.reply.split(" ")
+        question = prompt.strip().splitlines()[-1].strip() if prompt.strip() else ""
+        words = f"Testovací odpověď ({len(prompt)} znaků kontextu) na: {question}".split(" ")
+        for idx in range(self.reply_tokens - len(words)):
+            words.append(_FILLER_WORDS[idx % len(_FILLER_WORDS)])
+        return words
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(self.latency)
+        delay = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        words = self._reply_for(prompt)
+        for idx, word in enumerate(words):
+            if idx and delay:
+                time.sleep(delay)
+            yield word if idx == len(words) - 1 else word + " "
+
+
+def create_model() -> Optional[ChatModel]:
+    """Model podle CHAT_MODEL_PROVIDER; None = chat není nakonfigurovaný."""
+    provider = os.getenv("CHAT_MODEL_PROVIDER", "gemini").strip().lower()
+    if provider == "fake":
+        return FakeChatModel(
+            latency=float(os.getenv("CHAT_FAKE_LATENCY", "0.5")),
+            tokens_per_sec=float(os.getenv("CHAT_FAKE_TOKENS_PER_SEC", "50")),
+            reply_tokens=int(os.getenv("CHAT_FAKE_REPLY_TOKENS", "0")),
+        )
+    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("NEXT_PUBLIC_GOOGLE_API_KEY")
+    if not api_key:
+        print("Warning: GOOGLE_API_KEY not set")
+        return None
+    # Use gemini-2.0-flash as it is available in the current model list
+    return GeminiChatModel(api_key)
+
+
+# Vytváří se líně v běžícím loopu (u Pythonu < 3.10 se Semaphore váže na loop při vytvoření)
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MODEL_CONCURRENCY)
+    return _semaphore
+
+
+def _release_from_thread(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> None:
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        pass  # loop už neběží
+
+
+def _start_in_slot(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, fn) -> asyncio.Future:
+    """
+    Spustí `fn` ve vlákně na už obsazeném slotu semaforu. Slot uvolní až konec vlákna –
+    timeout ani zrušení volajícího blokující volání modelu nezastaví, takže dřívější
+    uvolnění by pustilo další volání nad limit CHAT_MODEL_CONCURRENCY.
+    """
+    def run():
+        try:
+            return fn()
+        finally:
+            _release_from_thread(loop, semaphore)
+
+    future = loop.run_in_executor(None, run)
+    # Výsledek vlákna, na které už nikdo nečeká (timeout), se jen „vyzvedne“
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    return future
+
+
+async def generate_async(model: ChatModel, prompt: str, timeout: Optional[float] = None) -> Optional[str]:
+    """model.generate ve vlákně; asyncio.TimeoutError po `timeout` sekundách (včetně čekání ve frontě)."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (MODEL_TIMEOUT if timeout is None else timeout)
+    semaphore = _get_semaphore()
+    await asyncio.wait_for(semaphore.acquire(), max(deadline - loop.time(), 0.0))
+    future = _start_in_slot(loop, semaphore, lambda: model.generate(prompt))
+    # shield: vypršení limitu nesmí zrušit future běžícího vlákna (slot drží vlákno)
+    return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0.0))
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+async def stream_async(model: ChatModel, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Části odpovědi z model.stream, jak přicházejí. Generátor běží ve vlákně a posílá
+    části do fronty v loopu; po vypršení `timeout` (celkově) nebo ukončení iterace
+    (klient se odpojil) se vlákno zastaví u další části. asyncio.TimeoutError po limitu.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + (MODEL_TIMEOUT if timeout is None else timeout)
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # loop už neběží
+
+    def produce() -> None:
+        try:
+            for chunk in model.stream(prompt):
+                if stop.is_set():
+                    break
+                put(chunk)
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            put(_DONE)
+
+    semaphore = _get_semaphore()
+    await asyncio.wait_for(semaphore.acquire(), max(deadline - loop.time(), 0.0))
+    _start_in_slot(loop, semaphore, produce)
+    try:
+        while True:
+            item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0.0))
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        # Vlákno skončí u další části a teprve pak uvolní slot
+        stop.set()
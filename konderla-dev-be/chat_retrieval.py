@@ -0,0 +1,185 @@
+"""
+Výběr položek relevantních k otázce v chatu (lexikální BM25 index nad položkami projektu).
+
+Souhrn projektu (chat_context) nese součty, sekce a nejdražší položky, ale na otázku
+typu „kolik stojí hydroizolace spodní stavby u firmy X“ potřebuje model konkrétní
+řádky. Ty se vybírají BM25 nad názvem a číslem položky a názvem rozpočtu / firmy;
+texty i dotaz se skládají bez diakritiky a bez ohledu na velikost písmen
+(item_catalog.fold_text), takže „vyztuz“ najde „Výztuž“. Vybrané řádky se skládají
+do bloku promptu až do pevného limitu tokenů (CHAT_RETRIEVAL_TOKEN_BUDGET).
+
+Index se drží v paměti pro každý projekt a aktualizuje se po rozpočtech: při změně
+revize projektu se porovnají (verze, název, firma, kolo) všech rozpočtů a znovu se
+zaindexují jen nové / změněné; smazané se z indexu odeberou.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+import crud
+from item_catalog import fold_text
+from pdf_export import _budget_display_name, _format_kc_space, _get_budget_items_fe, _parse_price_fe
+
+TOKEN_BUDGET = int(os.getenv("CHAT_RETRIEVAL_TOKEN_BUDGET", "3000"))
+MAX_PROJECTS = int(os.getenv("CHAT_RETRIEVAL_MAX_PROJECTS", "32"))
+CHARS_PER_TOKEN = 4
+
+_K1 = 1.2
+_B = 0.75
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+class _Segment:
+    """Zaindexované položky jednoho rozpočtu."""
+
+    __slots__ = ("key", "round_id", "label", "docs", "lengths", "postings", "df")
+
+    def __init__(self, budget: Any, key: Tuple[Any, ...]):
+        self.key = key
+        self.round_id = budget.round_id
+        display_name = _budget_display_name(budget, empty_fallback="Rozpočet")
+        self.label = display_name if display_name == budget.name else f"{display_name} ({budget.name})"
+        budget_tokens = tokenize(f"{budget.name or ''} {budget.client_name or ''}")
+
+        self.docs: List[Tuple[str, str, float]] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for item in _get_budget_items_fe(budget):
+            name = " ".join(str(item.get("name") or "").split())
+            number = str(item.get("number") or "").strip()
+            if not name and not number:
+                continue
+            tokens = tokenize(f"{number} {name}") + budget_tokens
+            doc = len(self.docs)
+            self.docs.append((number, name, _parse_price_fe(item.get("price")) or 0.0))
+            self.lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((doc, tf))
+        self.df = Counter({term: len(posting) for term, posting in self.postings.items()})
+
+
+class ProjectIndex:
+    def __init__(self):
+        self.revision: Optional[int] = None
+        self.segments: "OrderedDict[UUID, _Segment]" = OrderedDict()
+        self.round_names: Dict[Any, str] = {}
+        self.df: Counter = Counter()
+        self.n_docs = 0
+        self.total_len = 0
+        self.lock = threading.Lock()
+        self.rebuilt_budgets = 0  # kolik rozpočtů se při poslední synchronizaci indexovalo znovu
+
+    def _drop(self, budget_id: UUID) -> None:
+        segment = self.segments.pop(budget_id)
+        self.df.subtract(segment.df)
+        self.n_docs -= len(segment.docs)
+        self.total_len -= sum(segment.lengths)
+
+    def _add(self, budget_id: UUID, segment: _Segment) -> None:
+        self.segments[budget_id] = segment
+        self.df.update(segment.df)
+        self.n_docs += len(segment.docs)
+        self.total_len += sum(segment.lengths)
+
+    def sync(self, db: Session, project_id: UUID, revision: int) -> None:
+        """Dorovná index na aktuální stav rozpočtů projektu (jen změněné rozpočty)."""
+        if revision == self.revision:
+            return
+        keys = {
+            row.id: (row.version, row.name, row.client_name, row.round_id)
+            for row in crud.get_budget_index_keys(db, project_id)
+        }
+        for budget_id in [bid for bid, segment in self.segments.items() if keys.get(bid) != segment.key]:
+            self._drop(budget_id)
+        stale = [bid for bid in keys if bid not in self.segments]
+        for budget in crud.get_project_budgets_by_ids(db, project_id, stale):
+            self._add(budget.id, _Segment(budget, keys[budget.id]))
+        # Pořadí rozpočtů jako v DB (created_at, id) – na něm stojí pořadí výsledků při shodném skóre
+        self.segments = OrderedDict((bid, self.segments[bid]) for bid in keys if bid in self.segments)
+        self.df = +self.df  # odstraní nulové počty po odečtení
+        self.round_names = {r.id: r.name for r in crud.get_rounds_by_project(db, project_id)}
+        self.rebuilt_budgets = len(stale)
+        self.revision = revision
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[float, _Segment, int]]:
+        terms = set(tokenize(query))
+        if not terms or not self.n_docs:
+            return []
+        avg_len = self.total_len / self.n_docs
+        idf = {
+            term: math.log(1 + (self.n_docs - self.df[term] + 0.5) / (self.df[term] + 0.5))
+            for term in terms if self.df.get(term)
+        }
+        if not idf:
+            return []
+        hits = []
+        for seg_order, segment in enumerate(self.segments.values()):
+            scores: Dict[int, float] = {}
+            for term, weight in idf.items():
+                for doc, tf in segment.postings.get(term, ()):
+                    norm = _K1 * (1 - _B + _B * segment.lengths[doc] / avg_len)
+                    scores[doc] = scores.get(doc, 0.0) + weight * tf * (_K1 + 1) / (tf + norm)
+            hits.extend((score, seg_order, doc, segment) for doc, score in scores.items())
+        # Pořadí při shodném skóre: pořadí rozpočtů a položek – výsledek je deterministický
+        top = heapq.nsmallest(limit, hits, key=lambda hit: (-hit[0], hit[1], hit[2]))
+        return [(score, segment, doc) for score, _, doc, segment in top]
+
+
+_indexes: "OrderedDict[UUID, ProjectIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_project_index(db: Session, project_id: UUID) -> Optional[ProjectIndex]:
+    """Synchronizovaný index projektu (LRU přes MAX_PROJECTS projektů). None = projekt neexistuje."""
+    revision = crud.get_project_revision(db, project_id)
+    if revision is None:
+        return None
+    with _indexes_lock:
+        index = _indexes.get(project_id)
+        if index is None:
+            index = _indexes[project_id] = ProjectIndex()
+        _indexes.move_to_end(project_id)
+        while len(_indexes) > MAX_PROJECTS:
+            _indexes.popitem(last=False)
+    with index.lock:
+        index.sync(db, project_id, revision)
+    return index
+
+
+def retrieve(db: Session, project_id: UUID, question: str, token_budget: int = TOKEN_BUDGET) -> Dict[str, Any]:
+    """
+    Položky nejvíce související s otázkou, seřazené podle BM25 skóre a oříznuté na
+    `token_budget` (odhad znaky / 4). Vrací {"text", "hits", "approx_tokens"}.
+    """
+    index = get_project_index(db, project_id)
+    if index is None:
+        return {"text": "", "hits": [], "approx_tokens": 0}
+    max_chars = token_budget * CHARS_PER_TOKEN
+    lines: List[str] = []
+    hits: List[Dict[str, Any]] = []
+    used = 0
+    with index.lock:
+        results = index.search(question, limit=max(max_chars // 40, 1))
+        for score, segment, doc in results:
+            number, name, price = segment.docs[doc]
+            round_name = index.round_names.get(segment.round_id, "")
+            line = f"- [{round_name}] {segment.label}: {f'{number} ' if number else ''}{name} — {_format_kc_space(price)} Kč"
+            if used + len(line) + 1 > max_chars:
+                break
+            lines.append(line)
+            used += len(line) + 1
+            hits.append({"round": round_name, "budget": segment.label, "number": number,
+                         "name": name, "price": price, "score": round(score, 4)})
+    text = "\n".join(lines)
+    return {"text": text, "hits": hits, "approx_tokens": len(text) // CHARS_PER_TOKEN}
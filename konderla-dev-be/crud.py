@@ -1,9 +1,14 @@
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+from typing import Optional, List, Tuple
 import models, schemas
-import copy
-import json
-from uuid import UUID
+import budget_items
+import item_catalog
+from pagination import Page, paginate
+from round_cache import cache as round_cache
+from uuid import UUID, uuid4
+from datetime import datetime, timedelta, timezone
 
 # Project
 def create_project(db: Session, project: schemas.ProjectCreate):
@@ -16,8 +21,9 @@ def create_project(db: Session, project: schemas.ProjectCreate):
 def get_project(db: Session, project_id: UUID):
     return db.query(models.Project).filter(models.Project.id == project_id).first()
 
-def get_projects(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Project).offset(skip).limit(limit).all()
+def get_projects(db: Session, cursor: Optional[str] = None, limit: Optional[int] = 100) -> Page:
+    query = db.query(models.Project)
+    return paginate(query, [models.Project.created_at, models.Project.id], cursor, limit)
 
 def update_project(db: Session, project_id: UUID, project_update: schemas.ProjectUpdate):
     db_project = db.query(models.Project).filter(models.Project.id == project_id).first()
@@ -29,21 +35,36 @@ def update_project(db: Session, project_id: UUID, project_update: schemas.Projec
         setattr(db_project, key, value)
     
     db.add(db_project)
+    touch_project(db, project_id)
     db.commit()
     db.refresh(db_project)
     return db_project
 
+def get_project_round_ids(db: Session, project_id: UUID) -> List[UUID]:
+    return [r for (r,) in db.query(models.Round.id).filter(models.Round.project_id == project_id)]
+
 def delete_project(db: Session, project_id: UUID):
-    db_project = db.query(models.Project).filter(models.Project.id == project_id).first()
-    if db_project:
-        db.delete(db_project)
-        db.commit()
-    return db_project
+    # Jeden DELETE; kola, rozpočty, poznámky a chat smažou kaskádové FK v databázi
+    round_ids = get_project_round_ids(db, project_id)
+    row = db.execute(
+        delete(models.Project)
+        .where(models.Project.id == project_id)
+        .returning(models.Project.id, models.Project.name, models.Project.description,
+                   models.Project.client_name, models.Project.client_project_name)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+    db.commit()
+    for scope_id in [project_id, *round_ids]:
+        round_cache.invalidate_scope(scope_id)
+    return {**row._mapping, "rounds": []}
 
 # Round
 def create_round(db: Session, round: schemas.RoundCreate):
     db_round = models.Round(**round.dict())
     db.add(db_round)
+    touch_project(db, db_round.project_id)
     db.commit()
     db.refresh(db_round)
     return db_round
@@ -51,42 +72,193 @@ def create_round(db: Session, round: schemas.RoundCreate):
 def get_rounds_by_project(db: Session, project_id: UUID):
     return db.query(models.Round).filter(models.Round.project_id == project_id).order_by(models.Round.order).all()
 
+def get_rounds_page(db: Session, project_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    query = db.query(models.Round).filter(models.Round.project_id == project_id)
+    return paginate(query, [models.Round.order, models.Round.id], cursor, limit)
+
+def get_round_revision(db: Session, round_id: UUID) -> Optional[int]:
+    row = db.query(models.Round.revision).filter(models.Round.id == round_id).first()
+    return None if row is None else (row[0] or 0)
+
+def get_round_export_revisions(db: Session, round_id: UUID) -> Optional[Tuple[int, int]]:
+    """(revize kola, revize projektu) – export kola čte i údaje projektu (klient, název)."""
+    row = (
+        db.query(models.Round.revision, models.Project.revision)
+        .outerjoin(models.Project, models.Project.id == models.Round.project_id)
+        .filter(models.Round.id == round_id)
+        .first()
+    )
+    return None if row is None else (row[0] or 0, row[1] or 0)
+
+def get_project_revision(db: Session, project_id: UUID) -> Optional[int]:
+    row = db.query(models.Project.revision).filter(models.Project.id == project_id).first()
+    return None if row is None else (row[0] or 0)
+
+def touch_round(db: Session, round_id: UUID):
+    # Zvýší revizi kola i jeho projektu v rámci aktuální transakce; commit dělá volající spolu se zápisem rozpočtů
+    if round_id is None:
+        return
+    project_id = db.execute(
+        update(models.Round)
+        .where(models.Round.id == round_id)
+        .values(revision=func.coalesce(models.Round.revision, 0) + 1)
+        .returning(models.Round.project_id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    round_cache.invalidate_scope(round_id)
+    touch_project(db, project_id)
+
+def touch_project(db: Session, project_id: UUID):
+    if project_id is None:
+        return
+    db.execute(
+        update(models.Project)
+        .where(models.Project.id == project_id)
+        .values(revision=func.coalesce(models.Project.revision, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+    round_cache.invalidate_scope(project_id)
+
+def _budget_tree_round_ids(db: Session, root_filter) -> set:
+    """Kola, ve kterých leží potomci mazaných rozpočtů (povýšené kopie v dalších kolech)."""
+    tree = (
+        select(models.Budget.id, models.Budget.round_id)
+        .where(root_filter)
+        .cte("tree", recursive=True)
+    )
+    child = aliased(models.Budget)
+    tree = tree.union(select(child.id, child.round_id).join(tree, child.parent_budget_id == tree.c.id))
+    return {r for (r,) in db.execute(select(tree.c.round_id).distinct())}
+
 def delete_round(db: Session, round_id: UUID):
-    db_round = db.query(models.Round).filter(models.Round.id == round_id).first()
-    if db_round:
-        db.delete(db_round)
-        db.commit()
-    return db_round
+    affected_rounds = _budget_tree_round_ids(db, models.Budget.round_id == round_id)
+    row = db.execute(
+        delete(models.Round)
+        .where(models.Round.id == round_id)
+        .returning(models.Round.id, models.Round.project_id, models.Round.name,
+                   models.Round.order, models.Round.status, models.Round.revision)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+    for affected_round_id in affected_rounds - {round_id}:
+        clear_round_name_index(db, affected_round_id)
+        touch_round(db, affected_round_id)
+    touch_project(db, row.project_id)
+    db.commit()
+    round_cache.invalidate_scope(round_id)
+    return {**row._mapping, "budgets": []}
 
 # Budget
 def create_budget(db: Session, budget: schemas.BudgetCreate):
-    db_budget = models.Budget(**budget.dict())
+    data = budget.dict()
+    data["items"] = assign_catalog_ids(db, data["project_id"], data["items"])
+    db_budget = models.Budget(**data)
     db.add(db_budget)
+    touch_round(db, db_budget.round_id)
     db.commit()
     db.refresh(db_budget)
     return db_budget
 
 def get_budgets_by_round(db: Session, round_id: UUID):
-    budgets = db.query(models.Budget).filter(models.Budget.round_id == round_id).all()
+    budgets = (
+        db.query(models.Budget)
+        .filter(models.Budget.round_id == round_id)
+        .order_by(models.Budget.created_at, models.Budget.id)
+        .all()
+    )
     # NEPŘEPISOVAT název child budgetu - každý child budget má svůj vlastní název
     # Původní kód přepisoval název child budgetu názvem parent budgetu, což bylo špatně
     return budgets
 
+def get_budgets_by_project(db: Session, project_id: UUID):
+    # Všechny rozpočty projektu jedním dotazem (místo dotazu pro každé kolo)
+    return (
+        db.query(models.Budget)
+        .filter(models.Budget.project_id == project_id)
+        .order_by(models.Budget.created_at, models.Budget.id)
+        .all()
+    )
+
+def get_budget_index_keys(db: Session, project_id: UUID):
+    # Jen klíče pro inkrementální aktualizaci indexu chatu (chat_retrieval) – bez položek
+    return (
+        db.query(models.Budget.id, models.Budget.round_id, models.Budget.version,
+                 models.Budget.name, models.Budget.client_name)
+        .filter(models.Budget.project_id == project_id)
+        .order_by(models.Budget.created_at, models.Budget.id)
+        .all()
+    )
+
+def get_project_budgets_by_ids(db: Session, project_id: UUID, budget_ids: List[UUID]):
+    if not budget_ids:
+        return []
+    return (
+        db.query(models.Budget)
+        .filter(models.Budget.project_id == project_id, models.Budget.id.in_(budget_ids))
+        .order_by(models.Budget.created_at, models.Budget.id)
+        .all()
+    )
+
+def iter_budgets_by_round(db: Session, round_id: UUID, batch_size: int = 50):
+    """
+    Prochází rozpočty kola přes server-side kurzor (yield_per) – v paměti je vždy jen jedna dávka.
+    Přečtené rozpočty se odpojují ze session, aby identity map nerostla s velikostí kola.
+    """
+    query = (
+        db.query(models.Budget)
+        .filter(models.Budget.round_id == round_id)
+        .order_by(models.Budget.created_at, models.Budget.id)
+        .yield_per(batch_size)
+    )
+    for budget in query:
+        yield budget
+        db.expunge(budget)
+
+def get_budget(db: Session, budget_id: UUID):
+    return db.query(models.Budget).filter(models.Budget.id == budget_id).first()
+
+def get_budgets_page(db: Session, round_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    """
+    Stránkuje kořenové rozpočty kola podle (created_at, id); každá stránka obsahuje i jejich
+    child budgety, aby šlo dopočítat ceny rodičů. Kořen = rozpočet bez rodiče v tomto kole
+    (povýšené rozpočty ukazují na rodiče v předchozím kole).
+    """
+    parent = aliased(models.Budget)
+    parent_in_round = (
+        db.query(parent.id)
+        .filter(parent.id == models.Budget.parent_budget_id, parent.round_id == round_id)
+        .exists()
+    )
+    roots_query = db.query(models.Budget).filter(models.Budget.round_id == round_id, ~parent_in_round)
+    page = paginate(roots_query, [models.Budget.created_at, models.Budget.id], cursor, limit)
+    if not page.items:
+        return page
+    root_ids = [b.id for b in page.items]
+    children = (
+        db.query(models.Budget)
+        .filter(models.Budget.round_id == round_id, models.Budget.parent_budget_id.in_(root_ids))
+        .order_by(models.Budget.created_at, models.Budget.id)
+        .all()
+    )
+    return Page(page.items + children, page.next_cursor)
+
 def delete_budget(db: Session, budget_id: UUID):
-    db_budget = db.query(models.Budget).filter(models.Budget.id == budget_id).first()
-    if db_budget:
-        # Smazat všechny child budgets (podbudgety)
-        child_budgets = db.query(models.Budget).filter(models.Budget.parent_budget_id == budget_id).all()
-        if child_budgets:
-            print(f"[Delete] Deleting {len(child_budgets)} child budgets for parent budget id={budget_id}")
-            for child in child_budgets:
-                print(f"[Delete]   Deleting child budget id={child.id}, name='{child.name}'")
-                db.delete(child)
-        # Smazat parent budget
-        print(f"[Delete] Deleting parent budget id={budget_id}, name='{db_budget.name}'")
-        db.delete(db_budget)
-        db.commit()
-    return db_budget
+    # Podrozpočty (i povýšené kopie v dalších kolech) maže kaskádový FK parent_budget_id
+    affected_rounds = _budget_tree_round_ids(db, models.Budget.id == budget_id)
+    row = db.execute(
+        delete(models.Budget)
+        .where(models.Budget.id == budget_id)
+        .returning(models.Budget.id, models.Budget.round_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        return None
+    for affected_round_id in affected_rounds:
+        clear_round_name_index(db, affected_round_id)
+        touch_round(db, affected_round_id)
+    db.commit()
+    return row
 
 def update_budget(db: Session, budget_id: UUID, budget_update: schemas.BudgetUpdate):
     db_budget = db.query(models.Budget).filter(models.Budget.id == budget_id).first()
@@ -94,10 +266,57 @@ def update_budget(db: Session, budget_id: UUID, budget_update: schemas.BudgetUpd
         return None
     
     update_data = budget_update.dict(exclude_unset=True)
+    old_names = budget_items.item_names(db_budget.items) if "items" in update_data else set()
+    if "items" in update_data:
+        update_data["items"] = assign_catalog_ids(db, db_budget.project_id, update_data["items"])
     for key, value in update_data.items():
         setattr(db_budget, key, value)
+    if "items" in update_data:
+        db_budget.version = (db_budget.version or 0) + 1
+        if old_names - budget_items.item_names(db_budget.items):
+            clear_round_name_index(db, db_budget.round_id)
     
     db.add(db_budget)
+    touch_round(db, db_budget.round_id)
+    db.commit()
+    db.refresh(db_budget)
+    return db_budget
+
+def patch_budget_items(db: Session, budget_id: UUID, patch: schemas.BudgetItemsPatch):
+    """
+    Dílčí úprava položek rozpočtu (set_price / rename / insert / delete) na serveru.
+    Řádek se zamkne (FOR UPDATE), zkontroluje se očekávaná verze a labels.total_price
+    se upraví o rozdíl místo přepočtu. Vyhazuje budget_items.VersionConflict
+    a budget_items.ItemPatchError.
+    """
+    db_budget = db.query(models.Budget).filter(models.Budget.id == budget_id).with_for_update().first()
+    if not db_budget:
+        return None
+    current_version = db_budget.version or 0
+    if patch.version is not None and patch.version != current_version:
+        raise budget_items.VersionConflict(patch.version, current_version)
+
+    items = budget_items.normalize_items(db_budget.items)
+    if items is None:
+        raise budget_items.ItemPatchError("Budget items are not readable, refusing to patch")
+
+    labels = dict(db_budget.labels or {})
+    include_subsections = labels.get("type") == "type2"
+    new_items, total_delta = budget_items.apply_item_operations(items, patch.operations, include_subsections)
+
+    total_price = labels.get("total_price")
+    if isinstance(total_price, (int, float)) and not isinstance(total_price, bool):
+        if total_delta is None:
+            labels["total_price"] = budget_items.compute_budget_total_price(new_items, include_subsections)
+        else:
+            labels["total_price"] = round(float(total_price) + total_delta, 2)
+        db_budget.labels = labels
+
+    if budget_items.item_names(items) - budget_items.item_names(new_items):
+        clear_round_name_index(db, db_budget.round_id)
+    db_budget.items = budget_items.with_stored_shape(db_budget.items, assign_catalog_ids(db, db_budget.project_id, new_items))
+    db_budget.version = current_version + 1
+    touch_round(db, db_budget.round_id)
     db.commit()
     db.refresh(db_budget)
     return db_budget
@@ -109,49 +328,81 @@ def create_budget_note(db: Session, budget_id: UUID, note: schemas.BudgetNoteCre
     db.refresh(db_note)
     return db_note
 
-def get_budget_notes(db: Session, budget_id: UUID):
-    return db.query(models.BudgetNote).filter(models.BudgetNote.budget_id == budget_id).order_by(models.BudgetNote.created_at.desc()).all()
+def get_budget_notes(db: Session, budget_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    query = db.query(models.BudgetNote).filter(models.BudgetNote.budget_id == budget_id)
+    return paginate(query, [models.BudgetNote.created_at, models.BudgetNote.id], cursor, limit, descending=True)
 
 # Promote Logic
+_PROMOTE_BUDGETS_SQL = text("""
+    WITH RECURSIVE tree AS (
+        SELECT b.id, 0 AS depth
+        FROM budgets b
+        WHERE b.round_id = :current_round_id AND b.id = ANY(:budget_ids)
+        UNION ALL
+        SELECT c.id, tree.depth + 1
+        FROM budgets c
+        JOIN tree ON c.parent_budget_id = tree.id
+        WHERE c.round_id = :current_round_id
+    ),
+    mapping AS MATERIALIZED (
+        SELECT DISTINCT ON (id) id AS old_id, gen_random_uuid() AS new_id, depth
+        FROM tree
+        ORDER BY id, depth DESC
+    )
+    INSERT INTO budgets (
+        id, round_id, project_id, parent_budget_id, name, notes, score, file_path,
+        client_name, client_project_name, labels, items, dynamic_fields, created_at
+    )
+    SELECT
+        m.new_id, :new_round_id, :project_id,
+        CASE WHEN m.depth = 0 THEN b.id ELSE parent_map.new_id END,
+        b.name, b.notes, b.score, b.file_path,
+        b.client_name, b.client_project_name, b.labels, b.items, b.dynamic_fields,
+        now() + row_number() OVER (ORDER BY m.depth, b.created_at, b.id) * interval '1 microsecond'
+    FROM mapping m
+    JOIN budgets b ON b.id = m.old_id
+    LEFT JOIN mapping parent_map ON parent_map.old_id = b.parent_budget_id
+""").bindparams(
+    bindparam("budget_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("current_round_id", type_=PG_UUID(as_uuid=True)),
+    bindparam("new_round_id", type_=PG_UUID(as_uuid=True)),
+    bindparam("project_id", type_=PG_UUID(as_uuid=True)),
+)
+
 def promote_to_next_round(db: Session, promote_req: schemas.PromoteRequest):
+    """
+    Založí další kolo a zkopíruje do něj vybrané rozpočty včetně celého stromu
+    podrozpočtů jedním INSERT ... SELECT v databázi (JSON položek neprochází Pythonem).
+    Kořen kopie ukazuje parent_budget_id na svůj originál (návaznost mezi koly),
+    podrozpočty na kopii svého rodiče. Vše v jedné transakci.
+    """
     # 1. Get current round to determine order
     current_round = db.query(models.Round).filter(models.Round.id == promote_req.current_round_id).first()
     if not current_round:
         return None
-    
-    new_order = current_round.order + 1
-    
+
     # 2. Create new Round
     new_round = models.Round(
         project_id=promote_req.project_id,
         name=promote_req.new_round_name,
-        order=new_order,
+        order=current_round.order + 1,
         status="open"
     )
     db.add(new_round)
+    db.flush()
+
+    # 3. Copy budgets (roots + children) server-side
+    if promote_req.budget_ids:
+        db.execute(_PROMOTE_BUDGETS_SQL, {
+            "budget_ids": list(promote_req.budget_ids),
+            "current_round_id": current_round.id,
+            "new_round_id": new_round.id,
+            "project_id": new_round.project_id,
+        })
+
+    touch_round(db, new_round.id)
     db.commit()
     db.refresh(new_round)
-    
-    # 3. Deep copy budgets
-    promoted_budgets = []
-    for budget_id in promote_req.budget_ids:
-        original_budget = db.query(models.Budget).filter(models.Budget.id == budget_id).first()
-        if original_budget:
-            new_budget = models.Budget(
-                round_id=new_round.id,
-                project_id=new_round.project_id,
-                parent_budget_id=original_budget.id,
-                name=original_budget.name,
-                notes=original_budget.notes,
-                score=original_budget.score,
-                labels=copy.deepcopy(original_budget.labels),
-                items=copy.deepcopy(original_budget.items),
-                dynamic_fields=copy.deepcopy(original_budget.dynamic_fields)
-            )
-            db.add(new_budget)
-            promoted_budgets.append(new_budget)
-            
-    db.commit()
     return new_round
 
 # Chat History
@@ -169,8 +420,9 @@ def create_chat_session(db: Session, session: schemas.ChatSessionCreate):
     db.refresh(db_session)
     return db_session
 
-def get_project_chat_sessions(db: Session, project_id: UUID):
-    return db.query(models.ChatSession).filter(models.ChatSession.project_id == project_id).order_by(models.ChatSession.created_at.desc()).all()
+def get_project_chat_sessions(db: Session, project_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    query = db.query(models.ChatSession).filter(models.ChatSession.project_id == project_id)
+    return paginate(query, [models.ChatSession.created_at, models.ChatSession.id], cursor, limit, descending=True)
 
 def get_chat_session(db: Session, session_id: UUID):
     return db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
@@ -188,11 +440,24 @@ def update_chat_session(db: Session, session_id: UUID, name: str):
         db.refresh(db_session)
     return db_session
 
-def get_chat_history(db: Session, project_id: UUID, session_id: Optional[UUID] = None):
+def rename_chat_session_if(db: Session, session_id: UUID, expected_name: str, name: str) -> bool:
+    """Přejmenuje session jen pokud má stále název `expected_name` (nepřepíše mezitím změněný název)."""
+    row = db.execute(
+        update(models.ChatSession)
+        .where(models.ChatSession.id == session_id, models.ChatSession.name == expected_name)
+        .values(name=name)
+        .returning(models.ChatSession.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return row is not None
+
+def get_chat_history(db: Session, project_id: UUID, session_id: Optional[UUID] = None,
+                     cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
     query = db.query(models.ChatHistory).filter(models.ChatHistory.project_id == project_id)
     if session_id:
         query = query.filter(models.ChatHistory.session_id == session_id)
-    return query.order_by(models.ChatHistory.timestamp).all()
+    return paginate(query, [models.ChatHistory.timestamp, models.ChatHistory.id], cursor, limit)
 
 def delete_chat_history(db: Session, project_id: UUID):
     db.query(models.ChatHistory).filter(models.ChatHistory.project_id == project_id).delete()
@@ -200,95 +465,144 @@ def delete_chat_history(db: Session, project_id: UUID):
     return {"status": "success"}
 
 # Merge Items Logic
+def merge_round_items_batch(db: Session, round_id: UUID, operations: List[schemas.MergeItemsRequest], dry_run: bool = False):
+    """
+    Provede všechny slučovací operace jedním průchodem přes každý rozpočet kola
+    a v jedné transakci. Přepisují se jen rozpočty, kterých se něco týkalo.
+    dry_run nic nezapisuje, jen vrátí počty a rozdíly cen.
+    """
+    op_totals = [
+        {"source_name": op.source_name, "target_name": op.target_name, "new_name": op.new_name,
+         "budgets_affected": 0, "items_merged": 0, "price_moved": 0.0, "renamed": 0, "created": 0}
+        for op in operations
+    ]
+    budget_reports = []
+    skipped = []
+
+    for budget in get_budgets_by_round(db, round_id):
+        items = budget_items.normalize_items(budget.items)
+        if items is None:
+            # Nečitelná data: raději přeskočit než přepsat
+            skipped.append(budget.id)
+            continue
+
+        new_items, op_stats = budget_items.apply_merge_operations(items, operations)
+        changed = False
+        for totals, stats in zip(op_totals, op_stats):
+            if stats["items_merged"] or stats["renamed"] or stats["created"]:
+                totals["budgets_affected"] += 1
+                changed = True
+            for key in ("items_merged", "price_moved", "renamed", "created"):
+                totals[key] += stats[key]
+        if not changed:
+            continue
+
+        budget_reports.append({
+            "budget_id": budget.id,
+            "name": budget.name,
+            "items_before": len(items),
+            "items_after": len(new_items),
+            "price_deltas": budget_items.price_deltas(items, new_items),
+        })
+        if not dry_run:
+            budget.items = budget_items.with_stored_shape(budget.items, assign_catalog_ids(db, budget.project_id, new_items))
+            budget.version = (budget.version or 0) + 1
+
+    if not dry_run and budget_reports:
+        # Sloučené názvy z kola zmizely – index pro inkrementální detekci duplicit už neplatí
+        clear_round_name_index(db, round_id)
+        touch_round(db, round_id)
+        db.commit()
+
+    return {
+        "status": "dry_run" if dry_run else "success",
+        "dry_run": dry_run,
+        "budgets_affected": len(budget_reports),
+        "skipped_budgets": skipped,
+        "operations": op_totals,
+        "budgets": budget_reports,
+    }
+
 def merge_round_items(db: Session, round_id: UUID, merge_req: schemas.MergeItemsRequest):
-    budgets = get_budgets_by_round(db, round_id)
-    
-    for budget in budgets:
-        raw_items = budget.items or []
-        
-        # 1. Handle if raw_items is a string (double-serialized JSON)
-        if isinstance(raw_items, str):
-            try:
-                raw_items = json.loads(raw_items)
-            except Exception as e:
-                print(f"Error parsing raw_items for budget {budget.id}: {e}")
-                # If parsing fails/not empty, skip to prevent dataloss
-                if raw_items:
-                     print(f"Aborting merge for budget {budget.id} - raw_items is corrupted string")
-                     continue
-
-        # 2. Ensure it is a list
-        if not isinstance(raw_items, list):
-            # If it's a dict, wrap it
-            if isinstance(raw_items, dict):
-                raw_items = [raw_items]
-            else:
-                # If it is something else (like unparseable string) and has content, DO NOT wipe
-                if raw_items:
-                     print(f"Aborting merge for budget {budget.id} - raw_items is {type(raw_items)}")
-                     continue
-                raw_items = []
-            
-        # 3. Robustly parse items into list of dicts
-        items = []
-        for i in raw_items:
-            if isinstance(i, dict):
-                items.append(i)
-            elif isinstance(i, str):
-                try:
-                    parsed = json.loads(i)
-                    if isinstance(parsed, dict):
-                        items.append(parsed)
-                except:
-                    pass
-
-        # 4. Perform Merge
-        source_name = merge_req.source_name
-        target_name = merge_req.target_name
-        new_name = merge_req.new_name
-
-        # Find all source items to merge (handle duplicates)
-        source_items = [i for i in items if i.get('name') == source_name]
-        
-        if source_items:
-            total_source_price = sum((float(i.get('price') or 0) for i in source_items), 0.0)
-            
-            # Remove source items from the list
-            items = [i for i in items if i.get('name') != source_name]
-            
-            # Find target item in the REMAINING list
-            target_item = next((i for i in items if i.get('name') == target_name), None)
-            
-            if target_item:
-                # Merge into existing target
-                current_target_price = float(target_item.get('price') or 0)
-                target_item['price'] = current_target_price + total_source_price
-                
-                # Rename if needed
-                if new_name and new_name != target_name:
-                    target_item['name'] = new_name
-            else:
-                # Target not found (or was same as source and removed)
-                # We reuse the FIRST source item as the base for the new item
-                # to preserve other fields (unit, etc)
-                base_item = source_items[0].copy()
-                base_item['price'] = total_source_price # Sum of all sources
-                base_item['name'] = new_name if new_name else target_name
-                items.append(base_item)
-                
-        elif target_name:
-             # If source not found, but we want to rename target (if exists)
-             target_item = next((i for i in items if i.get('name') == target_name), None)
-             if target_item and new_name and new_name != target_name:
-                 target_item['name'] = new_name
-
-        # Update budget items
-        budget.items = items
-        from sqlalchemy.orm.attributes import flag_modified
-        flag_modified(budget, "items")
+    merge_round_items_batch(db, round_id, [merge_req])
+    return {"status": "success"}
 
+# Item catalog
+def ensure_item_catalog(db: Session, project_id: UUID, names: dict) -> dict:
+    """
+    Založí chybějící normalizované názvy v katalogu projektu (INSERT ... ON CONFLICT
+    DO NOTHING, takže souběžné nahrávání nevytvoří duplicitu) a vrátí
+    normalizovaný název -> id. Bez commitu.
+    """
+    if not names:
+        return {}
+
+    def lookup(keys) -> dict:
+        rows = db.execute(
+            select(models.ItemCatalogEntry.normalized_name, models.ItemCatalogEntry.id)
+            .where(models.ItemCatalogEntry.project_id == project_id,
+                   models.ItemCatalogEntry.normalized_name.in_(list(keys)))
+        )
+        return {key: catalog_id for key, catalog_id in rows}
+
+    # Nejdřív jen čtení: ON CONFLICT by spotřeboval hodnotu sekvence i pro existující názvy
+    ids = lookup(names)
+    missing = {key: name for key, name in names.items() if key not in ids}
+    if missing:
+        db.execute(
+            pg_insert(models.ItemCatalogEntry)
+            .values([{"project_id": project_id, "normalized_name": key, "name": name} for key, name in missing.items()])
+            .on_conflict_do_nothing(index_elements=["project_id", "normalized_name"])
+        )
+        ids.update(lookup(missing))
+    return ids
+
+def assign_catalog_ids(db: Session, project_id: Optional[UUID], items):
+    """Položky s doplněným catalog_id (viz item_catalog.py); rozpočty bez projektu zůstanou beze změny."""
+    if project_id is None:
+        return items
+    names = item_catalog.catalog_names(items)
+    if not names:
+        return item_catalog.apply_catalog_ids(items, {})
+    return item_catalog.apply_catalog_ids(items, ensure_item_catalog(db, project_id, names))
+
+def get_item_catalog_page(db: Session, project_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    query = db.query(models.ItemCatalogEntry).filter(models.ItemCatalogEntry.project_id == project_id)
+    return paginate(query, [models.ItemCatalogEntry.id], cursor, limit)
+
+def backfill_item_catalog(db: Session, project_id: UUID) -> dict:
+    """
+    Doplní catalog_id do položek všech rozpočtů projektu (data nahraná před zavedením
+    katalogu). Přepisuje jen rozpočty, kde se něco změnilo; nečitelné položky přeskočí.
+    """
+    budgets = get_budgets_by_project(db, project_id)
+    readable, skipped = [], []
+    names = {}
+    for budget in budgets:
+        items = budget_items.normalize_items(budget.items)
+        if items is None:
+            skipped.append(budget.id)
+            continue
+        readable.append((budget, items))
+        for key, name in item_catalog.catalog_names(items).items():
+            names.setdefault(key, name)
+
+    # Jeden INSERT + SELECT za celý projekt místo dotazu pro každý rozpočet
+    ids = ensure_item_catalog(db, project_id, names)
+    updated, round_ids = 0, set()
+    for budget, items in readable:
+        new_items = item_catalog.apply_catalog_ids(items, ids)
+        if new_items == items:
+            continue
+        budget.items = budget_items.with_stored_shape(budget.items, new_items)
+        budget.version = (budget.version or 0) + 1
+        round_ids.add(budget.round_id)
+        updated += 1
+    for round_id in round_ids:
+        touch_round(db, round_id)
     db.commit()
-    return {"status": "success"}
+    entries = db.query(func.count(models.ItemCatalogEntry.id)).filter(models.ItemCatalogEntry.project_id == project_id).scalar()
+    return {"project_id": project_id, "budgets_updated": updated, "skipped_budgets": skipped, "catalog_entries": entries}
 
 # Duplicates
 def create_duplicate(db: Session, duplicate: schemas.RoundDuplicateCreate):
@@ -298,8 +612,76 @@ def create_duplicate(db: Session, duplicate: schemas.RoundDuplicateCreate):
     db.refresh(db_duplicate)
     return db_duplicate
 
-def get_duplicates_by_round(db: Session, round_id: UUID):
-    return db.query(models.RoundDuplicate).filter(models.RoundDuplicate.round_id == round_id).all()
+def _insert_round_duplicates(db: Session, round_id: UUID, matches: List[dict]) -> List[dict]:
+    # Jeden víceřádkový INSERT ... RETURNING; created_at se posouvá po mikrosekundách,
+    # aby stránkování (created_at, id) drželo pořadí detekce.
+    if not matches:
+        return []
+    base_time = datetime.now(timezone.utc)
+    rows = [
+        {"id": uuid4(), "round_id": round_id, "data": data, "created_at": base_time + timedelta(microseconds=i)}
+        for i, data in enumerate(matches)
+    ]
+    result = db.execute(
+        insert(models.RoundDuplicate)
+        .values(rows)
+        .returning(models.RoundDuplicate.id, models.RoundDuplicate.round_id,
+                   models.RoundDuplicate.data, models.RoundDuplicate.created_at)
+    )
+    return sorted((dict(row._mapping) for row in result), key=lambda row: row["created_at"])
+
+def _insert_round_item_names(db: Session, round_id: UUID, names: dict):
+    if not names:
+        return
+    db.execute(
+        pg_insert(models.RoundItemName)
+        .values([{"id": uuid4(), "round_id": round_id, "name": name, "bigrams": bigrams} for name, bigrams in names.items()])
+        .on_conflict_do_nothing(index_elements=["round_id", "name"])
+    )
+
+def replace_round_duplicates(db: Session, round_id: UUID, matches: List[dict], index_names: Optional[dict] = None) -> List[dict]:
+    """
+    Nahradí výsledky detekce duplicit kola: jeden DELETE a jeden víceřádkový
+    INSERT ... RETURNING v jedné transakci. S `index_names` (název -> bigramy)
+    se stejně přestaví i index názvů kola pro inkrementální detekci.
+    """
+    db.execute(
+        delete(models.RoundDuplicate)
+        .where(models.RoundDuplicate.round_id == round_id)
+        .execution_options(synchronize_session=False)
+    )
+    if index_names is not None:
+        clear_round_name_index(db, round_id)
+        _insert_round_item_names(db, round_id, index_names)
+    inserted = _insert_round_duplicates(db, round_id, matches)
+    db.commit()
+    return inserted
+
+def append_round_duplicates(db: Session, round_id: UUID, matches: List[dict], index_names: dict) -> List[dict]:
+    """Přidá nové shody a nové názvy do indexu kola (inkrementální detekce), jedna transakce."""
+    _insert_round_item_names(db, round_id, index_names)
+    inserted = _insert_round_duplicates(db, round_id, matches)
+    db.commit()
+    return inserted
+
+def get_round_name_index(db: Session, round_id: UUID, lock: bool = False) -> dict:
+    """Index názvů kola: název -> bigramová signatura. lock=True zamkne kolo do konce transakce."""
+    if lock:
+        db.query(models.Round.id).filter(models.Round.id == round_id).with_for_update().first()
+    rows = db.query(models.RoundItemName.name, models.RoundItemName.bigrams).filter(models.RoundItemName.round_id == round_id)
+    return {name: bigrams for name, bigrams in rows}
+
+def clear_round_name_index(db: Session, round_id: UUID):
+    # Bez commitu – volá se v transakci zápisu, který z kola odebral názvy; další detekce pak proběhne celá
+    db.execute(
+        delete(models.RoundItemName)
+        .where(models.RoundItemName.round_id == round_id)
+        .execution_options(synchronize_session=False)
+    )
+
+def get_duplicates_by_round(db: Session, round_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+    query = db.query(models.RoundDuplicate).filter(models.RoundDuplicate.round_id == round_id)
+    return paginate(query, [models.RoundDuplicate.created_at, models.RoundDuplicate.id], cursor, limit)
 
 def delete_duplicate(db: Session, duplicate_id: int):
     db_duplicate = db.query(models.RoundDuplicate).filter(models.RoundDuplicate.id == duplicate_id).first()
@@ -0,0 +1,448 @@
+"""
+Detekce duplicitních názvů položek v kole (case-insensitive shody a podobné názvy).
+
+Původně se každá dvojice unikátních názvů porovnávala přes difflib.SequenceMatcher,
+tj. O(n²) výpočtů ratio(). Tady se páry nejdřív protřídí (blocking) a přesný ratio()
+se počítá jen pro ty, které mohou práh překročit:
+
+  1. názvy se seskupí podle lowercase – páry uvnitř skupiny jsou case_insensitive,
+     fuzzy porovnání pak běží jen mezi různými lowercase řetězci,
+  2. délkové okno: ratio <= 2·min(la, lb) / (la + lb),
+  3. bigramový filtr: při ratio > 0.85 mají řetězce aspoň 3·M - T - 1 společných
+     bigramů (M = počet shodných znaků, T = la + lb; mezi dvěma shodnými bloky
+     leží aspoň jeden neshodný znak),
+  4. quick_ratio (průnik multimnožin znaků) jako horní mez, teprve potom ratio().
+
+U větších kol se kroky 2–4 dělí na dávky a běží na process poolu (DUPLICATES_WORKERS);
+výsledky se skládají v pevném pořadí, takže nezávisí na tom, která dávka doběhne dřív.
+Volitelný časový limit vrátí částečný výsledek s příznakem complete=False.
+
+Výsledek (páry, typ shody, skóre i pořadí) je stejný jako u porovnání všech dvojic.
+"""
+import os
+import time
+from bisect import bisect_left
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import budget_items
+import crud
+import process_pool
+from database import SessionLocal
+
+FUZZY_THRESHOLD = 0.85
+# Hledání kandidátů a skórování párů na process poolu; 0/1 = v aktuálním procesu.
+# Malá kola se počítají vždy lokálně (start poolu a přenos dat by trval déle).
+DUPLICATES_WORKERS = int(os.getenv("DUPLICATES_WORKERS", str(min(4, os.cpu_count() or 1))))
+_PARALLEL_MIN_NAMES = 2000
+_PARALLEL_MIN_PAIRS = 2000
+_CHUNK_SIZE = 500
+# ratio = 2M / T > 17/40  <=>  40·M > 17·T (celočíselně, bez zaokrouhlovacích chyb)
+_THRESHOLD_NUM, _THRESHOLD_DEN = 17, 40
+
+_pool = process_pool.SpawnPool()
+
+
+def collect_item_names(budgets: Iterable[Any]) -> List[str]:
+    """Unikátní (strip) názvy položek ze všech rozpočtů kola, seřazené."""
+    names = set()
+    for budget in budgets:
+        names |= budget_items.item_names(budget.items)
+    return sorted(names)
+
+
+def _bigrams(text: str) -> Counter:
+    return Counter(text[k:k + 2] for k in range(len(text) - 1))
+
+
+def _min_shared_bigrams(total_len: np.ndarray) -> np.ndarray:
+    # Nejmenší M, pro které 2M / T > 0.85, je T·17 // 40 + 1; společných bigramů je pak aspoň 3·M - T - 1
+    return 3 * ((_THRESHOLD_NUM * total_len) // _THRESHOLD_DEN + 1) - total_len - 1
+
+
+_LENGTH_DIFF = _THRESHOLD_DEN - _THRESHOLD_NUM
+
+
+def _partner_length_range(length: int) -> Tuple[int, int]:
+    # Délky partnera, pro které 2·min / (la + lb) > 0.85  <=>  23·min > 17·max
+    return (_THRESHOLD_NUM * length) // _LENGTH_DIFF + 1, (_LENGTH_DIFF * length - 1) // _THRESHOLD_NUM
+
+
+class _NameIndex:
+    """
+    Bigramový index nad (lowercase) řetězci seřazenými podle délky.
+
+    Počet společných bigramů se sčítá přes invertovaný index bigram -> (pozice, počet)
+    vektorově v NumPy, takže i časté bigramy (mezery, koncovky) stojí jen jednu
+    operaci nad polem. Kandidáti se ještě ověří horní mezí quick_ratio z počtů znaků.
+    Bigramy lze předat hotové (uložená signatura z round_item_names).
+    """
+
+    def __init__(self, strings: List[str], bigrams: Optional[List[Counter]] = None):
+        n = len(strings)
+        self.strings = strings
+        self.order = sorted(range(n), key=lambda k: len(strings[k]))
+        self.position_of = {k: pos for pos, k in enumerate(self.order)}
+        self.lengths = np.fromiter((len(strings[k]) for k in self.order), dtype=np.int64, count=n)
+        if bigrams is None:
+            bigrams = [_bigrams(text) for text in strings]
+        self.bigrams = [bigrams[k] for k in self.order]
+
+        # Počty znaků (řetězec × znak) pro horní mez quick_ratio = 2·|průnik znaků| / T
+        self.alphabet = {ch: idx for idx, ch in enumerate(sorted(set("".join(strings))))}
+        self.char_counts = np.zeros((n, max(len(self.alphabet), 1)), dtype=np.int32)
+        for pos, k in enumerate(self.order):
+            self.char_counts[pos] = self._char_vector(strings[k])
+
+        grouped: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        for pos, counts in enumerate(self.bigrams):
+            for gram, count in counts.items():
+                positions, values = grouped[gram]
+                positions.append(pos)
+                values.append(count)
+        # Pozice i jako list – bisect nad listem je pro skalární hledání levnější než np.searchsorted
+        self.postings = {
+            gram: (positions, np.array(positions, dtype=np.int64), np.array(values, dtype=np.int64))
+            for gram, (positions, values) in grouped.items()
+        }
+
+    def _char_vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.char_counts.shape[1], dtype=np.int32)
+        for ch, count in Counter(text).items():
+            idx = self.alphabet.get(ch)
+            if idx is not None:
+                vector[idx] = count
+        return vector
+
+    def position_range(self, length: int) -> Tuple[int, int]:
+        min_len, max_len = _partner_length_range(length)
+        lo = int(np.searchsorted(self.lengths, min_len, side="left"))
+        hi = int(np.searchsorted(self.lengths, max_len, side="right"))
+        return lo, hi
+
+    def probe(self, text: str, bigrams: Counter, chars: np.ndarray, lo: int, hi: int) -> List[int]:
+        """Indexy (do `strings`) v pozicích [lo, hi), které s `text` mohou mít ratio > práh."""
+        if lo >= hi:
+            return []
+        length = len(text)
+        need = _min_shared_bigrams(self.lengths[lo:hi] + length)
+        shared = np.zeros(hi - lo, dtype=np.int64)
+        for gram, count in bigrams.items():
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            position_list, positions, values = posting
+            i0 = bisect_left(position_list, lo)
+            i1 = bisect_left(position_list, hi, i0)
+            if i0 == i1:
+                continue
+            if i1 - i0 == 1:
+                shared[position_list[i0] - lo] += min(int(values[i0]), count)
+            else:
+                shared[positions[i0:i1] - lo] += np.minimum(values[i0:i1], count)
+        offsets = np.nonzero(shared >= need)[0]
+        if offsets.size:
+            common_chars = np.minimum(self.char_counts[lo + offsets], chars).sum(axis=1)
+            total = self.lengths[lo + offsets] + length
+            offsets = offsets[_THRESHOLD_DEN * common_chars > _THRESHOLD_NUM * total]
+        return [self.order[lo + int(offset)] for offset in offsets]
+
+
+def _probe_positions(index: _NameIndex, start: int, stop: int,
+                     deadline: Optional[float] = None) -> Tuple[List[Tuple[int, int]], bool]:
+    """
+    Kandidátní páry (i, j) pro řetězce na pozicích [start, stop) délkového pořadí –
+    každý se porovná jen s kratšími (nebo stejně dlouhými) v délkovém okně.
+    Vrací (páry, complete); po překročení `deadline` (time.monotonic) skončí dřív.
+    """
+    pairs = []
+    for pos_b in range(start, stop):
+        if deadline is not None and time.monotonic() > deadline:
+            return pairs, False
+        b = index.order[pos_b]
+        lo, _ = index.position_range(int(index.lengths[pos_b]))
+        for a in index.probe(index.strings[b], index.bigrams[pos_b], index.char_counts[pos_b], lo, pos_b):
+            pairs.append((a, b) if a < b else (b, a))
+    return pairs, True
+
+
+# Index poslední úlohy v procesu poolu – dávky jednoho výpočtu ho nestaví znovu
+_worker_index: Tuple[Optional[str], Optional[_NameIndex]] = (None, None)
+
+
+def _probe_chunk(token: str, strings: List[str], start: int, stop: int,
+                 deadline: Optional[float]) -> Tuple[List[Tuple[int, int]], bool]:
+    global _worker_index
+    if _worker_index[0] != token:
+        _worker_index = (token, _NameIndex(strings))
+    return _probe_positions(_worker_index[1], start, stop, deadline)
+
+
+def _score_chunk(pairs: List[Tuple[str, str]]) -> List[float]:
+    # Běží i v procesech poolu – jen čisté výpočty, žádná DB
+    return [SequenceMatcher(None, a, b).ratio() for a, b in pairs]
+
+
+def _run_chunks(fn, chunks: List[tuple], deadline: Optional[float], workers: int) -> Tuple[List[Any], bool]:
+    """
+    Spustí fn(*chunk) pro všechny dávky na process poolu. Vrací výsledky dokončených
+    dávek v pořadí `chunks` (ne v pořadí dokončení) a příznak, zda doběhly všechny.
+    Po vypršení `deadline` se čekající dávky zruší. None = pool nejde použít.
+    """
+    try:
+        executor = _pool.get(workers)
+        futures = [executor.submit(fn, *chunk) for chunk in chunks]
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+        done, pending = wait(futures, timeout=timeout)
+        for future in pending:
+            future.cancel()
+        return [future.result() if future in done else None for future in futures], not pending
+    except BrokenProcessPool as e:
+        print(f"[Duplicates] Process pool failed ({e}), running in-process")
+        _pool.reset()
+        return None, False
+
+
+def _find_candidates(strings: List[str], deadline: Optional[float], workers: int) -> Tuple[List[Tuple[int, int]], bool]:
+    """Kandidátní páry přes celý index – u větších kol rozdělené po dávkách pozic na pool."""
+    n = len(strings)
+    if workers > 1 and n >= _PARALLEL_MIN_NAMES:
+        # Delší řetězce mají širší okno, proto víc menších dávek než workerů
+        step = -(-n // (workers * 8))
+        token = uuid4().hex
+        chunks = [(token, strings, start, min(start + step, n), deadline) for start in range(0, n, step)]
+        results, complete = _run_chunks(_probe_chunk, chunks, deadline, workers)
+        if results is not None:
+            pairs = []
+            for result in results:
+                if result is not None:
+                    pairs.extend(result[0])
+                    complete = complete and result[1]
+            return pairs, complete
+    return _probe_positions(_NameIndex(strings), 0, n, deadline)
+
+
+class _PairScorer:
+    """
+    Sbírá dvojice názvů ke skórování a skóruje je po dávkách – sériově, nebo na
+    process poolu (DUPLICATES_WORKERS). Výsledek nezávisí na pořadí dokončení dávek.
+    """
+
+    def __init__(self, names: List[str]):
+        self.names = names
+        self.entries: List[Tuple[int, int, Tuple[str, str]]] = []
+        self.keys: Dict[Tuple[str, str], int] = {}
+
+    def add(self, group_a: List[int], group_b: List[int], keep=None) -> None:
+        # ratio() nemusí být symetrické (autojunk), proto se počítá ve směru pořadí v `names`
+        for i in group_a:
+            for j in group_b:
+                a, b = (i, j) if i < j else (j, i)
+                if keep is not None and not keep(a, b):
+                    continue
+                key = (self.names[a].lower(), self.names[b].lower())
+                self.keys.setdefault(key, len(self.keys))
+                self.entries.append((a, b, key))
+
+    def _score(self, deadline: Optional[float], workers: int) -> Tuple[Dict[Tuple[str, str], float], bool]:
+        keys = list(self.keys)
+        chunks = [keys[k:k + _CHUNK_SIZE] for k in range(0, len(keys), _CHUNK_SIZE)]
+        ratios: Dict[Tuple[str, str], float] = {}
+
+        if workers > 1 and len(keys) >= _PARALLEL_MIN_PAIRS:
+            results, complete = _run_chunks(_score_chunk, [(chunk,) for chunk in chunks], deadline, workers)
+            if results is not None:
+                for chunk, result in zip(chunks, results):
+                    if result is not None:
+                        ratios.update(zip(chunk, result))
+                return ratios, complete
+
+        for chunk in chunks:
+            if deadline is not None and time.monotonic() > deadline:
+                return ratios, False
+            ratios.update(zip(chunk, _score_chunk(chunk)))
+        return ratios, True
+
+    def matches(self, deadline: Optional[float] = None, workers: int = 0) -> Tuple[List[Tuple[int, int, str, float]], bool]:
+        ratios, complete = self._score(deadline, workers)
+        found = []
+        for a, b, key in self.entries:
+            ratio = ratios.get(key)
+            if ratio is not None and ratio > FUZZY_THRESHOLD:
+                found.append((a, b, "fuzzy", ratio))
+        return found, complete
+
+
+def find_duplicates(names: List[str]) -> List[Dict[str, Any]]:
+    """
+    Pro seznam unikátních názvů vrátí shody ve tvaru `RoundDuplicate.data`
+    (item_a_name, item_b_name, match_type, similarity), seřazené podle pozic
+    (i, j) v `names` – stejně jako dvojitá smyčka přes všechny dvojice.
+    """
+    return detect_matches(names, workers=0)[0]
+
+
+def detect_matches(names: List[str], time_budget: Optional[float] = None,
+                   workers: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Jako find_duplicates, navíc s časovým limitem (sekundy) a skórováním na process
+    poolu. Vrací (shody, complete); po vypršení limitu jsou shody jen částečné
+    (case_insensitive jsou vždy kompletní), pořadí zůstává podle (i, j).
+    """
+    deadline = time.monotonic() + time_budget if time_budget else None
+    workers = DUPLICATES_WORKERS if workers is None else workers
+
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for idx, name in enumerate(names):
+        groups[name.lower()].append(idx)
+    lowered = list(groups)
+
+    matches: List[Tuple[int, int, str, float]] = []
+    for members in groups.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                if names[members[x]] != names[members[y]]:
+                    matches.append((members[x], members[y], "case_insensitive", 1.0))
+
+    scorer = _PairScorer(names)
+    pairs, candidates_complete = _find_candidates(lowered, deadline, workers)
+    for p, q in pairs:
+        scorer.add(groups[lowered[p]], groups[lowered[q]])
+    fuzzy, scoring_complete = scorer.matches(deadline, workers)
+    matches.extend(fuzzy)
+
+    matches.sort(key=lambda m: (m[0], m[1]))
+    data = [_match_data(names[i], names[j], match_type, score) for i, j, match_type, score in matches]
+    return data, candidates_complete and scoring_complete
+
+
+def name_signature(name: str) -> Dict[str, int]:
+    """Bigramová signatura názvu (lowercase) pro uložení v round_item_names."""
+    return dict(_bigrams(name.lower()))
+
+
+def find_new_duplicates(existing_names: Iterable[str], new_names: Iterable[str],
+                        signatures: Optional[Dict[str, Dict[str, int]]] = None) -> List[Dict[str, Any]]:
+    """
+    Shody, které přibudou, když se k už zpracovaným názvům (`existing_names`) přidají
+    `new_names`: jen dvojice, kde je aspoň jeden název nový. Sjednocení s výsledkem
+    find_duplicates(existing) dává totéž co find_duplicates(existing ∪ new).
+    `signatures` (lowercase název -> bigramy) šetří přepočet u uložených názvů.
+    """
+    existing_set = set(existing_names)
+    added = set(new_names) - existing_set
+    if not added:
+        return []
+    names = sorted(existing_set | added)
+    new_positions = {idx for idx, name in enumerate(names) if name in added}
+
+    def touches_new(a: int, b: int) -> bool:
+        return a in new_positions or b in new_positions
+
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for idx, name in enumerate(names):
+        groups[name.lower()].append(idx)
+    lowered = list(groups)
+
+    matches: List[Tuple[int, int, str, float]] = []
+    probe_groups = []
+    for group_idx, members in enumerate(groups.values()):
+        if not any(idx in new_positions for idx in members):
+            continue
+        probe_groups.append(group_idx)
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                if touches_new(members[x], members[y]):
+                    matches.append((members[x], members[y], "case_insensitive", 1.0))
+
+    signatures = signatures or {}
+    bigrams = [Counter(signatures[text]) if text in signatures else _bigrams(text) for text in lowered]
+    index = _NameIndex(lowered, bigrams)
+    scorer = _PairScorer(names)
+    scored = set()
+    for p in probe_groups:
+        text = lowered[p]
+        pos = index.position_of[p]
+        lo, hi = index.position_range(len(text))
+        for q in index.probe(text, index.bigrams[pos], index.char_counts[pos], lo, hi):
+            pair = (p, q) if p < q else (q, p)
+            if q == p or pair in scored:
+                continue
+            scored.add(pair)
+            scorer.add(groups[lowered[p]], groups[lowered[q]], keep=touches_new)
+    matches.extend(scorer.matches(workers=DUPLICATES_WORKERS)[0])
+
+    matches.sort(key=lambda m: (m[0], m[1]))
+    return [_match_data(names[i], names[j], match_type, score) for i, j, match_type, score in matches]
+
+
+def _match_data(name1: str, name2: str, match_type: str, score: float) -> Dict[str, Any]:
+    return {
+        "item_a_name": name1,
+        "item_b_name": name2,
+        "match_type": match_type,
+        "similarity": round(score, 2),
+    }
+
+
+# --- Detekce nad databází: celé kolo / jen nové názvy ---
+
+def detect_round_duplicates(db: Session, round_id: UUID, time_budget: Optional[float] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Celá detekce kola: nahradí round_duplicates a přestaví index názvů kola.
+    Vrací (uložené řádky, complete). Částečný výsledek (vypršel time_budget) se uloží,
+    ale index názvů se vyprázdní, takže další inkrementální detekce proběhne celá.
+    """
+    names = collect_item_names(crud.get_budgets_by_round(db, round_id))
+    matches, complete = detect_matches(names, time_budget=time_budget)
+    print(f"[Duplicates] round_id={round_id}: {len(names)} unique items, {len(matches)} matches"
+          + ("" if complete else " (incomplete, time budget exceeded)"))
+    index_names = {name: name_signature(name) for name in names} if complete else {}
+    return crud.replace_round_duplicates(db, round_id, matches, index_names=index_names), complete
+
+
+def update_round_duplicates(db: Session, round_id: UUID) -> Dict[str, Any]:
+    """
+    Inkrementální detekce po nahrání / úpravě rozpočtů: názvy kola, které ještě nejsou
+    v indexu názvů kola (round_item_names), se porovnají jen s indexem a nové shody se
+    přidají k round_duplicates. Nové názvy se berou ze všech rozpočtů kola, ne jen
+    z právě zapsaných – index tak dožene i zápisy, které detekci nespustily (POST
+    /budgets/, upload bez detect_duplicates, PUT). Prázdný index (ještě nevznikl, nebo
+    byl zneplatněn smazáním / sloučením položek) znamená celou detekci.
+    """
+    index = crud.get_round_name_index(db, round_id, lock=True)
+    if not index:
+        rows, _ = detect_round_duplicates(db, round_id)
+        return {"mode": "full", "new_names": None, "duplicates": rows}
+
+    new_names = set(collect_item_names(crud.get_budgets_by_round(db, round_id))) - set(index)
+    if not new_names:
+        db.commit()  # uvolní zámek kola
+        return {"mode": "incremental", "new_names": 0, "duplicates": []}
+
+    signatures = {name.lower(): bigrams for name, bigrams in index.items() if bigrams is not None}
+    matches = find_new_duplicates(index.keys(), new_names, signatures)
+    print(f"[Duplicates] round_id={round_id}: {len(new_names)} new items vs {len(index)} indexed, {len(matches)} new matches")
+    rows = crud.append_round_duplicates(
+        db, round_id, matches, index_names={name: name_signature(name) for name in new_names}
+    )
+    return {"mode": "incremental", "new_names": len(new_names), "duplicates": rows}
+
+
+def update_round_duplicates_job(round_id: UUID) -> None:
+    """Varianta pro BackgroundTasks – vlastní session, chyby jen loguje."""
+    db = SessionLocal()
+    try:
+        update_round_duplicates(db, round_id)
+    except Exception as e:
+        db.rollback()
+        print(f"[Duplicates] Incremental detection failed for round_id={round_id}: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,222 @@
+"""
+PDF exporty kol jako úlohy na pozadí a cache hotových PDF podle revize.
+
+Export kola se dřív generoval přímo v requestu do sdíleného souboru
+uploads/exports/export_{round_id}.pdf – souběžné exporty téhož kola si ho přepisovaly.
+Tady každý export vzniká v dočasném souboru a do cache se přesune atomicky
+(os.replace) pod jménem s verzí formátu exportu, revizí kola a projektu a typem grafů.
+Dokud se kolo ani projekt nezmění, další stažení je jen čtení souboru; starší revize
+téhož kola se po uložení novější smažou, všechny exporty kola se smažou se smazáním kola
+nebo projektu (DELETE /rounds/{id} a /projects/{id} volají remove_round_exports).
+
+Úlohy (POST /rounds/{id}/export-pdf/jobs) se drží v paměti procesu: stav
+queued → running → done / failed, hotové se po PDF_EXPORT_JOB_TTL sekundách zapomenou.
+"""
+import glob
+import os
+import re
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+import crud
+import pdf_export
+from database import SessionLocal
+
+EXPORT_DIR = os.getenv("PDF_EXPORT_DIR", os.path.join("uploads", "exports"))
+ROUND_CACHE_DIR = os.path.join(EXPORT_DIR, "rounds")
+JOB_TTL = float(os.getenv("PDF_EXPORT_JOB_TTL", "3600"))
+# Zvýšit při změně obsahu nebo vzhledu PDF exportu kola (i grafů – viz _CHART_RENDER_VERSION
+# v pdf_export); PDF uložená starší verzí kódu se pak nepoužijí
+EXPORT_FORMAT_VERSION = 1
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class RoundNotFound(Exception):
+    pass
+
+
+def _round_pdf_path(round_id: UUID, revisions: Tuple[int, int], chart_backend: str) -> str:
+    round_revision, project_revision = revisions
+    return os.path.join(
+        ROUND_CACHE_DIR,
+        f"round_{round_id}_v{EXPORT_FORMAT_VERSION}_r{round_revision}_p{project_revision}_{chart_backend}.pdf",
+    )
+
+
+def _resolve(db: Session, round_id: UUID, chart_backend: Optional[str]) -> Tuple[str, str]:
+    chart_backend = chart_backend or pdf_export.PDF_CHART_BACKEND
+    if chart_backend not in pdf_export.CHART_BACKENDS:
+        raise ValueError(f"Unknown chart backend: {chart_backend}")
+    revisions = crud.get_round_export_revisions(db, round_id)
+    if revisions is None:
+        raise RoundNotFound(str(round_id))
+    return _round_pdf_path(round_id, revisions, chart_backend), chart_backend
+
+
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_lock = threading.Lock()
+
+
+def _build_lock(path: str) -> threading.Lock:
+    with _build_locks_lock:
+        return _build_locks.setdefault(path, threading.Lock())
+
+
+_ROUND_PDF_NAME = re.compile(r"_v(\d+)_r(\d+)_p(\d+)_")
+
+
+def _remove_older_revisions(round_id: UUID, chart_backend: str, stored: str) -> None:
+    """
+    Smaže PDF kola starší než právě uložené `stored`: starší verze formátu, nebo stejná
+    verze s revizí kola i projektu nejvýš takovou jako `stored`. Novější PDF (souběžný
+    export po další změně kola, novější verze kódu při postupném nasazení) zůstávají.
+    """
+    stored_version, stored_round, stored_project = map(int, _ROUND_PDF_NAME.search(os.path.basename(stored)).groups())
+    for path in glob.glob(os.path.join(ROUND_CACHE_DIR, f"round_{round_id}_v*_{chart_backend}.pdf")):
+        match = _ROUND_PDF_NAME.search(os.path.basename(path))
+        if path == stored or match is None:
+            continue
+        version, round_revision, project_revision = map(int, match.groups())
+        older = version < stored_version or (
+            version == stored_version and round_revision <= stored_round and project_revision <= stored_project
+        )
+        if older:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def remove_round_exports(round_id: UUID) -> None:
+    """Smaže všechna uložená PDF kola (všechny verze, revize a typy grafů)."""
+    for path in glob.glob(os.path.join(ROUND_CACHE_DIR, f"round_{round_id}_*")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_or_build_round_pdf(db: Session, round_id: UUID, chart_backend: Optional[str] = None) -> Tuple[str, bool]:
+    """
+    Cesta k PDF exportu kola pro aktuální revizi: z cache, nebo ho vygeneruje.
+    Vrací (cesta, z_cache). Souběžné požadavky na stejný export generují PDF jen jednou.
+    """
+    path, chart_backend = _resolve(db, round_id, chart_backend)
+    if os.path.isfile(path):
+        return path, True
+    try:
+        with _build_lock(path):
+            if os.path.isfile(path):
+                return path, True
+            os.makedirs(ROUND_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                pdf_export.generate_pdf_export(round_id, db, tmp_path, chart_backend=chart_backend)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+    finally:
+        # I po chybě exportu – jinak by zámek pro tuto revizi zůstal v _build_locks navždy
+        with _build_locks_lock:
+            _build_locks.pop(path, None)
+    _remove_older_revisions(round_id, chart_backend, stored=path)
+    return path, False
+
+
+class ExportJob:
+    __slots__ = ("id", "round_id", "chart_backend", "status", "error", "path", "cached",
+                 "created_at", "started_at", "finished_at")
+
+    def __init__(self, round_id: UUID, chart_backend: str):
+        self.id = uuid.uuid4().hex
+        self.round_id = round_id
+        self.chart_backend = chart_backend
+        self.status = STATUS_QUEUED
+        self.error: Optional[str] = None
+        self.path: Optional[str] = None
+        self.cached = False
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def finish(self, path: str, cached: bool) -> None:
+        self.path = path
+        self.cached = cached
+        self.status = STATUS_DONE
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "round_id": str(self.round_id),
+            "charts": self.chart_backend,
+            "status": self.status,
+            "error": self.error,
+            "cached": self.cached,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_ms": round((self.finished_at - (self.started_at or self.created_at)) * 1000, 1)
+            if self.finished_at is not None else None,
+        }
+
+
+_jobs: Dict[str, ExportJob] = {}
+_jobs_lock = threading.Lock()
+
+
+def _prune_jobs(now: float) -> None:
+    for job_id in [jid for jid, job in _jobs.items() if job.finished_at is not None and now - job.finished_at > JOB_TTL]:
+        del _jobs[job_id]
+
+
+def create_round_job(db: Session, round_id: UUID, chart_backend: Optional[str] = None) -> ExportJob:
+    """
+    Založí úlohu exportu kola. Je-li PDF pro aktuální revizi už v cache, úloha je
+    rovnou hotová a nic se nespouští; jinak je ve stavu queued a spustí ji run_round_job.
+    """
+    path, chart_backend = _resolve(db, round_id, chart_backend)
+    job = ExportJob(round_id, chart_backend)
+    if os.path.isfile(path):
+        job.finish(path, cached=True)
+    with _jobs_lock:
+        _prune_jobs(time.time())
+        _jobs[job.id] = job
+    return job
+
+
+def get_job(job_id: str) -> Optional[ExportJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def run_round_job(job_id: str) -> None:
+    """Background task: vygeneruje PDF úlohy ve vlastní DB session."""
+    job = get_job(job_id)
+    if job is None or job.status != STATUS_QUEUED:
+        return
+    job.status = STATUS_RUNNING
+    job.started_at = time.time()
+    db = SessionLocal()
+    try:
+        path, cached = get_or_build_round_pdf(db, job.round_id, job.chart_backend)
+        job.finish(path, cached)
+    except Exception as e:
+        print(f"[Export] Job {job.id} for round {job.round_id} failed: {e}")
+        traceback.print_exc()
+        job.error = str(e)
+        job.status = STATUS_FAILED
+        job.finished_at = time.time()
+    finally:
+        db.close()
@@ -0,0 +1,176 @@
+"""
+Rychlá cesta pro velké JSON odpovědi (rozpočty s tisíci položek).
+
+Položky rozpočtů jsou v DB uložené už zvalidované, takže je posíláme bez
+pydantic validace každého prvku: ORM objekt -> dict -> orjson. Kompresi velkých
+odpovědí řeší CompressionMiddleware (brotli, jinak gzip).
+"""
+import gzip
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import orjson
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli je volitelný, bez něj se použije gzip
+    brotli = None
+
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_orjson_default, option=_ORJSON_OPTIONS)
+
+
+class FastJSONResponse(Response):
+    """JSON odpověď serializovaná přes orjson (UUID a datetime umí nativně)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# --- Serializace ORM objektů (stejný tvar jako schemas.Budget / Round / Project) ---
+
+def budget_to_dict(budget: Any) -> Dict[str, Any]:
+    return {
+        "name": budget.name,
+        "notes": budget.notes,
+        "score": budget.score,
+        "file_path": budget.file_path,
+        "client_name": budget.client_name,
+        "client_project_name": budget.client_project_name,
+        "labels": budget.labels,
+        "items": budget.items,
+        "dynamic_fields": budget.dynamic_fields,
+        "id": budget.id,
+        "round_id": budget.round_id,
+        "project_id": budget.project_id,
+        "parent_budget_id": budget.parent_budget_id,
+        "version": budget.version or 0,
+    }
+
+
+def budgets_to_list(budgets: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [budget_to_dict(b) for b in budgets]
+
+
+def round_to_dict(round_obj: Any, budgets: Optional[Iterable[Any]] = None) -> Dict[str, Any]:
+    if budgets is None:
+        budgets = round_obj.budgets
+    return {
+        "name": round_obj.name,
+        "order": round_obj.order,
+        "status": round_obj.status,
+        "id": round_obj.id,
+        "project_id": round_obj.project_id,
+        "revision": round_obj.revision or 0,
+        "budgets": budgets_to_list(budgets),
+    }
+
+
+def project_to_dict(project: Any) -> Dict[str, Any]:
+    return {
+        "name": project.name,
+        "description": project.description,
+        "client_name": project.client_name,
+        "client_project_name": project.client_project_name,
+        "id": project.id,
+        "rounds": [round_to_dict(r) for r in project.rounds],
+    }
+
+
+def chat_history_to_dict(message: Any) -> Dict[str, Any]:
+    return {
+        "role": message.role,
+        "content": message.content,
+        "id": message.id,
+        "project_id": message.project_id,
+        "session_id": message.session_id,
+        "timestamp": message.timestamp,
+    }
+
+
+# --- Komprese odpovědí ---
+
+class CompressionMiddleware:
+    """
+    Komprimuje jednorázové (ne-streamované) odpovědi nad `minimum_size` bajtů.
+    Brotli má přednost, pokud ho klient i server podporují; jinak gzip.
+    Streamované odpovědi (FileResponse, NDJSON, SSE) propouští beze změny.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _pick_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._pick_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            initial, start_message = start_message, None
+            headers = MutableHeaders(scope=initial)
+            body = message.get("body", b"")
+            skip = (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith("text/event-stream")
+            )
+            if skip:
+                await send(initial)
+                await send(message)
+                return
+
+            compressed = self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(initial)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
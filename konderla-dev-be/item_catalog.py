@@ -0,0 +1,66 @@
+"""
+Katalog položek projektu: normalizovaný název -> celočíselné id (tabulka item_catalog).
+
+Identita položky byla všude surový řetězec názvu (strip, lower, přesná shoda podle
+místa použití). Katalog dává všem variantám zápisu jednoho názvu – velikost písmen,
+diakritika, mezery – stejné `catalog_id`, které se ukládá přímo do položky rozpočtu
+při zápisu (nahrání, vytvoření, úprava, sloučení). Srovnání a exporty pak mohou
+spojovat položky přes int místo opakovaného porovnávání řetězců.
+"""
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+CATALOG_ID_KEY = "catalog_id"
+
+
+def fold_text(text: str) -> str:
+    """Bez diakritiky a casefold („Výztuž“ -> „vyztuz“); sdílí i vyhledávání v chatu."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def normalize_name(name: Any) -> Optional[str]:
+    """
+    Normalizovaný klíč názvu: bez diakritiky, casefold, mezery sloučené do jedné
+    a oříznuté. None = položka nemá použitelný název a do katalogu nepatří.
+    """
+    if not isinstance(name, str):
+        return None
+    normalized = " ".join(fold_text(name).split())
+    return normalized or None
+
+
+def catalog_names(items: Any) -> Dict[str, str]:
+    """Normalizované názvy položek -> první původní (strip) zápis, pro založení v katalogu."""
+    names: Dict[str, str] = {}
+    if not isinstance(items, list):
+        return names
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        key = normalize_name(item.get("name"))
+        if key is not None and key not in names:
+            names[key] = item["name"].strip()
+    return names
+
+
+def apply_catalog_ids(items: Any, ids: Dict[str, int]) -> Any:
+    """
+    Vrátí položky s `catalog_id` podle normalizovaného názvu (kopie změněných dictů).
+    Položkám bez názvu se případné staré `catalog_id` odebere (např. po přejmenování).
+    """
+    if not isinstance(items, list):
+        return items
+    result: List[Any] = []
+    for item in items:
+        if not isinstance(item, dict):
+            result.append(item)
+            continue
+        catalog_id = ids.get(normalize_name(item.get("name")))
+        if item.get(CATALOG_ID_KEY) == catalog_id and (catalog_id is not None or CATALOG_ID_KEY not in item):
+            result.append(item)
+        elif catalog_id is None:
+            result.append({k: v for k, v in item.items() if k != CATALOG_ID_KEY})
+        else:
+            result.append({**item, CATALOG_ID_KEY: catalog_id})
+    return result
@@ -0,0 +1,191 @@
+"""
+Zátěžový test chatu: souběžné POST /chat/ (nebo /chat/stream) spolu se čtením rozpočtů
+(GET /rounds/{id}/budgets/). Vypisuje p50/p95/p99 latence obou druhů requestů – když
+chat blokuje event loop, rostou hlavně latence čtení rozpočtů.
+
+Bez --url běží aplikace v tomto procesu (httpx ASGITransport) s lokálním FakeChatModel
+místo Gemini, takže nepotřebuje síť ani API klíč – jen databázi (DATABASE_URL).
+S --url jde o běžící server; ten musí mít CHAT_MODEL_PROVIDER=fake (CHAT_FAKE_*).
+Testovací projekt s rozpočty si skript založí přes API a na konci ho smaže (--keep ho ponechá).
+
+Spuštění:  python loadtest_chat.py [--duration 10] [--chat-concurrency 8] [--read-concurrency 8]
+           [--latency 0.5] [--tokens-per-sec 50] [--reply-tokens 100] [--stream]
+           [--max-read-p99-ms 250] [--max-chat-p99-ms 5000] [--url http://localhost:8000] [--keep]
+Návratový kód 1, pokud p99 překročí zadaný limit nebo některý request selže (pro CI).
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+_WORDS = [
+    "beton", "výztuž", "bednění", "zdivo", "omítka", "izolace", "hydroizolace", "potěr",
+    "dlažba", "obklad", "nátěr", "lešení", "montáž", "dodávka", "osazení", "odvoz",
+    "příčky", "stropní deska", "základová deska", "schodiště", "okna", "dveře", "klempířské prvky",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil metodou nejbližšího pořadí (hodnoty musí být seřazené)."""
+    if not values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class Stats:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def record(self, started: float, ok: bool, error: Optional[str] = None) -> None:
+        self.latencies.append(time.perf_counter() - started)
+        if not ok:
+            self.errors += 1
+            self.last_error = error
+
+    def p99_ms(self) -> float:
+        return percentile(sorted(self.latencies), 99) * 1000
+
+    def report(self, duration: float) -> str:
+        values = sorted(self.latencies)
+        ms = lambda pct: f"{percentile(values, pct) * 1000:8.1f}"
+        line = (f"{self.name:<6} requestů {len(values):6d} ({len(values) / duration:6.1f}/s), chyb {self.errors:4d} | "
+                f"p50 {ms(50)} ms  p95 {ms(95)} ms  p99 {ms(99)} ms  max {ms(100)} ms")
+        if self.last_error:
+            line += f"\n       poslední chyba: {self.last_error}"
+        return line
+
+
+def _items(rnd: random.Random, n: int) -> List[Dict[str, object]]:
+    return [
+        {"number": str(idx + 1), "name": f"{rnd.choice(_WORDS)} {rnd.choice(_WORDS)} {idx}",
+         "price": f"{rnd.uniform(100, 100000):.2f}"}
+        for idx in range(n)
+    ]
+
+
+async def setup_project(client: httpx.AsyncClient, budgets: int, items: int) -> Dict[str, str]:
+    rnd = random.Random(1)
+    project = (await client.post("/projects/", json={"name": "Loadtest chat"})).raise_for_status().json()
+    round_ = (await client.post("/rounds/", json={"name": "1. kolo", "order": 1, "project_id": project["id"]})).raise_for_status().json()
+    for idx in range(budgets):
+        data = {"round_id": round_["id"], "project_id": project["id"], "name": f"Firma {idx + 1}",
+                "items": json.dumps(_items(rnd, items))}
+        (await client.post("/budgets/", data=data)).raise_for_status()
+    return {"project_id": project["id"], "round_id": round_["id"]}
+
+
+async def chat_worker(client: httpx.AsyncClient, ids: Dict[str, str], stats: Stats, deadline: float,
+                      stream: bool, repeat_questions: bool, counter: List[int]) -> None:
+    while time.perf_counter() < deadline:
+        counter[0] += 1
+        # Jedinečné otázky obcházejí cache odpovědí (chat_cache); --repeat-questions ji naopak měří
+        suffix = "" if repeat_questions else f" (dotaz {counter[0]})"
+        body = {"project_id": ids["project_id"], "message": f"Kolik stojí {_WORDS[counter[0] % len(_WORDS)]}?{suffix}"}
+        started = time.perf_counter()
+        try:
+            if stream:
+                async with client.stream("POST", "/chat/stream", json=body) as response:
+                    text = b"".join([chunk async for chunk in response.aiter_bytes()])
+                ok = response.status_code == 200 and b"event: done" in text and b"event: error" not in text
+            else:
+                response = await client.post("/chat/", json=body)
+                ok = response.status_code == 200 and not response.json()["content"].startswith("I encountered an error")
+            stats.record(started, ok, None if ok else f"HTTP {response.status_code}")
+        except httpx.HTTPError as e:
+            stats.record(started, False, repr(e))
+
+
+async def read_worker(client: httpx.AsyncClient, ids: Dict[str, str], stats: Stats, deadline: float) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"/rounds/{ids['round_id']}/budgets/")
+            stats.record(started, response.status_code == 200, f"HTTP {response.status_code}")
+        except httpx.HTTPError as e:
+            stats.record(started, False, repr(e))
+
+
+def _client(args) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(120.0)
+    limits = httpx.Limits(max_connections=args.chat_concurrency + args.read_concurrency + 4)
+    if args.url:
+        return httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+
+    import chat_models
+    import main as app_main
+
+    app_main.model = chat_models.FakeChatModel(
+        latency=args.latency, tokens_per_sec=args.tokens_per_sec, reply_tokens=args.reply_tokens,
+    )
+    transport = httpx.ASGITransport(app=app_main.app)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout, limits=limits)
+
+
+async def run(args) -> int:
+    async with _client(args) as client:
+        ids = await setup_project(client, args.budgets, args.items)
+        print(f"Projekt {ids['project_id']}: {args.budgets} rozpočtů × {args.items} položek")
+
+        try:
+            chat, reads = Stats("chat"), Stats("čtení")
+            counter = [0]
+            deadline = time.perf_counter() + args.duration
+            started = time.perf_counter()
+            await asyncio.gather(
+                *[chat_worker(client, ids, chat, deadline, args.stream, args.repeat_questions, counter)
+                  for _ in range(args.chat_concurrency)],
+                *[read_worker(client, ids, reads, deadline) for _ in range(args.read_concurrency)],
+            )
+            elapsed = time.perf_counter() - started
+        finally:
+            if args.keep:
+                print(f"Projekt {ids['project_id']} ponechán (--keep)")
+            else:
+                (await client.delete(f"/projects/{ids['project_id']}")).raise_for_status()
+
+    print(f"Souběh: chat {args.chat_concurrency}, čtení {args.read_concurrency}, {elapsed:.1f} s"
+          + (", /chat/stream" if args.stream else ", /chat/"))
+    print(chat.report(elapsed))
+    print(reads.report(elapsed))
+
+    failed = chat.errors + reads.errors > 0
+    if args.max_read_p99_ms is not None and reads.p99_ms() > args.max_read_p99_ms:
+        print(f"FAIL: p99 čtení {reads.p99_ms():.1f} ms > {args.max_read_p99_ms} ms")
+        failed = True
+    if args.max_chat_p99_ms is not None and chat.p99_ms() > args.max_chat_p99_ms:
+        print(f"FAIL: p99 chatu {chat.p99_ms():.1f} ms > {args.max_chat_p99_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="běžící server; bez něj aplikace v tomto procesu")
+    parser.add_argument("--duration", type=float, default=10.0, help="délka měření v sekundách")
+    parser.add_argument("--chat-concurrency", type=int, default=8)
+    parser.add_argument("--read-concurrency", type=int, default=8)
+    parser.add_argument("--budgets", type=int, default=10)
+    parser.add_argument("--items", type=int, default=200, help="položek na rozpočet")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model: čas do první části (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0, help="fake model: rychlost generování")
+    parser.add_argument("--reply-tokens", type=int, default=100, help="fake model: délka odpovědi ve slovech")
+    parser.add_argument("--stream", action="store_true", help="POST /chat/stream místo /chat/")
+    parser.add_argument("--repeat-questions", action="store_true", help="opakovat stejné otázky (cache odpovědí)")
+    parser.add_argument("--max-read-p99-ms", type=float, default=None)
+    parser.add_argument("--max-chat-p99-ms", type=float, default=None)
+    parser.add_argument("--keep", action="store_true", help="nemazat testovací projekt po skončení")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from database import engine, Base, get_db
+from database import engine, Base, get_db, SessionLocal
 import models, schemas, crud
 from uuid import UUID
-import google.generativeai as genai
+import asyncio
 import os
 import json
 import shutil
+import tempfile
 from dotenv import load_dotenv
 import httpx
-import difflib
 import excel_processor
 import pdf_export
-from fastapi.responses import FileResponse
+import budget_items
+import chart_cache
+import chat_cache
+import chat_context
+import chat_models
+import chat_retrieval
+import export_jobs
+import duplicates
+import fast_json
+import pagination
+import round_matrix
+from round_cache import cache as round_cache
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from datetime import datetime, timezone
 
-# --- Totals ---
-def _compute_budget_total_price(items, include_subsections: bool = False) -> float:
-    if not isinstance(items, list):
-        return 0.0
-
-    def _as_float(v) -> float:
-        try:
-            return float(v or 0)
-        except Exception:
-            return 0.0
-
-    dict_items = [it for it in items if isinstance(it, dict)]
-    if include_subsections:
-        # Requested behavior for some Type2 files: count parent + subsection rows together.
-        base = dict_items
-    else:
-        section_items = [it for it in dict_items if it.get("is_section_header") is True]
-        base = section_items if section_items else dict_items
-    total = sum(_as_float(it.get("price")) for it in base)
-    if total != total or total in (float("inf"), float("-inf")):
-        return 0.0
-    return round(total, 2)
-
 # Load environment variables
 # Try loading from standard locations
 if os.path.exists('/.env'):
@@ -56,6 +46,11 @@ os.makedirs("uploads", exist_ok=True)
 
 app = FastAPI()
 
+# Velké JSON odpovědi (rozpočty kola) komprimujeme; malé nechává middleware být.
+app.add_middleware(
+    fast_json.CompressionMiddleware,
+    minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")),
+)
 
 @app.on_event("startup")
 def startup_log():
@@ -64,6 +59,11 @@ def startup_log():
 
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+# Vlastní hlavičky odpovědí (klient je čte, proto jsou i v CORS expose_headers)
+DUPLICATES_COMPLETE_HEADER = "X-Duplicates-Complete"
+# Odpověď chatu z chat_cache (hit) nebo od modelu (miss)
+CHAT_CACHE_HEADER = "X-Chat-Cache"
+
 # CORS: s allow_credentials=True nelze použít allow_origins=["*"] – prohlížeč to blokuje.
 # Nastav CORS_ORIGINS (oddělené čárkou), výchozí obsahuje localhost :3000 i :3001 (Next často přepne port) a Vercel.
 _DEFAULT_CORS = (
@@ -71,6 +71,7 @@ _DEFAULT_CORS = (
     "http://localhost:3001,http://127.0.0.1:3001,"
     "https://konderla-dev-fe.vercel.app"
 )
+
 _cors_origins = os.getenv("CORS_ORIGINS", _DEFAULT_CORS).strip()
 cors_list = [o.strip() for o in _cors_origins.split(",") if o.strip()]
 if not cors_list:
@@ -89,39 +90,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", pagination.NEXT_CURSOR_HEADER, DUPLICATES_COMPLETE_HEADER, CHAT_CACHE_HEADER],
 )
 
+
+@app.exception_handler(pagination.InvalidCursor)
+def invalid_cursor_handler(request: Request, exc: pagination.InvalidCursor):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+def _page_headers(page: pagination.Page) -> dict:
+    return {pagination.NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else {}
+
+
+def _page_items(response: Response, page: pagination.Page):
+    # Další stránku klient načte s ?cursor=<X-Next-Cursor>; bez hlavičky už další stránka není.
+    response.headers.update(_page_headers(page))
+    return page.items
+
 # Gemini Setup
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("NEXT_PUBLIC_GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    # Use gemini-2.0-flash as it is available in the current model list
-    model = genai.GenerativeModel('gemini-2.0-flash')
-else:
-    model = None
-    print("Warning: GOOGLE_API_KEY not set")
+# Gemini (nebo lokální fake model přes CHAT_MODEL_PROVIDER=fake), volání mimo event loop – viz chat_models.py
+model = chat_models.create_model()
 
 def generate_project_context(db: Session, project_id: UUID) -> str:
-    project = crud.get_project(db, project_id)
-    if not project:
-        return ""
-    
-    rounds = crud.get_rounds_by_project(db, project_id)
-    
-    context = f"Project: {project.name}\nDescription: {project.description}\n\n"
-    
-    for r in rounds:
-        context += f"Round: {r.name} (Order: {r.order}, Status: {r.status})\n"
-        budgets = crud.get_budgets_by_round(db, r.id)
-        for b in budgets:
-            items_str = json.dumps(b.items) if b.items else "[]"
-            context += f"  - Budget: {b.name}, Score: {b.score}, Price Items: {items_str}\n"
-            if b.parent_budget_id:
-                context += f"    (Derived from Budget ID: {b.parent_budget_id})\n"
-        context += "\n"
-        
-    return context
+    # Kompaktní souhrn projektu (součty, sekce, nejdražší položky), cachovaný podle revize projektu
+    context = chat_context.get_project_context(db, project_id)
+    return context["text"] if context else ""
 
 @app.get("/")
 def read_root():
@@ -133,15 +127,19 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
     return crud.create_project(db=db, project=project)
 
 @app.get("/projects/", response_model=List[schemas.Project])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_projects(db, skip=skip, limit=limit)
+def read_projects(cursor: Optional[str] = None, limit: int = 100, db: Session = Depends(get_db)):
+    page = crud.get_projects(db, cursor=cursor, limit=limit)
+    return fast_json.FastJSONResponse(
+        [fast_json.project_to_dict(p) for p in page.items],
+        headers=_page_headers(page),
+    )
 
 @app.get("/projects/{project_id}", response_model=schemas.Project)
 def read_project(project_id: UUID, db: Session = Depends(get_db)):
     db_project = crud.get_project(db, project_id=project_id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    return db_project
+    return fast_json.FastJSONResponse(fast_json.project_to_dict(db_project))
 
 @app.put("/projects/{project_id}", response_model=schemas.Project)
 def update_project(project_id: UUID, project: schemas.ProjectUpdate, db: Session = Depends(get_db)):
@@ -152,13 +150,18 @@ def update_project(project_id: UUID, project: schemas.ProjectUpdate, db: Session
 
 @app.delete("/projects/{project_id}", response_model=schemas.Project)
 def delete_project(project_id: UUID, db: Session = Depends(get_db)):
+    round_ids = crud.get_project_round_ids(db, project_id)
     db_project = crud.delete_project(db, project_id=project_id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    # Uložená PDF smazaných kol už nikdo nestáhne
+    for round_id in round_ids:
+        export_jobs.remove_round_exports(round_id)
     return db_project
 
 @app.post("/budgets/upload-excel")
 async def upload_budget_excel(
+    background_tasks: BackgroundTasks,
     project_id: UUID = Form(...),
     round_id: UUID = Form(...),
     name: Optional[str] = Form(None),
@@ -168,6 +171,7 @@ async def upload_budget_excel(
     offer_contact_email: Optional[str] = Form(None),
     offer_contact_phone: Optional[str] = Form(None),
     offer_last_changed_at: Optional[str] = Form(None),
+    detect_duplicates: bool = Form(False),
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
@@ -212,7 +216,7 @@ async def upload_budget_excel(
             else datetime.now(timezone.utc).isoformat()
         )
         # Always store a safe total_price for UI (prevents double counting across Excel variants).
-        computed_total = _compute_budget_total_price(
+        computed_total = budget_items.compute_budget_total_price(
             parent_info.get("items"),
             include_subsections=(data.get("type") == "type2"),
         )
@@ -239,7 +243,7 @@ async def upload_budget_excel(
             project_id=project_id,
             round_id=round_id,
             name=budget_name,
-            items=parent_info["items"],
+            items=crud.assign_catalog_ids(db, project_id, parent_info["items"]),
             file_path=file_location,
             labels=parent_labels,
             client_name=client_name,
@@ -249,6 +253,7 @@ async def upload_budget_excel(
         for i, item in enumerate(parent_info["items"][:20]):  # Log first 20 items
             print(f"  Parent item {i+1}: number='{item.get('number', '')}' name='{item.get('name', '')[:50]}' price={item.get('price', 0)}")
         db.add(parent_budget)
+        crud.touch_round(db, round_id)
         db.commit()
         db.refresh(parent_budget)
         
@@ -274,7 +279,7 @@ async def upload_budget_excel(
                 round_id=round_id,
                 parent_budget_id=parent_budget.id,
                 name=child_name,
-                items=child_items,
+                items=crud.assign_catalog_ids(db, project_id, child_items),
                 file_path=file_location,
                 labels=child_labels,
                 client_name=client_name,
@@ -285,8 +290,13 @@ async def upload_budget_excel(
             created_child_ids.append(child_budget.id)
             print(f"    Created child budget with id={child_budget.id}, parent_budget_id={child_budget.parent_budget_id}")
             
+        crud.touch_round(db, round_id)
         db.commit()
         print(f"Successfully created {len(data['child_budgets'])} child budgets with IDs: {created_child_ids}")
+
+        if detect_duplicates:
+            # Po odeslání odpovědi: nové názvy proti indexu názvů kola (duplicates.update_round_duplicates)
+            background_tasks.add_task(duplicates.update_round_duplicates_job, round_id)
         
         return {
             "message": "Budget processed successfully", 
@@ -306,19 +316,35 @@ def delete_project(project_id: UUID, db: Session = Depends(get_db)):
     return db_project
 
 # Rounds
+@app.get("/projects/{project_id}/item-catalog", response_model=List[schemas.ItemCatalogEntry])
+def get_item_catalog(project_id: UUID, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    return _page_items(response, crud.get_item_catalog_page(db, project_id, cursor=cursor, limit=limit))
+
+@app.post("/projects/{project_id}/item-catalog/backfill")
+def backfill_item_catalog(project_id: UUID, db: Session = Depends(get_db)):
+    # Doplní catalog_id do položek rozpočtů nahraných před zavedením katalogu
+    if crud.get_project(db, project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return crud.backfill_item_catalog(db, project_id)
+
 @app.post("/rounds/", response_model=schemas.Round)
 def create_round(round: schemas.RoundCreate, db: Session = Depends(get_db)):
     return crud.create_round(db=db, round=round)
 
 @app.get("/projects/{project_id}/rounds/", response_model=List[schemas.Round])
-def read_rounds(project_id: UUID, db: Session = Depends(get_db)):
-    return crud.get_rounds_by_project(db, project_id=project_id)
+def read_rounds(project_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    page = crud.get_rounds_page(db, project_id=project_id, cursor=cursor, limit=limit)
+    return fast_json.FastJSONResponse(
+        [fast_json.round_to_dict(r) for r in page.items],
+        headers=_page_headers(page),
+    )
 
 @app.delete("/rounds/{round_id}", response_model=schemas.Round)
 def delete_round(round_id: UUID, db: Session = Depends(get_db)):
     db_round = crud.delete_round(db=db, round_id=round_id)
     if db_round is None:
         raise HTTPException(status_code=404, detail="Round not found")
+    export_jobs.remove_round_exports(round_id)
     return db_round
 
 # Budgets
@@ -361,9 +387,10 @@ async def create_budget(
     )
     return crud.create_budget(db=db, budget=budget_data)
 
-@app.get("/rounds/{round_id}/budgets/", response_model=List[schemas.Budget])
-def read_budgets(round_id: UUID, db: Session = Depends(get_db)):
-    budgets = crud.get_budgets_by_round(db, round_id=round_id)
+def _render_budgets_page(db: Session, round_id: UUID, cursor: Optional[str], limit: Optional[int]):
+    # limit = počet kořenových rozpočtů na stránku; jejich child budgety jsou vždy ve stejné stránce
+    page = crud.get_budgets_page(db, round_id=round_id, cursor=cursor, limit=limit)
+    budgets = page.items
     print(f"[API] Returning {len(budgets)} budgets for round_id={round_id}")
     root_count = sum(1 for b in budgets if not b.parent_budget_id)
     child_count = sum(1 for b in budgets if b.parent_budget_id)
@@ -405,7 +432,100 @@ def read_budgets(round_id: UUID, db: Session = Depends(get_db)):
                         print(f"[API]   Enriched item '{code}' ({name[:30]}): {old_price} -> {total}")
         if enriched_count > 0:
             print(f"[API] Root budget id={b.id} name='{b.name}': enriched {enriched_count}/{len(b.items)} parent items from {len(children)} children")
-    return budgets
+    # Položky jsou v DB už zvalidované – bez pydantic průchodu každým prvkem, rovnou orjson.
+    return fast_json.dumps(fast_json.budgets_to_list(budgets)), page.next_cursor
+
+@app.get("/rounds/{round_id}/budgets/", response_model=List[schemas.Budget])
+def read_budgets(round_id: UUID, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    # Obohacená a serializovaná odpověď se cachuje podle revize kola – po zápisu se revize zvýší.
+    revision = crud.get_round_revision(db, round_id)
+    cache_key = round_cache.make_key("budgets", round_id, revision, cursor, limit)
+    cached = round_cache.get(cache_key) if revision is not None else None
+    if cached is None:
+        cached = _render_budgets_page(db, round_id, cursor, limit)
+        if revision is not None:
+            round_cache.set(cache_key, cached, size=len(cached[0]))
+    body, next_cursor = cached
+    headers = {pagination.NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+@app.get("/rounds/{round_id}/matrix")
+def read_round_matrix(round_id: UUID, request: Request, db: Session = Depends(get_db)):
+    """
+    Srovnávací matice kola (položky × rozpočty) s pořadím řádků, min/max v řádku a součty.
+    ETag je revize kola; s If-None-Match na aktuální revizi vrací 304 bez výpočtu matice.
+    """
+    revision = crud.get_round_revision(db, round_id)
+    if revision is None:
+        raise HTTPException(status_code=404, detail="Round not found")
+    if _etag_matches(request, f'"{round_id}-{revision}"'):
+        return Response(status_code=304, headers={"ETag": f'"{round_id}-{revision}"'})
+    matrix = round_matrix.get_round_matrix(db, round_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="Round not found")
+    return fast_json.FastJSONResponse(matrix, headers={"ETag": f'"{round_id}-{matrix["revision"]}"'})
+
+
+@app.get("/rounds/{round_id}/item-stats")
+def read_round_item_stats(round_id: UUID, outlier_factor: float = 1.5, db: Session = Depends(get_db)):
+    """Statistika cen každé položky napříč firmami kola: min/max/medián, odchylky od mediánu, odlehlé ceny."""
+    matrix = round_matrix.get_round_matrix(db, round_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="Round not found")
+    stats = round_matrix.compute_item_statistics(matrix, outlier_factor=outlier_factor)
+    stats["round_id"] = round_id
+    stats["revision"] = matrix["revision"]
+    return fast_json.FastJSONResponse(stats)
+
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    """Počítadla cache odvozených pohledů (hits/misses/evictions) pro nastavení ROUND_CACHE_MAX_BYTES."""
+    return {**round_cache.stats(), "chat_answers": chat_cache.cache.stats(), "pdf_charts": chart_cache.cache.stats()}
+
+
+_NDJSON_ITEMS_PER_CHUNK = 500
+
+
+def _iter_round_ndjson(round_id: UUID):
+    # Vlastní session: generátor běží až po návratu z endpointu, kdy je session z Depends(get_db) zavřená.
+    db = SessionLocal()
+    try:
+        for budget in crud.iter_budgets_by_round(db, round_id):
+            line = fast_json.budget_to_dict(budget)
+            items = budget_items.normalize_items(line.pop("items")) or []
+            line = {"type": "budget", **line, "item_count": len(items)}
+            yield fast_json.dumps(line) + b"\n"
+            for start in range(0, len(items), _NDJSON_ITEMS_PER_CHUNK):
+                chunk = items[start:start + _NDJSON_ITEMS_PER_CHUNK]
+                yield b"".join(
+                    fast_json.dumps({"type": "item", "budget_id": budget.id, "position": start + offset, "item": item}) + b"\n"
+                    for offset, item in enumerate(chunk)
+                )
+    finally:
+        db.close()
+
+
+@app.get("/rounds/{round_id}/export.ndjson")
+def export_round_ndjson(round_id: UUID, db: Session = Depends(get_db)):
+    """
+    Streamuje všechny rozpočty kola jako NDJSON: řádek `{"type": "budget", ...}` (bez položek)
+    a za ním řádky `{"type": "item", "budget_id", "position", "item"}`. Paměť je konstantní.
+    """
+    if not db.query(models.Round.id).filter(models.Round.id == round_id).first():
+        raise HTTPException(status_code=404, detail="Round not found")
+    return StreamingResponse(
+        _iter_round_ndjson(round_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="round_{round_id}.ndjson"'},
+    )
 
 @app.delete("/budgets/{budget_id}")
 def delete_budget(budget_id: UUID, db: Session = Depends(get_db)):
@@ -414,6 +534,26 @@ def delete_budget(budget_id: UUID, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Budget not found")
     return {"message": "Budget deleted successfully"}
 
+@app.patch("/budgets/{budget_id}/items")
+def patch_budget_items(budget_id: UUID, patch: schemas.BudgetItemsPatch, db: Session = Depends(get_db)):
+    try:
+        db_budget = crud.patch_budget_items(db, budget_id, patch)
+    except budget_items.VersionConflict as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={"message": str(e), "version": e.actual})
+    except budget_items.ItemPatchError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    if db_budget is None:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    # Bez položek – klient už je má a změny zná; vrací se jen nová verze a součet
+    return {
+        "id": db_budget.id,
+        "version": db_budget.version,
+        "items_count": len(budget_items.normalize_items(db_budget.items) or []),
+        "total_price": (db_budget.labels or {}).get("total_price"),
+    }
+
 @app.put("/budgets/{budget_id}", response_model=schemas.Budget)
 def update_budget(budget_id: UUID, budget_update: schemas.BudgetUpdate, db: Session = Depends(get_db)):
     db_budget = crud.update_budget(db, budget_id, budget_update)
@@ -426,8 +566,8 @@ def create_budget_note(budget_id: UUID, note: schemas.BudgetNoteCreate, db: Sess
     return crud.create_budget_note(db, budget_id, note)
 
 @app.get("/budgets/{budget_id}/notes/", response_model=List[schemas.BudgetNote])
-def read_budget_notes(budget_id: UUID, db: Session = Depends(get_db)):
-    return crud.get_budget_notes(db, budget_id)
+def read_budget_notes(budget_id: UUID, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    return _page_items(response, crud.get_budget_notes(db, budget_id, cursor=cursor, limit=limit))
 
 # Promote
 @app.post("/promote/", response_model=schemas.Round)
@@ -438,11 +578,12 @@ def promote_round(promote_req: schemas.PromoteRequest, db: Session = Depends(get
     return new_round
 
 # Chat
-@app.post("/chat/", response_model=schemas.ChatHistory)
-async def chat_with_project(chat_req: schemas.ChatRequest, db: Session = Depends(get_db)):
-    if not model:
-        raise HTTPException(status_code=503, detail="Gemini API not configured")
-
+def _prepare_chat_prompt(db: Session, chat_req: schemas.ChatRequest):
+    """
+    Blokující část (DB, sestavení kontextu) – volá se přes asyncio.to_thread.
+    Vrací (prompt, klíč cache odpovědí, odpověď z cache). Při zásahu v cache je prompt
+    None a model se nevolá.
+    """
     # 1. Save User Message
     user_msg = schemas.ChatHistoryCreate(
         project_id=chat_req.project_id,
@@ -452,8 +593,18 @@ async def chat_with_project(chat_req: schemas.ChatRequest, db: Session = Depends
     )
     crud.create_chat_history(db, user_msg)
 
+    # Stejná otázka nad stejnou revizí projektu – odpověď z cache
+    revision = crud.get_project_revision(db, chat_req.project_id)
+    cache_key = chat_cache.make_key(chat_req.project_id, revision, chat_req.message) if revision is not None else None
+    cached_answer = chat_cache.cache.get(cache_key) if cache_key is not None else None
+    if cached_answer is not None:
+        return None, cache_key, cached_answer
+
     # 2. Build Context
     context_data = generate_project_context(db, chat_req.project_id)
+    relevant = chat_retrieval.retrieve(db, chat_req.project_id, chat_req.message)
+    if relevant["text"]:
+        context_data += f"\nPoložky nejvíce související s otázkou:\n{relevant['text']}\n"
     system_prompt = f"""Jsi zkušený analytik nákupu a rozpočtů.
     Zde jsou data pro aktuální projekt:
     {context_data}
@@ -463,56 +614,206 @@ async def chat_with_project(chat_req: schemas.ChatRequest, db: Session = Depends
     
     Otázka uživatele: {chat_req.message}
     """
+    return system_prompt, cache_key, None
 
-    # 3. Call Gemini
-    try:
-        response = model.generate_content(system_prompt)
-        # Check if response has text (it might be blocked)
-        if hasattr(response, 'text'):
-            ai_text = response.text
-        else:
-            ai_text = "I'm sorry, I couldn't generate a response (Safety/Filter)."
-    except Exception as e:
-        # Instead of failing the request, respond with the error so the user sees it
-        ai_text = f"I encountered an error: {str(e)}"
-
-    # 4. Save AI Message
+def _save_chat_answer(db: Session, chat_req: schemas.ChatRequest, ai_text: str):
     ai_msg = schemas.ChatHistoryCreate(
         project_id=chat_req.project_id,
         session_id=chat_req.session_id,
         role="model",
         content=ai_text
     )
-    saved_ai_msg = crud.create_chat_history(db, ai_msg)
-    
-    # Auto-name session if it is new and unnamed (first user message)
-    if chat_req.session_id:
-        session = crud.get_chat_session(db, chat_req.session_id)
-        if session and session.name == "New Chat":
-            # Generate a short title based on the first user message
-            try:
-                # Ask Gemini to summarize into a title
-                 # Using the same model instance
-                title_prompt = f"Summarize this query into a very short 3-5 words title: {chat_req.message}"
-                title_response = model.generate_content(title_prompt)
-                if hasattr(title_response, 'text'):
-                     crud.update_chat_session(db, chat_req.session_id, title_response.text.strip())
-            except:
-                pass # Fail silently, keep "New Chat"
+    return crud.create_chat_history(db, ai_msg)
+
+def _save_chat_answer_new_session(chat_req: schemas.ChatRequest, ai_text: str) -> dict:
+    # Konec streamu už běží mimo životnost request session – vlastní session
+    db = SessionLocal()
+    try:
+        return fast_json.chat_history_to_dict(_save_chat_answer(db, chat_req, ai_text))
+    finally:
+        db.close()
+
+def _model_error_text(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return f"Model did not respond within {chat_models.MODEL_TIMEOUT:g} s"
+    return str(error)
+
+NEW_CHAT_NAME = "New Chat"
+_FALLBACK_TITLE_WORDS = 6
+_FALLBACK_TITLE_MAX_LEN = 60
+
+def _fallback_session_title(message: str) -> Optional[str]:
+    # Okamžitý název z prvních slov otázky; lepší název od modelu doplní _title_session_job
+    words = message.split()
+    if not words:
+        return None
+    title = " ".join(words[:_FALLBACK_TITLE_WORDS]).rstrip(" ?!.,:;")
+    if len(title) > _FALLBACK_TITLE_MAX_LEN:
+        title = title[:_FALLBACK_TITLE_MAX_LEN - 1].rstrip() + "…"
+    if len(words) > _FALLBACK_TITLE_WORDS and not title.endswith("…"):
+        title += "…"
+    return title or None
+
+def _apply_fallback_title(db: Session, chat_req: schemas.ChatRequest) -> Optional[str]:
+    """Nové session („New Chat“) dá hned náhradní název; vrací ho, jinak None (session už název má)."""
+    if not chat_req.session_id:
+        return None
+    title = _fallback_session_title(chat_req.message)
+    if title and crud.rename_chat_session_if(db, chat_req.session_id, NEW_CHAT_NAME, title):
+        return title
+    return None
+
+async def _title_session_job(session_id: UUID, message: str, fallback_title: str):
+    """
+    Background task po odeslání odpovědi: název od modelu nahradí náhradní název,
+    pokud ho mezitím nikdo nezměnil. Klient ho uvidí při dalším načtení sessions.
+    """
+    try:
+        title_prompt = f"Summarize this query into a very short 3-5 words title: {message}"
+        title = await chat_models.generate_async(model, title_prompt)
+    except Exception as e:
+        print(f"[Chat] Session title generation failed for session_id={session_id}: {e}")
+        return
+    title = (title or "").strip().strip('"')
+    if not title:
+        return
+
+    def save():
+        db = SessionLocal()
+        try:
+            crud.rename_chat_session_if(db, session_id, fallback_title, title)
+        finally:
+            db.close()
+
+    await asyncio.to_thread(save)
+
+@app.post("/chat/", response_model=schemas.ChatHistory)
+async def chat_with_project(chat_req: schemas.ChatRequest, background_tasks: BackgroundTasks, response: Response, db: Session = Depends(get_db)):
+    if not model:
+        raise HTTPException(status_code=503, detail="Gemini API not configured")
 
+    system_prompt, cache_key, ai_text = await asyncio.to_thread(_prepare_chat_prompt, db, chat_req)
+    fallback_title = await asyncio.to_thread(_apply_fallback_title, db, chat_req)
+    response.headers[CHAT_CACHE_HEADER] = "hit" if ai_text is not None else "miss"
+
+    # 3. Call the model (ve vlákně, s limitem souběhu a časovým limitem)
+    if ai_text is None:
+        try:
+            ai_text = await chat_models.generate_async(model, system_prompt)
+            if ai_text is None:
+                ai_text = chat_models.BLOCKED_RESPONSE
+            elif cache_key is not None:
+                chat_cache.cache.set(cache_key, ai_text)
+        except Exception as e:
+            # Instead of failing the request, respond with the error so the user sees it
+            ai_text = f"I encountered an error: {_model_error_text(e)}"
+
+    # 4. Save AI Message
+    saved_ai_msg = await asyncio.to_thread(_save_chat_answer, db, chat_req, ai_text)
+    if fallback_title:
+        # Název session od modelu až po odeslání odpovědi – první zpráva nečeká na druhé volání modelu
+        background_tasks.add_task(_title_session_job, chat_req.session_id, chat_req.message, fallback_title)
     return saved_ai_msg
 
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + fast_json.dumps(data) + b"\n\n"
+
+@app.post("/chat/stream")
+async def chat_with_project_stream(chat_req: schemas.ChatRequest, db: Session = Depends(get_db)):
+    """
+    Stejné jako POST /chat/, ale odpověď chodí jako Server-Sent Events:
+    u nové session nejdřív `session` {"id", "name"} s náhradním názvem, pak `chunk`
+    {"text"} pro každou část, případně `error` {"detail"}, nakonec `done` s uloženou
+    zprávou (chat_history). Do historie se ukládá celá odpověď po skončení streamu –
+    i když se klient odpojí dřív. Název od modelu se doplní na pozadí po streamu.
+    """
+    if not model:
+        raise HTTPException(status_code=503, detail="Gemini API not configured")
+
+    system_prompt, cache_key, cached_answer = await asyncio.to_thread(_prepare_chat_prompt, db, chat_req)
+    fallback_title = await asyncio.to_thread(_apply_fallback_title, db, chat_req)
+
+    async def model_chunks():
+        if cached_answer is not None:
+            yield cached_answer
+            return
+        async for chunk in chat_models.stream_async(model, system_prompt):
+            yield chunk
+
+    async def events():
+        parts = []
+        error = None
+        saved = None
+        if fallback_title:
+            yield _sse("session", {"id": chat_req.session_id, "name": fallback_title})
+        try:
+            try:
+                async for chunk in model_chunks():
+                    parts.append(chunk)
+                    yield _sse("chunk", {"text": chunk})
+            except Exception as e:
+                error = _model_error_text(e)
+
+            if error and not parts:
+                ai_text = f"I encountered an error: {error}"
+            else:
+                ai_text = "".join(parts) or chat_models.BLOCKED_RESPONSE
+                if not error and parts and cached_answer is None and cache_key is not None:
+                    chat_cache.cache.set(cache_key, ai_text)
+            saved = asyncio.ensure_future(asyncio.to_thread(_save_chat_answer_new_session, chat_req, ai_text))
+            message = await saved
+            if error:
+                yield _sse("error", {"detail": error})
+            yield _sse("done", message)
+        finally:
+            if saved is None and parts:
+                # Klient se odpojil uprostřed streamu – uložit aspoň to, co model stihl poslat
+                asyncio.get_running_loop().run_in_executor(
+                    None, _save_chat_answer_new_session, chat_req, "".join(parts)
+                )
+
+    background = (
+        BackgroundTask(_title_session_job, chat_req.session_id, chat_req.message, fallback_title)
+        if fallback_title else None
+    )
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                 CHAT_CACHE_HEADER: "hit" if cached_answer is not None else "miss"},
+        background=background,
+    )
+
+@app.get("/projects/{project_id}/chat/context")
+def get_project_chat_context(project_id: UUID, include_text: bool = False, db: Session = Depends(get_db)):
+    # Report velikosti kontextu, který chat posílá modelu (znaky, odhad tokenů, kolik položek se vešlo)
+    context = chat_context.get_project_context(db, project_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if include_text:
+        return {**context["report"], "text": context["text"]}
+    return context["report"]
+
+@app.get("/projects/{project_id}/chat/retrieve")
+def retrieve_chat_items(project_id: UUID, q: str, token_budget: int = chat_retrieval.TOKEN_BUDGET, db: Session = Depends(get_db)):
+    # Ladění výběru položek, které chat k otázce přidá do promptu
+    if crud.get_project(db, project_id) is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    result = chat_retrieval.retrieve(db, project_id, q, token_budget=token_budget)
+    return {"approx_tokens": result["approx_tokens"], "hits": result["hits"]}
+
 @app.get("/projects/{project_id}/chat/", response_model=List[schemas.ChatHistory])
-def get_project_chat_history(project_id: UUID, session_id: Optional[UUID] = None, db: Session = Depends(get_db)):
-    return crud.get_chat_history(db, project_id, session_id)
+def get_project_chat_history(project_id: UUID, response: Response, session_id: Optional[UUID] = None,
+                             cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    return _page_items(response, crud.get_chat_history(db, project_id, session_id, cursor=cursor, limit=limit))
 
 @app.post("/projects/{project_id}/sessions/", response_model=schemas.ChatSession)
 def create_project_chat_session(project_id: UUID, db: Session = Depends(get_db)):
-    return crud.create_chat_session(db, schemas.ChatSessionCreate(project_id=project_id, name="New Chat"))
+    return crud.create_chat_session(db, schemas.ChatSessionCreate(project_id=project_id, name=NEW_CHAT_NAME))
 
 @app.get("/projects/{project_id}/sessions/", response_model=List[schemas.ChatSession])
-def get_project_chat_sessions(project_id: UUID, db: Session = Depends(get_db)):
-    return crud.get_project_chat_sessions(db, project_id)
+def get_project_chat_sessions(project_id: UUID, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    return _page_items(response, crud.get_project_chat_sessions(db, project_id, cursor=cursor, limit=limit))
 
 @app.delete("/sessions/{session_id}")
 def delete_chat_session(session_id: UUID, db: Session = Depends(get_db)):
@@ -528,8 +829,8 @@ def create_duplicate(duplicate: schemas.RoundDuplicateCreate, db: Session = Depe
     return crud.create_duplicate(db=db, duplicate=duplicate)
 
 @app.get("/rounds/{round_id}/duplicates/", response_model=List[schemas.RoundDuplicate])
-def get_round_duplicates(round_id: UUID, db: Session = Depends(get_db)):
-    return crud.get_duplicates_by_round(db, round_id=round_id)
+def get_round_duplicates(round_id: UUID, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    return _page_items(response, crud.get_duplicates_by_round(db, round_id=round_id, cursor=cursor, limit=limit))
 
 @app.delete("/rounds/duplicates/{duplicate_id}")
 def delete_duplicate(duplicate_id: UUID, db: Session = Depends(get_db)):
@@ -539,140 +840,121 @@ def delete_duplicate(duplicate_id: UUID, db: Session = Depends(get_db)):
 def merge_round_items(round_id: UUID, merge_req: schemas.MergeItemsRequest, db: Session = Depends(get_db)):
     return crud.merge_round_items(db, round_id, merge_req)
 
-@app.post("/rounds/{round_id}/detect-duplicates", response_model=List[schemas.RoundDuplicate])
-def detect_duplicates(round_id: UUID, db: Session = Depends(get_db)):
-    # 1. Clear existing duplicates for this round
-    existing_duplicates = crud.get_duplicates_by_round(db, round_id)
-    for dup in existing_duplicates:
-        crud.delete_duplicate(db, dup.id)
-
-    # 2. Get budgets to compare
-    budgets = crud.get_budgets_by_round(db, round_id)
-    duplicates_found = []
-
-    # Collect all unique item names
-    all_items = set()
-    print(f"Detecting duplicates for round {round_id}")
-    for budget in budgets:
-        items = budget.items or []
-        print(f"Budget {budget.name} raw items type: {type(items)}")
-        
-        # Ensure items is list
-        if isinstance(items, str):
-            try:
-                items = json.loads(items)
-            except:
-                print(f"Failed to parse items string for budget {budget.name}")
-                items = []
-        
-        # Handle dict wrapper (common if parsed from some sources)
-        if isinstance(items, dict):
-            if "list" in items and isinstance(items["list"], list):
-                items = items["list"]
-            else:
-                items = [items]
-        
-        if not isinstance(items, list):
-            items = []
-            
-        for item in items:
-            if isinstance(item, dict):
-                name = item.get("name")
-                if name:
-                     all_items.add(name.strip())
-
-    unique_names = list(all_items)
-    print(f"Found {len(unique_names)} unique items: {unique_names}")
-    n = len(unique_names)
-
-    # 3. Compare iteratively
-    for i in range(n):
-        for j in range(i + 1, n):
-            name1 = unique_names[i]
-            name2 = unique_names[j]
-
-            match_type = None
-            score = 0.0
-
-            # Logic
-            if name1 == name2:
-                continue 
-            
-            if name1.lower() == name2.lower():
-                match_type = "case_insensitive"
-                score = 1.0
-            else:
-                # Fuzzy match
-                ratio = difflib.SequenceMatcher(None, name1.lower(), name2.lower()).ratio()
-                if ratio > 0.85:
-                    match_type = "fuzzy"
-                    score = ratio
-
-            if match_type:
-                print(f"Match found: {name1} vs {name2} ({match_type}, {score})")
-                data = {
-                    "item_a_name": name1,
-                    "item_b_name": name2,
-                    "match_type": match_type,
-                    "similarity": round(score, 2)
-                }
-                
-                dup_create = schemas.RoundDuplicateCreate(
-                    round_id=round_id,
-                    data=data
-                )
-                
-                created_dup = crud.create_duplicate(db, dup_create)
-                duplicates_found.append(created_dup)
+@app.post("/rounds/{round_id}/merge-items/batch")
+def merge_round_items_batch(round_id: UUID, batch_req: schemas.MergeItemsBatchRequest, db: Session = Depends(get_db)):
+    if crud.get_round_revision(db, round_id) is None:
+        raise HTTPException(status_code=404, detail="Round not found")
+    return fast_json.FastJSONResponse(crud.merge_round_items_batch(db, round_id, batch_req.operations, dry_run=batch_req.dry_run))
 
-    return duplicates_found
+@app.post("/rounds/{round_id}/detect-duplicates", response_model=List[schemas.RoundDuplicate])
+def detect_duplicates(round_id: UUID, time_budget: Optional[float] = None, db: Session = Depends(get_db)):
+    # Celá detekce (blocking + přesný ratio, viz duplicates.py); nahradí předchozí výsledky i index názvů kola.
+    # time_budget (s): po vypršení vrátí, co stihla, s hlavičkou X-Duplicates-Complete: false
+    rows, complete = duplicates.detect_round_duplicates(db, round_id, time_budget=time_budget)
+    return fast_json.FastJSONResponse(rows, headers={DUPLICATES_COMPLETE_HEADER: "true" if complete else "false"})
+
+@app.post("/budgets/{budget_id}/detect-duplicates")
+def detect_budget_duplicates(budget_id: UUID, db: Session = Depends(get_db)):
+    # Inkrementálně: názvy kola, které ještě nejsou v indexu názvů kola, proti indexu
+    db_budget = crud.get_budget(db, budget_id)
+    if db_budget is None:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return fast_json.FastJSONResponse(duplicates.update_round_duplicates(db, db_budget.round_id))
 
 # PDF Export
+def _check_chart_backend(charts: Optional[str]) -> None:
+    if charts is not None and charts not in pdf_export.CHART_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"charts must be one of: {', '.join(pdf_export.CHART_BACKENDS)}")
+
 @app.get("/rounds/{round_id}/export-pdf")
-async def export_round_pdf(round_id: UUID, db: Session = Depends(get_db)):
-    """Exportuje srovnání budgets do PDF s koláčovými grafy"""
+async def export_round_pdf(round_id: UUID, charts: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Exportuje srovnání budgets do PDF s koláčovými grafy (charts=raster|vector, výchozí PDF_CHART_BACKEND).
+    Hotové PDF se drží podle revize kola – opakované stažení beze změn je jen čtení souboru.
+    """
+    _check_chart_backend(charts)
     try:
-        # Vytvořit dočasný soubor pro PDF
-        output_dir = "uploads/exports"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"export_{round_id}.pdf")
-        
-        # Vygenerovat PDF
-        pdf_export.generate_pdf_export(round_id, db, output_path)
-        
-        # Vrátit soubor jako response
+        output_path, _ = await asyncio.to_thread(export_jobs.get_or_build_round_pdf, db, round_id, charts)
         return FileResponse(
             output_path,
             media_type="application/pdf",
             filename=f"rozpocty_export_{round_id}.pdf"
         )
+    except export_jobs.RoundNotFound:
+        raise HTTPException(status_code=404, detail="Round not found")
     except Exception as e:
         print(f"PDF export error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
 
+def _export_job_response(job) -> dict:
+    return {
+        **job.to_dict(),
+        "status_url": f"/export-jobs/{job.id}",
+        "download_url": f"/export-jobs/{job.id}/download" if job.status == export_jobs.STATUS_DONE else None,
+    }
+
+@app.post("/rounds/{round_id}/export-pdf/jobs", status_code=202)
+def create_round_export_job(round_id: UUID, background_tasks: BackgroundTasks, charts: Optional[str] = None, db: Session = Depends(get_db)):
+    # Export na pozadí: klient se ptá na GET /export-jobs/{id} a po "done" stáhne download_url
+    _check_chart_backend(charts)
+    try:
+        job = export_jobs.create_round_job(db, round_id, charts)
+    except export_jobs.RoundNotFound:
+        raise HTTPException(status_code=404, detail="Round not found")
+    if job.status == export_jobs.STATUS_QUEUED:
+        background_tasks.add_task(export_jobs.run_round_job, job.id)
+    return _export_job_response(job)
+
+@app.get("/export-jobs/{job_id}")
+def get_export_job(job_id: str):
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return _export_job_response(job)
+
+@app.get("/export-jobs/{job_id}/download")
+def download_export_job(job_id: str):
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status == export_jobs.STATUS_FAILED:
+        raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {job.error}")
+    if job.status != export_jobs.STATUS_DONE:
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    if not os.path.isfile(job.path):
+        # Mezitím se kolo změnilo a starší revize exportu se smazala
+        raise HTTPException(status_code=410, detail="Export is outdated, start a new export job")
+    return FileResponse(
+        job.path,
+        media_type="application/pdf",
+        filename=f"rozpocty_export_{job.round_id}.pdf"
+    )
+
 
 # PDF Export - Summary (Souhrn kol)
 @app.get("/projects/{project_id}/export-summary-pdf")
 async def export_project_summary_pdf(project_id: UUID, db: Session = Depends(get_db)):
     """Exportuje souhrn vývoje cen mezi koly do PDF."""
+    workspace = tempfile.mkdtemp(prefix="summary_export_")
     try:
-        output_dir = "uploads/exports"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"summary_{project_id}.pdf")
+        # Vlastní pracovní adresář – souběžné exporty téhož projektu si soubor nepřepíšou
+        output_path = os.path.join(workspace, f"summary_{project_id}.pdf")
 
-        pdf_export.generate_summary_pdf_export(project_id, db, output_path)
+        await asyncio.to_thread(pdf_export.generate_summary_pdf_export, project_id, db, output_path)
 
         return FileResponse(
             output_path,
             media_type="application/pdf",
             filename=f"souhrn_kol_export_{project_id}.pdf",
+            background=BackgroundTask(shutil.rmtree, workspace, ignore_errors=True),
         )
     except Exception as e:
         print(f"Summary PDF export error: {e}")
         import traceback
 
         traceback.print_exc()
+        shutil.rmtree(workspace, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Failed to generate summary PDF: {str(e)}")
 
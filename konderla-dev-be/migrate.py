@@ -1,7 +1,23 @@
 from database import engine, Base
 from sqlalchemy import text
+import glob
+import os
 import models
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+def run_sql_migrations():
+    # SQL migrace jsou idempotentní (IF NOT EXISTS), proto se pouští vždy všechny v pořadí názvu souboru
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "*.sql"))):
+        print(f"Applying {os.path.basename(path)}...")
+        with open(path, encoding="utf-8") as f:
+            sql = f.read()
+        try:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(sql)
+        except Exception as e:
+            print(f"Info: {e}")
+
 def migrate():
     # Ensure tables exist (ChatSession)
     print("Creating tables if not exist...")
@@ -16,5 +32,7 @@ def migrate():
         except Exception as e:
             print(f"Info: {e}")
 
+    run_sql_migrations()
+
 if __name__ == "__main__":
     migrate()
@@ -0,0 +1,13 @@
+-- Migration: řadicí klíče a indexy pro keyset (cursor) stránkování list endpointů
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+ALTER TABLE budgets ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS ix_projects_created_at_id ON projects (created_at, id);
+CREATE INDEX IF NOT EXISTS ix_rounds_project_order_id ON rounds (project_id, "order", id);
+CREATE INDEX IF NOT EXISTS ix_round_duplicates_round_created_id ON round_duplicates (round_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_budgets_round_created_id ON budgets (round_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_budgets_parent_budget_id ON budgets (parent_budget_id);
+CREATE INDEX IF NOT EXISTS ix_budget_notes_budget_created_id ON budget_notes (budget_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_chat_sessions_project_created_id ON chat_sessions (project_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_chat_history_project_timestamp_id ON chat_history (project_id, "timestamp", id);
+CREATE INDEX IF NOT EXISTS ix_chat_history_session_timestamp_id ON chat_history (session_id, "timestamp", id);
@@ -0,0 +1,2 @@
+-- Migration: revize kola pro cache odvozených pohledů (srovnávací matice apod.)
+ALTER TABLE rounds ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,2 @@
+-- Migration: revize projektu (klíč pro cache odvozených pohledů projektu, např. kontext chatu)
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,34 @@
+-- Migration: ON DELETE CASCADE na cizích klíčích, aby mazání projektu / kola / rozpočtu
+-- bylo jedním příkazem bez načítání potomků do Pythonu.
+-- (Bez znaku procenta: exec_driver_sql by ho bral jako placeholder.)
+-- Omezení se přegeneruje jen tam, kde ještě není kaskádové (migrace se pouští při každém startu).
+DO $$
+DECLARE
+    fk RECORD;
+BEGIN
+    FOR fk IN
+        SELECT * FROM (VALUES
+            ('rounds', 'project_id', 'projects'),
+            ('round_duplicates', 'round_id', 'rounds'),
+            ('budgets', 'round_id', 'rounds'),
+            ('budgets', 'project_id', 'projects'),
+            ('budgets', 'parent_budget_id', 'budgets'),
+            ('budget_notes', 'budget_id', 'budgets'),
+            ('chat_sessions', 'project_id', 'projects'),
+            ('chat_history', 'project_id', 'projects'),
+            ('chat_history', 'session_id', 'chat_sessions')
+        ) AS t(tbl, col, ref)
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = fk.tbl || '_' || fk.col || '_fkey' AND confdeltype = 'c'
+        ) THEN
+            EXECUTE 'ALTER TABLE ' || quote_ident(fk.tbl)
+                || ' DROP CONSTRAINT IF EXISTS ' || quote_ident(fk.tbl || '_' || fk.col || '_fkey');
+            EXECUTE 'ALTER TABLE ' || quote_ident(fk.tbl)
+                || ' ADD CONSTRAINT ' || quote_ident(fk.tbl || '_' || fk.col || '_fkey')
+                || ' FOREIGN KEY (' || quote_ident(fk.col) || ') REFERENCES ' || quote_ident(fk.ref)
+                || ' (id) ON DELETE CASCADE';
+        END IF;
+    END LOOP;
+END $$;
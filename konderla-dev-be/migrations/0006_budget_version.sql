@@ -0,0 +1,2 @@
+-- Migration: verze položek rozpočtu pro optimistickou kontrolu při PATCH /budgets/{id}/items
+ALTER TABLE budgets ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
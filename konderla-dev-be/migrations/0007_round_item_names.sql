@@ -0,0 +1,8 @@
+-- Migration: index názvů položek kola pro inkrementální detekci duplicit
+CREATE TABLE IF NOT EXISTS round_item_names (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    round_id UUID NOT NULL REFERENCES rounds(id) ON DELETE CASCADE,
+    name VARCHAR NOT NULL,
+    bigrams JSON
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_round_item_names_round_name ON round_item_names (round_id, name);
@@ -0,0 +1,9 @@
+-- Migration: katalog položek projektu (normalizovaný název -> int id, viz item_catalog.py)
+CREATE TABLE IF NOT EXISTS item_catalog (
+    id BIGSERIAL PRIMARY KEY,
+    project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    normalized_name VARCHAR NOT NULL,
+    name VARCHAR NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_item_catalog_project_name ON item_catalog (project_id, normalized_name);
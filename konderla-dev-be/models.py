@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, text
+from sqlalchemy import Column, BigInteger, Integer, String, Float, ForeignKey, DateTime, JSON, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
@@ -13,41 +13,75 @@ class Project(Base):
     description = Column(String, nullable=True)
     client_name = Column(String, nullable=True)
     client_project_name = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Zvyšuje se s každou změnou projektu nebo jeho kol (crud.touch_round / update_project)
+    revision = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
-    rounds = relationship("Round", back_populates="project", cascade="all, delete-orphan")
-    chat_history = relationship("ChatHistory", back_populates="project", cascade="all, delete-orphan")
-    chat_sessions = relationship("ChatSession", back_populates="project", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_projects_created_at_id", "created_at", "id"),)
+
+    rounds = relationship("Round", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    chat_history = relationship("ChatHistory", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    chat_sessions = relationship("ChatSession", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
 
 class Round(Base):
     __tablename__ = "rounds"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"), index=True)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"))
     name = Column(String)
     order = Column(Integer)
     status = Column(String, default="open")  # open, closed
+    # Zvyšuje se při každém zápisu rozpočtů kola (crud.touch_round) – klíč pro cache odvozených pohledů
+    revision = Column(Integer, nullable=False, default=0, server_default=text("0"))
+
+    __table_args__ = (Index("ix_rounds_project_order_id", "project_id", "order", "id"),)
 
     project = relationship("Project", back_populates="rounds")
-    budgets = relationship("Budget", back_populates="round", cascade="all, delete-orphan")
-    duplicates = relationship("RoundDuplicate", back_populates="round", cascade="all, delete-orphan")
+    budgets = relationship("Budget", back_populates="round", cascade="all, delete-orphan", passive_deletes=True)
+    duplicates = relationship("RoundDuplicate", back_populates="round", cascade="all, delete-orphan", passive_deletes=True)
 
 class RoundDuplicate(Base):
     __tablename__ = "round_duplicates"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"), index=True)
-    round_id = Column(UUID(as_uuid=True), ForeignKey("rounds.id"))
+    round_id = Column(UUID(as_uuid=True), ForeignKey("rounds.id", ondelete="CASCADE"))
     data = Column(JSON) # { "original_item": ..., "new_item": ..., "similarity": float }
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_round_duplicates_round_created_id", "round_id", "created_at", "id"),)
+
     round = relationship("Round", back_populates="duplicates")
 
+class RoundItemName(Base):
+    # Index názvů položek kola pro inkrementální detekci duplicit (duplicates.update_round_duplicates)
+    __tablename__ = "round_item_names"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"))
+    round_id = Column(UUID(as_uuid=True), ForeignKey("rounds.id", ondelete="CASCADE"), nullable=False)
+    name = Column(String, nullable=False)
+    bigrams = Column(JSON)  # signatura lowercase názvu {bigram: počet}
+
+    __table_args__ = (Index("ux_round_item_names_round_name", "round_id", "name", unique=True),)
+
+class ItemCatalogEntry(Base):
+    # Katalog položek projektu: normalizovaný název -> int id ukládané do položek (item_catalog.py)
+    __tablename__ = "item_catalog"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    normalized_name = Column(String, nullable=False)
+    name = Column(String, nullable=False)  # první zápis názvu, pod kterým se položka objevila
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("ux_item_catalog_project_name", "project_id", "normalized_name", unique=True),)
+
 class Budget(Base):
     __tablename__ = "budgets"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"), index=True)
-    round_id = Column(UUID(as_uuid=True), ForeignKey("rounds.id"))
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
-    parent_budget_id = Column(UUID(as_uuid=True), ForeignKey("budgets.id"), nullable=True)
+    round_id = Column(UUID(as_uuid=True), ForeignKey("rounds.id", ondelete="CASCADE"))
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"))
+    parent_budget_id = Column(UUID(as_uuid=True), ForeignKey("budgets.id", ondelete="CASCADE"), nullable=True)
     
     name = Column(String)
     notes = Column(String, nullable=True)
@@ -59,41 +93,58 @@ class Budget(Base):
     labels = Column(JSON, default={})
     items = Column(JSON, default=[]) # list[dict(name: str, price: float)]
     dynamic_fields = Column(JSON, default={})
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Zvyšuje se s každým zápisem položek – optimistická kontrola souběžných úprav (PATCH items)
+    version = Column(Integer, nullable=False, default=0, server_default=text("0"))
+
+    __table_args__ = (
+        Index("ix_budgets_round_created_id", "round_id", "created_at", "id"),
+        Index("ix_budgets_parent_budget_id", "parent_budget_id"),
+    )
 
     round = relationship("Round", back_populates="budgets")
-    parent = relationship("Budget", remote_side=[id], backref=backref("children", cascade="all, delete-orphan"))
-    notes_history = relationship("BudgetNote", back_populates="budget", cascade="all, delete-orphan")
+    parent = relationship("Budget", remote_side=[id], backref=backref("children", cascade="all, delete-orphan", passive_deletes=True))
+    notes_history = relationship("BudgetNote", back_populates="budget", cascade="all, delete-orphan", passive_deletes=True)
 
 class BudgetNote(Base):
     __tablename__ = "budget_notes"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"), index=True)
-    budget_id = Column(UUID(as_uuid=True), ForeignKey("budgets.id"))
+    budget_id = Column(UUID(as_uuid=True), ForeignKey("budgets.id", ondelete="CASCADE"))
     content = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_budget_notes_budget_created_id", "budget_id", "created_at", "id"),)
+
     budget = relationship("Budget", back_populates="notes_history")
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"), index=True)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"))
     name = Column(String, default="New Chat")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (Index("ix_chat_sessions_project_created_id", "project_id", "created_at", "id"),)
+
     project = relationship("Project", back_populates="chat_sessions")
-    history = relationship("ChatHistory", back_populates="session", cascade="all, delete-orphan")
+    history = relationship("ChatHistory", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, server_default=text("gen_random_uuid()"), index=True)
-    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id"))
-    session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id"), nullable=True)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"))
+    session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=True)
     role = Column(String) # user, model
     content = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_chat_history_project_timestamp_id", "project_id", "timestamp", "id"),
+        Index("ix_chat_history_session_timestamp_id", "session_id", "timestamp", "id"),
+    )
+
     project = relationship("Project", back_populates="chat_history")
     session = relationship("ChatSession", back_populates="history")
@@ -0,0 +1,81 @@
+"""
+Keyset (cursor) stránkování pro list endpointy.
+
+Kurzor je neprůhledný řetězec (base64 JSON) s hodnotami řadicího klíče posledního
+řádku stránky, např. (created_at, id). Další stránka se čte přes
+`WHERE (created_at, id) > (:c, :i)` nad indexem, takže cena stránky nezávisí
+na tom, kolik řádků už klient přečetl.
+"""
+import base64
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Sequence
+from uuid import UUID
+
+import orjson
+from sqlalchemy import literal, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = orjson.dumps([str(v) if isinstance(v, UUID) else v for v in values])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _coerce(value: Any, column) -> Any:
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if python_type is UUID and isinstance(value, str):
+        return UUID(value)
+    return value
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = orjson.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor shape mismatch")
+        return [_coerce(v, c) for v, c in zip(values, columns)]
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {e}") from e
+
+
+def paginate(query, columns: Sequence[Any], cursor: Optional[str] = None,
+             limit: Optional[int] = None, descending: bool = False) -> Page:
+    """
+    Seřadí dotaz podle `columns` (musí být unikátní kombinace, typicky končí `id`)
+    a vrátí jednu stránku. `limit=None` vrací vše (zpětná kompatibilita).
+    """
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        key = tuple_(*columns)
+        bound = tuple_(*[literal(v, c.type) for v, c in zip(values, columns)])
+        query = query.filter(key < bound if descending else key > bound)
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+
+    if limit is None:
+        return Page(query.all(), None)
+
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return Page(rows, next_cursor)
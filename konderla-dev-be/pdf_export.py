@@ -8,6 +8,9 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.graphics.shapes import Drawing, Group, Rect, String, Wedge
+from reportlab.graphics.charts.barcharts import VerticalBarChart
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
@@ -29,9 +32,16 @@ import hashlib
 import html
 import math
 import re
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
 from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
+import budget_items
+import chart_cache
 import crud
+import process_pool
+from round_cache import cache as round_cache
 from uuid import UUID
 from datetime import datetime
 
@@ -64,6 +74,20 @@ _CHART_FS_BAR_VALUE = 13
 _CHART_FIGSIZE = (10.8, 8.6)
 _MPL_FONT_SYNCED = False
 
+# Grafy v exportu kola: "raster" = PNG z matplotlib, "vector" = reportlab.graphics přímo v PDF
+# (řádově menší soubor a rychlejší build); volí se i pro jednotlivý export.
+CHART_BACKEND_RASTER = "raster"
+CHART_BACKEND_VECTOR = "vector"
+CHART_BACKENDS = (CHART_BACKEND_RASTER, CHART_BACKEND_VECTOR)
+PDF_CHART_BACKEND = os.getenv("PDF_CHART_BACKEND", CHART_BACKEND_RASTER)
+
+# Grafy rozpočtů exportu kola se kreslí na process poolu; 0/1 = v aktuálním procesu.
+PDF_CHART_WORKERS = int(os.getenv("PDF_CHART_WORKERS", str(min(4, os.cpu_count() or 1))))
+_chart_pool = process_pool.SpawnPool()
+# Zvýšit při změně vzhledu grafů – staré soubory v chart_cache pak nikdo nepřečte
+_CHART_RENDER_VERSION = 1
+_CHART_SETTINGS: Optional[Dict[str, Any]] = None
+
 
 def _find_czech_font_ttf_paths() -> Tuple[Optional[str], Optional[str]]:
     """
@@ -398,15 +422,8 @@ def _parse_price_fe(value: Any) -> Optional[float]:
 
 
 def _get_budget_items_fe(budget: Any) -> List[Dict[str, Any]]:
-    """Stejné jako `getBudgetItemsSafe` na stránce projektu (pole nebo `items.list`)."""
-    items = getattr(budget, "items", None)
-    if isinstance(items, list):
-        return [i for i in items if isinstance(i, dict)]
-    if isinstance(items, dict):
-        maybe_list = items.get("list")
-        if isinstance(maybe_list, list):
-            return [i for i in maybe_list if isinstance(i, dict)]
-    return []
+    """Položky rozpočtu podle `budget_items.normalize_items` (pole, `items.list`, JSON řetězec)."""
+    return budget_items.normalize_items(getattr(budget, "items", None)) or []
 
 
 def _truncate_ellipsis(text: str, max_len: int) -> str:
@@ -493,7 +510,7 @@ def budget_total_round_celek_row(budget: Any) -> float:
 
 def _chart_item_rows(budget: Any, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    Výběr řádků pro koláč / sloupce: stejná idea jako `main._compute_budget_total_price`.
+    Výběr řádků pro koláč / sloupce: stejná idea jako `budget_items.compute_budget_total_price`.
     Když je v rozpočtu číselné `labels.total_price` (typicky import/type1), počítají se jen
     řádky sekcí — ne všechny dílčí položky, aby součet ve grafu nebyl nafouknutý oproti
     „CELKOVÁ CENA“. Bez číselného labelu bereme všechny řádky jako při fallbacku ve webové tabulce.
@@ -502,7 +519,7 @@ def _chart_item_rows(budget: Any, items: List[Dict[str, Any]]) -> List[Dict[str,
     if not dict_items:
         return []
     if _label_total_price_if_js_number(budget) is not None:
-        # Stejně jako main._compute_budget_total_price – jen skutečné sekční hlavičky
+        # Stejně jako budget_items.compute_budget_total_price – jen skutečné sekční hlavičky
         section_items = [it for it in dict_items if it.get("is_section_header") is True]
         return section_items if section_items else dict_items
     return dict_items
@@ -650,18 +667,15 @@ _GAP_COLOR = "#94a3b8"
 _PIE_TOTAL_EPS = 0.5
 
 
-def create_pie_chart(
+def _pie_chart_data(
     items: List[Dict[str, Any]],
     budget: Any,
-    budget_name: str,
-    output_path: str,
     color_map: Optional[Dict[str, str]] = None,
     total_display: Optional[float] = None,
-):
+) -> Optional[Dict[str, Any]]:
     """
-    Koláč pro rozpočet. Řádky vycházejí z _chart_item_rows (sekce vs. všechny řádky).
-    Střed a součet řezů odpovídají řádku „CELKOVÁ CENA“ (total_display).
-    Pokud je celková cena vyšší než součet řezů, přidá se šedý řez „Rozdíl k celkové ceně“.
+    Data koláče (sdílí matplotlib i vektorová varianta): řezy, barvy, střed a popisky
+    legendy. None = rozpočet nemá položku s kladnou cenou.
     """
     if not items:
         return None
@@ -698,8 +712,6 @@ def create_pie_chart(
         # Nepodporovaný rozpor (label < součet položek): střed sjednotíme se součtem řezů
         td = None
 
-    _ensure_matplotlib_chart_font()
-
     prices = [e["price"] for e in entries]
     colors_list = []
     for e in entries:
@@ -707,7 +719,56 @@ def create_pie_chart(
             colors_list.append(_GAP_COLOR)
         else:
             colors_list.append(_color_for_label_mapped(str(e.get("color_key", e.get("name"))), color_map))
-    
+
+    # Celková hodnota doprostřed donutu = stejná logika jako „CELKOVÁ CENA“ (ne jen součet řezů před doplňkem).
+    total_price_value = float(td) if td is not None else float(sum(prices))
+
+    # Legenda: procenta vůči stejnému celku jako střed donutu
+    legend_labels = []
+    denom = total_price_value if total_price_value > 0 else (sum(prices) if prices else 0.0)
+    for e in entries:
+        label_name = (e["name"] or "").strip()
+        if len(label_name) > 34:
+            label_name = label_name[:34] + "..."
+        label = label_name
+        if denom > 0:
+            pct = (e["price"] / denom) * 100.0
+            label = f"{label} ({pct:.1f} %)"
+        legend_labels.append(label)
+
+    return {
+        "entries": entries,
+        "prices": prices,
+        "colors": colors_list,
+        "total": total_price_value,
+        "legend_labels": legend_labels,
+    }
+
+
+def create_pie_chart(
+    items: List[Dict[str, Any]],
+    budget: Any,
+    budget_name: str,
+    output_path: str,
+    color_map: Optional[Dict[str, str]] = None,
+    total_display: Optional[float] = None,
+):
+    """
+    Koláč pro rozpočet. Řádky vycházejí z _chart_item_rows (sekce vs. všechny řádky).
+    Střed a součet řezů odpovídají řádku „CELKOVÁ CENA“ (total_display).
+    Pokud je celková cena vyšší než součet řezů, přidá se šedý řez „Rozdíl k celkové ceně“.
+    """
+    data = _pie_chart_data(items, budget, color_map, total_display)
+    if data is None:
+        return None
+
+    _ensure_matplotlib_chart_font()
+
+    prices = data["prices"]
+    colors_list = data["colors"]
+    legend_labels = data["legend_labels"]
+    total_price_value = data["total"]
+
     fig_w, fig_h = _CHART_FIGSIZE
     fig, ax = plt.subplots(figsize=_CHART_FIGSIZE, facecolor="white")
     ax.set_facecolor("white")
@@ -731,7 +792,6 @@ def create_pie_chart(
         autotext.set_fontsize(11)
 
     # Celková hodnota doprostřed donutu = stejná logika jako „CELKOVÁ CENA“ (ne jen součet řezů před doplňkem).
-    total_price_value = float(td) if td is not None else float(sum(prices))
     ax.text(
         0,
         0,
@@ -743,18 +803,6 @@ def create_pie_chart(
         color='#1f2937',
     )
 
-    # Legenda: procenta vůči stejnému celku jako střed donutu
-    legend_labels = []
-    denom = total_price_value if total_price_value > 0 else (sum(prices) if prices else 0.0)
-    for e in entries:
-        label_name = (e["name"] or "").strip()
-        if len(label_name) > 34:
-            label_name = label_name[:34] + "..."
-        label = label_name
-        if denom > 0:
-            pct = (e["price"] / denom) * 100.0
-            label = f"{label} ({pct:.1f} %)"
-        legend_labels.append(label)
     # Čtverec v palcích: w*h_fig == h*w_fig → kruh při obdélníkovém plátně
     h_frac = 0.48
     w_frac = h_frac * (fig_h / fig_w)
@@ -784,14 +832,12 @@ def create_pie_chart(
     return output_path
 
 
-def create_bar_chart(
+def _bar_chart_data(
     items: List[Dict[str, Any]],
     budget: Any,
-    budget_name: str,
-    output_path: str,
     color_map: Optional[Dict[str, str]] = None,
-):
-    """Vytvoří sloupcový graf (TOP položky dle ceny) — stejná báze řádků jako koláč."""
+) -> Optional[Dict[str, Any]]:
+    """Data sloupcového grafu (TOP 8 dle ceny, jednotka osy Y); None = nic ke kreslení."""
     if not items:
         return None
 
@@ -806,12 +852,9 @@ def create_bar_chart(
     if not rows:
         return None
 
-    _ensure_matplotlib_chart_font()
-
     # TOP 8 položek podle ceny
     rows.sort(key=lambda x: x[1], reverse=True)
     rows = rows[:8]
-    names = [n[:28] + ("..." if len(n) > 28 else "") for n, _ in rows]
     prices = [p for _, p in rows]
     max_p = max(prices) if prices else 0.0
     if max_p < 1_000_000.0:
@@ -823,8 +866,38 @@ def create_bar_chart(
         y_unit = "mil. Kč"
         y_formatter = _plain_y_formatter_mil
 
+    return {
+        "names": [n[:28] + ("..." if len(n) > 28 else "") for n, _ in rows],
+        "prices": prices,
+        "y_values": y_values,
+        "y_unit": y_unit,
+        "y_formatter": y_formatter,
+        "colors": [_color_for_label_mapped(n, color_map) for n, _ in rows],
+    }
+
+
+def create_bar_chart(
+    items: List[Dict[str, Any]],
+    budget: Any,
+    budget_name: str,
+    output_path: str,
+    color_map: Optional[Dict[str, str]] = None,
+):
+    """Vytvoří sloupcový graf (TOP položky dle ceny) — stejná báze řádků jako koláč."""
+    data = _bar_chart_data(items, budget, color_map)
+    if data is None:
+        return None
+
+    _ensure_matplotlib_chart_font()
+
+    names = data["names"]
+    prices = data["prices"]
+    y_values = data["y_values"]
+    y_unit = data["y_unit"]
+    y_formatter = data["y_formatter"]
+    bar_colors = data["colors"]
+
     fig, ax = plt.subplots(figsize=_CHART_FIGSIZE, facecolor="white")
-    bar_colors = [_color_for_label_mapped(n, color_map) for n, _ in rows]
     bars = ax.bar(
         range(len(y_values)),
         y_values,
@@ -895,8 +968,330 @@ def create_bar_chart(
     return output_path
 
 
-def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
-    """Vygeneruje PDF: jedna srovnávací tabulka (řádky = položky, sloupce = rozpočty) + pod ní jeden graf na rozpočet."""
+# Vektorové grafy (reportlab.graphics): stejná data jako matplotlib, kreslené přímo do PDF.
+# Písmo se přepočítá z velikosti v matplotlib plátně na šířku grafu v PDF.
+_VECTOR_FONT_SCALE = 128 * mm / (_CHART_FIGSIZE[0] * 72)
+
+
+def _vector_font_size(size: float) -> float:
+    return max(round(size * _VECTOR_FONT_SCALE, 1), 5.0)
+
+
+def create_pie_drawing(
+    items: List[Dict[str, Any]],
+    budget: Any,
+    width: float,
+    height: float,
+    color_map: Optional[Dict[str, str]] = None,
+    total_display: Optional[float] = None,
+) -> Optional[Drawing]:
+    """Vektorová varianta create_pie_chart: donut se středem „CELKOVÁ CENA“ a legenda ve dvou sloupcích."""
+    data = _pie_chart_data(items, budget, color_map, total_display)
+    if data is None:
+        return None
+
+    drawing = Drawing(width, height)
+    prices = data["prices"]
+    sum_prices = float(sum(prices))
+    cx, cy = width / 2.0, height * 0.62
+    radius = height * 0.28
+    inner = radius * (1.0 - 0.52 / 1.05)
+    angle = 90.0
+    pct_size = _vector_font_size(11)
+    for price, color in zip(prices, data["colors"]):
+        sweep = 360.0 * price / sum_prices if sum_prices > 0 else 0.0
+        if sweep <= 0:
+            continue
+        drawing.add(Wedge(
+            cx, cy, radius, angle, angle + sweep,
+            radius1=inner, annular=True,
+            fillColor=HexColor(color), strokeColor=colors.white, strokeWidth=0.6,
+        ))
+        pct = sweep / 3.6
+        if pct >= 5:
+            mid = math.radians(angle + sweep / 2.0)
+            label_r = (radius + inner) / 2.0
+            drawing.add(String(
+                cx + label_r * math.cos(mid), cy + label_r * math.sin(mid) - pct_size / 3.0,
+                f"{pct:.0f}%", textAnchor="middle",
+                fontName=_CZECH_FONT_BOLD, fontSize=pct_size, fillColor=colors.white,
+            ))
+        angle += sweep
+
+    total_size = _vector_font_size(22)
+    drawing.add(String(
+        cx, cy - total_size / 3.0, f"{data['total']:,.0f}".replace(",", " "), textAnchor="middle",
+        fontName=_CZECH_FONT_BOLD, fontSize=total_size, fillColor=HexColor("#1f2937"),
+    ))
+
+    # Legenda jako u matplotlib (ncol=2): plní se po sloupcích
+    legend_size = _vector_font_size(_CHART_FS_LEGEND)
+    labels = data["legend_labels"]
+    rows = -(-len(labels) // 2)
+    line_h = legend_size * 1.55
+    swatch_w = legend_size * 1.9
+    col_widths = [
+        max(swatch_w + stringWidth(label, _CZECH_FONT, legend_size) for label in labels[col * rows:(col + 1) * rows])
+        for col in range(-(-len(labels) // rows))
+    ]
+    gap = legend_size * 2.0
+    col_x = [(width - sum(col_widths) - gap * (len(col_widths) - 1)) / 2.0]
+    for col_w in col_widths[:-1]:
+        col_x.append(col_x[-1] + col_w + gap)
+    top = cy - radius - legend_size * 1.8
+    for idx, (label, color) in enumerate(zip(labels, data["colors"])):
+        x = max(col_x[idx // rows], 0.0)
+        y = top - (idx % rows) * line_h
+        drawing.add(Rect(x, y, legend_size * 1.4, legend_size * 0.8, fillColor=HexColor(color), strokeColor=None))
+        drawing.add(String(
+            x + swatch_w, y, label,
+            fontName=_CZECH_FONT, fontSize=legend_size, fillColor=HexColor("#1f2937"),
+        ))
+    return drawing
+
+
+def create_bar_drawing(
+    items: List[Dict[str, Any]],
+    budget: Any,
+    width: float,
+    height: float,
+    color_map: Optional[Dict[str, str]] = None,
+) -> Optional[Drawing]:
+    """Vektorová varianta create_bar_chart: TOP 8 položek, popisky cen nad sloupci."""
+    data = _bar_chart_data(items, budget, color_map)
+    if data is None:
+        return None
+
+    drawing = Drawing(width, height)
+    tick_size = _vector_font_size(_CHART_FS_TICK)
+    value_size = _vector_font_size(_CHART_FS_BAR_VALUE)
+    y_values = data["y_values"]
+    ymax = max(y_values) if y_values else 0.0
+
+    chart = VerticalBarChart()
+    chart.x = width * 0.14
+    chart.y = height * 0.34
+    chart.width = width * 0.83
+    chart.height = height * 0.58
+    chart.data = [y_values]
+    chart.barSpacing = 0
+    chart.groupSpacing = chart.width / max(len(y_values), 1) * 0.18
+    chart.strokeColor = None
+    chart.bars.strokeColor = HexColor("#334155")
+    chart.bars.strokeWidth = 0.2
+    for idx, color in enumerate(data["colors"]):
+        chart.bars[(0, idx)].fillColor = HexColor(color)
+
+    chart.valueAxis.valueMin = 0
+    if ymax > 0:
+        chart.valueAxis.valueMax = ymax * 1.08
+    chart.valueAxis.labelTextFormat = lambda v: data["y_formatter"](v, None)
+    chart.valueAxis.labels.fontName = _CZECH_FONT
+    chart.valueAxis.labels.fontSize = tick_size
+    chart.valueAxis.labels.fillColor = HexColor("#475569")
+    chart.valueAxis.strokeColor = HexColor("#cbd5e1")
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = HexColor("#e2e8f0")
+    chart.valueAxis.gridStrokeWidth = 0.4
+
+    chart.categoryAxis.categoryNames = data["names"]
+    chart.categoryAxis.strokeColor = HexColor("#cbd5e1")
+    chart.categoryAxis.labels.angle = 24
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.categoryAxis.labels.dy = -3
+    chart.categoryAxis.labels.fontName = _CZECH_FONT
+    chart.categoryAxis.labels.fontSize = tick_size
+    chart.categoryAxis.labels.fillColor = HexColor("#334155")
+
+    chart.barLabelArray = [[_format_price_chart_label(p) for p in data["prices"]]]
+    chart.barLabels.boxAnchor = "s"
+    chart.barLabels.dy = 2
+    chart.barLabels.fontName = _CZECH_FONT
+    chart.barLabels.fontSize = value_size
+    chart.barLabels.fillColor = HexColor("#1e293b")
+    drawing.add(chart)
+
+    axis_label = Group(String(
+        0, 0, f"Cena ({data['y_unit']})", textAnchor="middle",
+        fontName=_CZECH_FONT, fontSize=_vector_font_size(_CHART_FS_AXIS), fillColor=HexColor("#475569"),
+    ))
+    axis_label.transform = (0, 1, -1, 0, width * 0.035, chart.y + chart.height / 2.0)
+    drawing.add(axis_label)
+    return drawing
+
+
+def _vector_chart_row(
+    budget: Any,
+    width: float,
+    height: float,
+    color_map: Optional[Dict[str, str]],
+) -> List[Tuple[Drawing, str]]:
+    items = _get_budget_items_fe(budget)
+    chart_title = _budget_chart_title(budget)
+    row_charts: List[Tuple[Drawing, str]] = []
+    pie = create_pie_drawing(
+        items, budget, width, height, color_map=color_map, total_display=budget_total_round_celek_row(budget),
+    )
+    if pie is not None:
+        row_charts.append((pie, chart_title))
+    bar = create_bar_drawing(items, budget, width, height, color_map=color_map)
+    if bar is not None:
+        row_charts.append((bar, chart_title))
+    return row_charts
+
+
+def _chart_budget_snapshot(budget: Any) -> SimpleNamespace:
+    """Atributy rozpočtu, které grafy čtou – bez ORM stavu, aby šly předat do procesu poolu."""
+    return SimpleNamespace(
+        name=getattr(budget, "name", None),
+        client_name=getattr(budget, "client_name", None),
+        labels=getattr(budget, "labels", None),
+        items=getattr(budget, "items", None),
+    )
+
+
+def _render_budget_chart_row(
+    budget: Any,
+    chart_title: str,
+    pie_path: str,
+    bar_path: str,
+    color_map: Optional[Dict[str, str]],
+) -> List[Tuple[str, str]]:
+    """Koláč + sloupcový graf jednoho rozpočtu; vrací [(cesta, titulek)] vykreslených grafů."""
+    # Běží i v procesech poolu – jen matplotlib a soubory, žádná DB
+    items = _get_budget_items_fe(budget)
+    row_charts: List[Tuple[str, str]] = []
+    if create_pie_chart(
+        items,
+        budget,
+        chart_title,
+        pie_path,
+        color_map=color_map,
+        total_display=budget_total_round_celek_row(budget),
+    ):
+        row_charts.append((pie_path, chart_title))
+    if create_bar_chart(items, budget, chart_title, bar_path, color_map=color_map):
+        row_charts.append((bar_path, chart_title))
+    return row_charts
+
+
+def _chart_render_settings() -> Dict[str, Any]:
+    """Nastavení, na kterém závisí vzhled grafu – součást klíče chart_cache."""
+    global _CHART_SETTINGS
+    if _CHART_SETTINGS is None:
+        _CHART_SETTINGS = {
+            "version": _CHART_RENDER_VERSION,
+            "dpi": _CHART_DPI,
+            "figsize": list(_CHART_FIGSIZE),
+            "font_sizes": [_CHART_FS_AXIS, _CHART_FS_TICK, _CHART_FS_LEGEND, _CHART_FS_BAR_VALUE],
+            "palette": _CHART_PALETTE,
+            "gap_color": _GAP_COLOR,
+            "font": list(_find_czech_font_ttf_paths()),
+            "matplotlib": matplotlib.__version__,
+        }
+    return _CHART_SETTINGS
+
+
+def _chart_cache_keys(
+    budget: Any,
+    chart_title: str,
+    color_map: Optional[Dict[str, str]],
+) -> Dict[str, Optional[str]]:
+    """
+    Klíče chart_cache pro koláč a sloupcový graf rozpočtu ze všeho, co grafy kreslí.
+    None = graf se nevykreslí (žádná položka s kladnou cenou).
+    """
+    rows: List[Tuple[str, float]] = []
+    for item in _chart_item_rows(budget, _get_budget_items_fe(budget)):
+        price = _parse_price_fe(item.get("price")) or 0.0
+        if price > 0:
+            rows.append(((item.get("name") or "Neznámá položka").strip(), price))
+    if not rows:
+        return {"pie": None, "bar": None}
+    labels = [name for name, _ in rows] + ["Ostatní"]
+    material = {
+        "rows": rows,
+        "title": chart_title,
+        "colors": {label.lower(): _color_for_label_mapped(label, color_map) for label in labels},
+        "settings": _chart_render_settings(),
+    }
+    return {
+        "pie": chart_cache.make_key({**material, "kind": "pie", "total": budget_total_round_celek_row(budget)}),
+        "bar": chart_cache.make_key({**material, "kind": "bar"}),
+    }
+
+
+def _cached_chart_row(job: tuple, keys: Dict[str, Optional[str]]) -> Optional[List[Tuple[str, str]]]:
+    """Řádek grafů zkopírovaný z chart_cache na cesty úlohy; None = něco chybí, kreslit."""
+    _, chart_title, pie_path, bar_path, _ = job
+    row: List[Tuple[str, str]] = []
+    for kind, path in (("pie", pie_path), ("bar", bar_path)):
+        key = keys[kind]
+        if key is None:
+            continue
+        if not chart_cache.cache.copy_to(key, path):
+            return None
+        row.append((path, chart_title))
+    return row
+
+
+def _render_chart_rows(jobs: List[tuple], workers: int) -> List[List[Tuple[str, str]]]:
+    if workers > 1 and len(jobs) > 1:
+        try:
+            executor = _chart_pool.get(workers)
+            futures = [executor.submit(_render_budget_chart_row, *job) for job in jobs]
+            return [future.result() for future in futures]
+        except BrokenProcessPool as e:
+            print(f"[PDF] Chart process pool failed ({e}), rendering in-process")
+            _chart_pool.reset()
+    return [_render_budget_chart_row(*job) for job in jobs]
+
+
+def render_budget_charts(jobs: List[tuple], workers: Optional[int] = None) -> List[List[Tuple[str, str]]]:
+    """
+    Vykreslí grafy pro každou úlohu (argumenty _render_budget_chart_row) a vrátí řádky
+    ve stejném pořadí jako `jobs`. Grafy se stejnými vstupy se berou z chart_cache;
+    zbylé se při více rozpočtech kreslí na process poolu (PDF_CHART_WORKERS), když
+    pool nejde použít, v aktuálním procesu. Nově vykreslené grafy se do cache uloží.
+    """
+    workers = PDF_CHART_WORKERS if workers is None else workers
+    rows: List[Optional[List[Tuple[str, str]]]] = [None] * len(jobs)
+    keys = [_chart_cache_keys(job[0], job[1], job[4]) if chart_cache.cache.enabled else None for job in jobs]
+    pending = []
+    for idx, job in enumerate(jobs):
+        if keys[idx] is not None:
+            rows[idx] = _cached_chart_row(job, keys[idx])
+        if rows[idx] is None:
+            pending.append(idx)
+
+    rendered = _render_chart_rows([jobs[idx] for idx in pending], workers)
+    for idx, row in zip(pending, rendered):
+        rows[idx] = row
+        if keys[idx] is None:
+            continue
+        _, _, pie_path, bar_path, _ = jobs[idx]
+        for path, _ in row:
+            key = keys[idx]["pie" if path == pie_path else "bar"]
+            if key is not None:
+                chart_cache.cache.put(key, path)
+    return rows
+
+
+def generate_pdf_export(round_id: UUID, db: Session, output_path: str, chart_backend: Optional[str] = None):
+    """
+    Vygeneruje PDF: jedna srovnávací tabulka (řádky = položky, sloupce = rozpočty) + pod ní jeden graf na rozpočet.
+    chart_backend: "raster" (PNG z matplotlib) nebo "vector" (reportlab.graphics); výchozí PDF_CHART_BACKEND.
+    Dočasné soubory (PNG grafy) vznikají ve vlastním pracovním adresáři exportu, který
+    se po sestavení PDF smaže – souběžné exporty si soubory nepřepisují ani nemažou.
+    """
+    chart_backend = chart_backend or PDF_CHART_BACKEND
+    if chart_backend not in CHART_BACKENDS:
+        raise ValueError(f"Unknown chart backend: {chart_backend}")
+    with tempfile.TemporaryDirectory(prefix="pdf_export_") as workspace:
+        return _build_pdf_export(round_id, db, output_path, chart_backend, workspace)
+
+
+def _build_pdf_export(round_id: UUID, db: Session, output_path: str, chart_backend: str, workspace: str):
     _register_czech_font()
     budgets = crud.get_budgets_by_round(db, round_id)
     if not budgets:
@@ -960,44 +1355,13 @@ def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
     def get_items(b):
         return _get_budget_items_fe(b)
 
-    def parse_number_parts(value: Any) -> List[int]:
-        raw = str(value or "").strip()
-        if not raw:
-            return []
-        return [int(x) for x in re.findall(r"\d+", raw)]
-
-    def get_item_number_from_budgets(item_name: str, budgets_pool: List[Any]) -> str:
-        for budget in budgets_pool or []:
-            for item in get_items(budget):
-                if (item.get("name") or "").strip() == item_name:
-                    return str(item.get("number") or "")
-        return ""
-
-    # Všechna jedinečná jména položek napříč rozpočty (strukturální pořadí jako v UI)
-    all_item_names = set()
-    for b in root_budgets:
-        for item in get_items(b):
-            name = item.get("name", "")
-            if name:
-                all_item_names.add(name)
-
-    primary_budget = next((b for b in root_budgets if len(get_items(b)) > 0), root_budgets[0] if root_budgets else None)
-    primary_index_map: Dict[str, int] = {}
-    if primary_budget:
-        for idx, item in enumerate(get_items(primary_budget)):
-            name = (item.get("name") or "").strip()
-            if name and name not in primary_index_map:
-                primary_index_map[name] = idx
-
-    def item_sort_key(item_name: str):
-        if item_name in primary_index_map:
-            return (0, primary_index_map[item_name], tuple(), item_name.lower())
-        number_parts = tuple(parse_number_parts(get_item_number_from_budgets(item_name, root_budgets)))
-        if number_parts:
-            return (1, 0, number_parts, item_name.lower())
-        return (2, 0, tuple(), item_name.lower())
-
-    all_item_names = sorted(all_item_names, key=item_sort_key)
+    # Srovnávací matice (pořadí řádků, ceny, min/max, součty) – sdílená s GET /rounds/{id}/matrix
+    import round_matrix
+    matrix = round_matrix.get_round_matrix(db, round_id, budgets=budgets)
+    if [col["id"] for col in matrix["budgets"]] != [b.id for b in root_budgets]:
+        # Rozpočty se změnily mezi čtením revize a rozpočtů – matice musí sedět na sloupce tabulky.
+        matrix = round_matrix.build_round_matrix(budgets)
+    all_item_names = [row["name"] for row in matrix["rows"]]
 
     # Jednotná mapa barev pro grafy i sloupec "Položka" v tabulce.
     chart_priority_labels: List[str] = []
@@ -1022,13 +1386,6 @@ def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
         chart_priority_labels.extend([name for name, _ in bar_top])
     label_color_map = _build_label_color_map(chart_priority_labels + all_item_names)
 
-    # Cena položky v daném rozpočtu (stejně jako RoundView: parsePrice || 0)
-    def price_for(b, item_name):
-        for item in get_items(b):
-            if (item.get("name") or "").strip() == item_name:
-                return _parse_price_fe(item.get("price")) or 0.0
-        return 0.0
-
     # Jedna srovnávací tabulka: hlavička = Položka + názvy rozpočtů
     n_cols = 1 + len(root_budgets)
     content_width = 267 * mm  # landscape A4 minus margins
@@ -1118,6 +1475,10 @@ def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
         for path, cap in paths_with_names:
             t = (cap or "Rozpočet").strip()
             title_row.append(Paragraph(html.escape(t).replace("\n", " "), chart_caption_style))
+            if isinstance(path, Drawing):
+                # Vektorový graf (chart_backend="vector") jde do tabulky přímo
+                img_row.append(path)
+                continue
             try:
                 img_row.append(Image(path, width=chart_width, height=chart_height))
             except Exception:
@@ -1139,28 +1500,26 @@ def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
         )
         return tbl
 
-    chart_blocks = 0
-    for b in root_budgets:
-        items = get_items(b)
-        row_charts = []
-
-        pie_path = os.path.join(os.path.dirname(output_path), f"chart_{b.id}_pie.png")
-        pie_total = budget_total_round_celek_row(b)
-        chart_title = _budget_chart_title(b)
-        if create_pie_chart(
-            items,
-            b,
-            chart_title,
-            pie_path,
-            color_map=label_color_map,
-            total_display=pie_total,
-        ):
-            row_charts.append((pie_path, chart_title))
-
-        bar_path = os.path.join(os.path.dirname(output_path), f"chart_{b.id}_bar.png")
-        if create_bar_chart(items, b, chart_title, bar_path, color_map=label_color_map):
-            row_charts.append((bar_path, chart_title))
+    if chart_backend == CHART_BACKEND_VECTOR:
+        chart_rows = [
+            _vector_chart_row(b, chart_width, chart_height, label_color_map) for b in root_budgets
+        ]
+    else:
+        # Grafy všech rozpočtů najednou (process pool, PDF_CHART_WORKERS); řádky ve stejném pořadí
+        chart_jobs = [
+            (
+                _chart_budget_snapshot(b),
+                _budget_chart_title(b),
+                os.path.join(workspace, f"chart_{b.id}_pie.png"),
+                os.path.join(workspace, f"chart_{b.id}_bar.png"),
+                label_color_map,
+            )
+            for b in root_budgets
+        ]
+        chart_rows = render_budget_charts(chart_jobs)
 
+    chart_blocks = 0
+    for b, row_charts in zip(root_budgets, chart_rows):
         if not row_charts:
             continue
 
@@ -1189,27 +1548,27 @@ def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
     table_data = [header_row]
 
     # Řádek CELKEM = stejná logika jako „CELKOVÁ CENA“ ve webové tabulce (label / součet parsePrice)
-    totals = [budget_total_round_celek_row(b) for b in root_budgets]
+    totals = matrix["totals"]
     price_cell_styles = []  # Pro dynamické styly (nejnižší cena = zeleně, nejvyšší = červeně)
     item_column_styles = []  # Sloupec "Položka" barevně laděný podle grafů
 
-    for row_idx, item_name in enumerate(all_item_names):
+    for row_idx, matrix_row in enumerate(matrix["rows"]):
+        item_name = matrix_row["name"]
         row = [Paragraph((item_name[:50] + ("..." if len(item_name) > 50 else "")), body_style)]
         tint = _tint_for_label(item_name, label_color_map)
         tint_text = _text_color_for_bg(tint)
         item_column_styles.append(("BACKGROUND", (0, 1 + row_idx), (0, 1 + row_idx), HexColor(tint)))
         item_column_styles.append(("TEXTCOLOR", (0, 1 + row_idx), (0, 1 + row_idx), HexColor(tint_text)))
         prices_in_row = []
-        for i, b in enumerate(root_budgets):
-            p = price_for(b, item_name)
+        for i, p in enumerate(matrix_row["prices"]):
             prices_in_row.append((p, i))
             row.append(Paragraph(f"{p:,.0f} Kč".replace(",", " "), body_style))
         table_data.append(row)
         # Zvýraznění cen v řádku: minimum zeleně, maximum červeně (jen pokud existují různé ceny)
         valid_prices = [(p, i) for p, i in prices_in_row if p > 0]
         if valid_prices:
-            min_price = min(p for p, _ in valid_prices)
-            max_price = max(p for p, _ in valid_prices)
+            min_price = matrix_row["min"]
+            max_price = matrix_row["max"]
             if min_price != max_price:
                 for p, col_idx in valid_prices:
                     if p == min_price:
@@ -1288,15 +1647,6 @@ def generate_pdf_export(round_id: UUID, db: Session, output_path: str):
         logging.getLogger(__name__).warning("PDF custom canvas failed: %s", e, exc_info=True)
         doc.build(story)
 
-    # Smazat dočasné soubory s grafy
-    import glob
-    chart_files = glob.glob(os.path.join(os.path.dirname(output_path), "chart_*.png"))
-    for f in chart_files:
-        try:
-            os.remove(f)
-        except:
-            pass
-    
     return output_path
 
 
@@ -1322,11 +1672,18 @@ def generate_summary_pdf_export(project_id: UUID, db: Session, output_path: str)
 
     # company -> prices[] (len = n_rounds), missing value => None
     company_map: Dict[str, List[Optional[float]]] = {}
+    def round_totals(round_id: UUID) -> List[Tuple[str, float]]:
+        budgets = crud.get_budgets_by_round(db, round_id)
+        return [
+            (_budget_display_name(b, empty_fallback="Bez názvu"), budget_total_summary_tab(b))
+            for b in budgets
+            if not b.parent_budget_id
+        ]
+
     for round_idx, r in enumerate(rounds):
-        budgets = crud.get_budgets_by_round(db, r.id)
-        root_budgets = [b for b in budgets if not b.parent_budget_id]
-        for b in root_budgets:
-            base = _budget_display_name(b, empty_fallback="Bez názvu")
+        # Součty firem v kole se cachují podle revize kola (nemění se, dokud se nezmění rozpočty).
+        totals = round_cache.get_or_compute("summary_totals", r.id, r.revision or 0, lambda: round_totals(r.id))
+        for base, total in totals:
             key = base
             suffix = 2
             while key in company_map and company_map[key][round_idx] is not None:
@@ -1334,7 +1691,7 @@ def generate_summary_pdf_export(project_id: UUID, db: Session, output_path: str)
                 suffix += 1
             if key not in company_map:
                 company_map[key] = [None] * n_rounds
-            company_map[key][round_idx] = budget_total_summary_tab(b)
+            company_map[key][round_idx] = total
 
     def format_kc(value: float) -> str:
         rounded = int(round(value))
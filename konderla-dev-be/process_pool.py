@@ -0,0 +1,36 @@
+"""
+Process pool pro CPU náročné výpočty mimo hlavní proces (detekce duplicit, grafy exportu).
+
+Pool se vytváří líně při prvním použití a drží se mezi voláními; při jiném počtu
+workerů se nahradí novým. Po BrokenProcessPool ho volající zahodí přes reset()
+a další get() založí čerstvý.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+class SpawnPool:
+    """Líně vytvářený ProcessPoolExecutor se spawn kontextem, bezpečný pro více vláken."""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._workers = 0
+        self._lock = threading.Lock()
+
+    def get(self, workers: int) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._workers != workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                # spawn: worker nedědí stav aplikace (DB spojení, vlákna) z forku
+                self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                self._workers = workers
+            return self._executor
+
+    def reset(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
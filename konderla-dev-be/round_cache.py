@@ -0,0 +1,126 @@
+"""
+In-process LRU cache pro odvozené pohledy kola / projektu (matice, součty, odpověď
+read_budgets, kontext chatu, podklady pro PDF).
+
+Klíč je (view, scope_id, revision, *extra): scope_id je id kola nebo projektu,
+revision jeho aktuální revize. Po zápisu se revize zvýší, takže staré záznamy už
+nikdo nepřečte; crud je navíc maže hned (invalidate_scope), aby neblokovaly paměť.
+Velikost se účtuje v bajtech (bytes přímo, ostatní hodnoty podle délky JSON
+serializace) a při překročení limitu se vyhazují nejdéle nepoužité záznamy.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import fast_json
+
+_DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _sizeof(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    try:
+        return len(fast_json.dumps(value))
+    except TypeError:
+        return 1024
+
+
+class RevisionCache:
+    def __init__(self, max_bytes: int = _DEFAULT_MAX_BYTES, max_entry_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        # Jeden záznam nesmí vytlačit celou cache
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.rejected = 0
+
+    @staticmethod
+    def make_key(view: str, scope_id: Hashable, revision: Hashable, *extra: Hashable) -> Tuple[Hashable, ...]:
+        return (view, scope_id, revision, *extra)
+
+    def get(self, key: Tuple[Hashable, ...]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Tuple[Hashable, ...], value: Any, size: Optional[int] = None) -> None:
+        size = _sizeof(value) if size is None else size
+        with self._lock:
+            if size > self.max_entry_bytes:
+                self.rejected += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, view: str, scope_id: Hashable, revision: Hashable,
+                       compute: Callable[[], Any], *extra: Hashable) -> Any:
+        """Vrátí hodnotu z cache, jinak ji spočítá a uloží. None se necachuje."""
+        key = self.make_key(view, scope_id, revision, *extra)
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = compute()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def invalidate_scope(self, scope_id: Hashable) -> int:
+        """Smaže všechny záznamy kola/projektu (všechny pohledy i revize)."""
+        with self._lock:
+            keys = [k for k in self._entries if k[1] == scope_id]
+            for k in keys:
+                _, size = self._entries.pop(k)
+                self._bytes -= size
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_view: Dict[str, Dict[str, int]] = {}
+            for key, (_, size) in self._entries.items():
+                view_stats = by_view.setdefault(str(key[0]), {"entries": 0, "bytes": 0})
+                view_stats["entries"] += 1
+                view_stats["bytes"] += size
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entry_bytes": self.max_entry_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "rejected": self.rejected,
+                "views": by_view,
+            }
+
+
+cache = RevisionCache(max_bytes=int(os.getenv("ROUND_CACHE_MAX_BYTES", str(_DEFAULT_MAX_BYTES))))
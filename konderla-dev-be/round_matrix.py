@@ -0,0 +1,194 @@
+"""
+Srovnávací matice kola: řádky = položky, sloupce = kořenové rozpočty (firmy).
+
+Stejná logika jako tabulka v RoundView / PDF exportu (pořadí řádků, parsePrice || 0,
+CELKOVÁ CENA), ale sestavená jednou přes hash mapy místo lineárního hledání položky
+pro každou buňku. Výsledek se cachuje v round_cache podle (round_id, revision) –
+revize kola se zvyšuje při každém zápisu rozpočtů (crud.touch_round).
+"""
+import re
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+import crud
+from round_cache import cache as round_cache
+from pdf_export import (
+    _budget_display_name,
+    _get_budget_items_fe,
+    _parse_price_fe,
+    budget_total_round_celek_row,
+)
+
+def _parse_number_parts(value: Any) -> List[int]:
+    raw = str(value or "").strip()
+    if not raw:
+        return []
+    return [int(x) for x in re.findall(r"\d+", raw)]
+
+
+def root_budgets_of(budgets: List[Any]) -> List[Any]:
+    return [b for b in budgets if not b.parent_budget_id]
+
+
+def build_round_matrix(budgets: List[Any]) -> Dict[str, Any]:
+    """Sestaví matici z rozpočtů kola (ORM objekty nebo cokoliv se stejnými atributy)."""
+    root_budgets = root_budgets_of(budgets)
+    items_by_budget = [_get_budget_items_fe(b) for b in root_budgets]
+
+    # Hash join: pro každý rozpočet název (strip) -> cena první položky s tímto názvem.
+    price_maps: List[Dict[str, float]] = []
+    number_by_name: Dict[str, str] = {}
+    all_item_names = set()
+    for items in items_by_budget:
+        prices: Dict[str, float] = {}
+        for item in items:
+            raw_name = item.get("name", "")
+            if raw_name:
+                all_item_names.add(raw_name)
+            name = (item.get("name") or "").strip()
+            if name not in prices:
+                prices[name] = _parse_price_fe(item.get("price")) or 0.0
+            if name not in number_by_name:
+                number_by_name[name] = str(item.get("number") or "")
+        price_maps.append(prices)
+
+    # Strukturální pořadí: podle prvního rozpočtu s položkami, pak číslo položky, pak abecedně.
+    primary_index_map: Dict[str, int] = {}
+    primary_items = next((items for items in items_by_budget if items), [])
+    for idx, item in enumerate(primary_items):
+        name = (item.get("name") or "").strip()
+        if name and name not in primary_index_map:
+            primary_index_map[name] = idx
+
+    def item_sort_key(item_name: str):
+        if item_name in primary_index_map:
+            return (0, primary_index_map[item_name], tuple(), item_name.lower())
+        number_parts = tuple(_parse_number_parts(number_by_name.get(item_name, "")))
+        if number_parts:
+            return (1, 0, number_parts, item_name.lower())
+        return (2, 0, tuple(), item_name.lower())
+
+    rows = []
+    for item_name in sorted(all_item_names, key=item_sort_key):
+        row_prices = [prices.get(item_name, 0.0) for prices in price_maps]
+        valid = [p for p in row_prices if p > 0]
+        rows.append({
+            "name": item_name,
+            "number": number_by_name.get(item_name, ""),
+            "prices": row_prices,
+            "min": min(valid) if valid else None,
+            "max": max(valid) if valid else None,
+        })
+
+    return {
+        "budgets": [
+            {
+                "id": b.id,
+                "name": b.name,
+                "display_name": _budget_display_name(b, empty_fallback="Rozpočet"),
+                "client_name": b.client_name,
+            }
+            for b in root_budgets
+        ],
+        "rows": rows,
+        "totals": [budget_total_round_celek_row(b) for b in root_budgets],
+    }
+
+
+def get_round_matrix(db: Session, round_id: UUID, budgets: Optional[List[Any]] = None) -> Optional[Dict[str, Any]]:
+    """Vrátí matici kola z cache podle revize, případně ji sestaví. None = kolo neexistuje."""
+    revision = crud.get_round_revision(db, round_id)
+    if revision is None:
+        return None
+
+    def compute():
+        matrix = build_round_matrix(budgets if budgets is not None else crud.get_budgets_by_round(db, round_id))
+        matrix["round_id"] = round_id
+        matrix["revision"] = revision
+        return matrix
+
+    return round_cache.get_or_compute("matrix", round_id, revision, compute)
+
+
+# --- Statistika cen položek napříč firmami (podklad pro vyjednávání) ---
+
+_OUTLIER_IQR_FACTOR = 1.5  # Tukeyho hranice: mimo [Q1 - k·IQR, Q3 + k·IQR]
+_OUTLIER_MIN_PRICES = 3    # u méně nacenění nemá smysl o odlehlosti mluvit
+
+
+def compute_item_statistics(matrix: Dict[str, Any], outlier_factor: float = _OUTLIER_IQR_FACTOR) -> Dict[str, Any]:
+    """
+    Z matice kola postaví pole firma × položka (NumPy) a jedním průchodem spočítá
+    pro každou položku min, max, medián, rozptyl (max - min), odchylku každé firmy
+    od mediánu a příznak odlehlé ceny (Tukeyho hranice z kvartilů).
+    Ceny <= 0 znamenají „firma položku nenacenila“ a do statistiky nevstupují.
+    """
+    rows = matrix["rows"]
+    n_budgets = len(matrix["budgets"])
+    if not rows or n_budgets == 0:
+        return {"budgets": matrix["budgets"], "items": []}
+
+    prices = np.array([row["prices"] for row in rows], dtype=float).reshape(len(rows), n_budgets).T
+    prices = np.where(prices > 0, prices, np.nan)  # tvar (firma, položka)
+    priced = ~np.isnan(prices)
+    counts = priced.sum(axis=0)
+    has_any = counts > 0
+
+    # Jedno seřazení sloupců (NaN jdou na konec) dá min, max, medián i kvartily bez smyček v Pythonu.
+    sorted_prices = np.sort(prices, axis=0)
+    last = np.maximum(counts - 1, 0)
+
+    def quantile(q: float) -> np.ndarray:
+        pos = q * last
+        lo = np.floor(pos).astype(int)
+        hi = np.minimum(lo + 1, last)
+        v_lo = np.take_along_axis(sorted_prices, lo[None, :], axis=0)[0]
+        v_hi = np.take_along_axis(sorted_prices, hi[None, :], axis=0)[0]
+        return np.where(has_any, v_lo + (v_hi - v_lo) * (pos - lo), np.nan)
+
+    mins = quantile(0.0)
+    maxs = quantile(1.0)
+    medians = quantile(0.5)
+    q1, q3 = quantile(0.25), quantile(0.75)
+    with np.errstate(all="ignore"):
+        deviations = prices - medians
+        rel_deviations = deviations / medians
+    iqr = q3 - q1
+    outside = (prices < q1 - outlier_factor * iqr) | (prices > q3 + outlier_factor * iqr)
+    outliers = priced & outside & (counts >= _OUTLIER_MIN_PRICES)
+
+    def _nan_to_none(values: List[float]) -> List[Optional[float]]:
+        return [None if v != v else v for v in values]
+
+    deviation_rows = deviations.T.tolist()
+    rel_rows = (rel_deviations * 100.0).T.tolist()
+    outlier_rows = outliers.T.tolist()
+    items = []
+    for j, row in enumerate(rows):
+        if not has_any[j]:
+            items.append({
+                "name": row["name"], "number": row["number"], "count": 0,
+                "min": None, "max": None, "median": None, "spread": None, "spread_pct": None,
+                "deviations": [None] * n_budgets, "deviations_pct": [None] * n_budgets,
+                "outliers": [False] * n_budgets,
+            })
+            continue
+        median = float(medians[j])
+        spread = float(maxs[j] - mins[j])
+        items.append({
+            "name": row["name"],
+            "number": row["number"],
+            "count": int(counts[j]),
+            "min": float(mins[j]),
+            "max": float(maxs[j]),
+            "median": median,
+            "spread": spread,
+            "spread_pct": (spread / median * 100.0) if median else None,
+            "deviations": _nan_to_none(deviation_rows[j]),
+            "deviations_pct": _nan_to_none(rel_rows[j]),
+            "outliers": outlier_rows[j],
+        })
+    return {"budgets": matrix["budgets"], "items": items}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, validator
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Literal, Union
 from datetime import datetime
 from uuid import UUID
 
@@ -58,11 +58,24 @@ class BudgetUpdate(BaseModel):
     client_name: Optional[str] = None
     client_project_name: Optional[str] = None
 
+class BudgetItemOperation(BaseModel):
+    op: Literal["set_price", "rename", "insert", "delete"]
+    index: Optional[int] = None   # pozice položky (u insert pozice vložení, bez ní na konec)
+    number: Optional[str] = None  # nebo číslo položky (první shoda)
+    price: Optional[float] = None
+    name: Optional[str] = None
+    item: Optional[Dict[str, Any]] = None
+
+class BudgetItemsPatch(BaseModel):
+    version: Optional[int] = None  # očekávaná verze; při nesouladu 409
+    operations: List[BudgetItemOperation]
+
 class Budget(BudgetBase):
     id: UUID
     round_id: UUID
     project_id: UUID
     parent_budget_id: Optional[UUID] = None
+    version: int = 0
 
     class Config:
         orm_mode = True
@@ -79,11 +92,22 @@ class RoundCreate(RoundBase):
 class Round(RoundBase):
     id: UUID
     project_id: UUID
+    revision: int = 0
     budgets: List[Budget] = []
 
     class Config:
         orm_mode = True
 
+class ItemCatalogEntry(BaseModel):
+    id: int
+    project_id: UUID
+    normalized_name: str
+    name: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
 # Project Schemas
 class ProjectBase(BaseModel):
     name: str
@@ -172,3 +196,7 @@ class MergeItemsRequest(BaseModel):
     source_name: str
     target_name: str
     new_name: str
+
+class MergeItemsBatchRequest(BaseModel):
+    operations: List[MergeItemsRequest]
+    dry_run: bool = False
@@ -0,0 +1,106 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import budget_items
+import pdf_export
+
+ITEMS = [
+    {"number": "1", "name": "Beton ", "price": 100.0},
+    {"number": "2", "name": "Výztuž", "price": 50.0},
+]
+
+# Tvary, ve kterých rozpočty položky opravdu mají uložené
+STORED_SHAPES = {
+    "list": ITEMS,
+    "list_wrapper": {"list": ITEMS},
+    "double_serialized": json.dumps(ITEMS),
+    "string_items": [json.dumps(item) for item in ITEMS],
+    "double_serialized_wrapper": json.dumps({"list": ITEMS}),
+}
+
+
+@pytest.mark.parametrize("shape", sorted(STORED_SHAPES))
+def test_normalize_items_reads_every_stored_shape(shape):
+    assert budget_items.normalize_items(STORED_SHAPES[shape]) == ITEMS
+
+
+@pytest.mark.parametrize("shape", sorted(STORED_SHAPES))
+def test_item_readers_agree_with_normalize_items(shape):
+    raw = STORED_SHAPES[shape]
+    assert budget_items.item_names(raw) == {"Beton", "Výztuž"}
+    assert pdf_export._get_budget_items_fe(SimpleNamespace(items=raw)) == ITEMS
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (None, []),
+    ([], []),
+    ({"name": "Jediná", "price": 1}, [{"name": "Jediná", "price": 1}]),
+    (["nejde o JSON", 5, {"name": "A"}], [{"name": "A"}]),
+    ("{nečitelné", None),
+    (42, None),
+])
+def test_normalize_items_edge_cases(raw, expected):
+    assert budget_items.normalize_items(raw) == expected
+
+
+def test_with_stored_shape_keeps_list_wrapper():
+    raw = {"list": ITEMS, "source": "excel"}
+    new_items = ITEMS[:1]
+    assert budget_items.with_stored_shape(raw, new_items) == {"list": new_items, "source": "excel"}
+    assert budget_items.with_stored_shape(ITEMS, new_items) == new_items
+    assert budget_items.with_stored_shape(json.dumps(ITEMS), new_items) == new_items
+
+
+def _stored_items(client, round_id, budget_id):
+    budgets = client.get(f"/rounds/{round_id}/budgets/").raise_for_status().json()
+    return next(b["items"] for b in budgets if b["id"] == budget_id)
+
+
+def _op(source_name, target_name, new_name):
+    return {"source_name": source_name, "target_name": target_name, "new_name": new_name}
+
+
+@pytest.mark.parametrize("shape", ["list", "list_wrapper", "double_serialized", "string_items"])
+def test_merge_batch_merges_items_in_every_shape(client, make_budget, round_id, shape):
+    budget = make_budget(STORED_SHAPES[shape])
+    response = client.post(f"/rounds/{round_id}/merge-items/batch",
+                           json={"operations": [_op("Výztuž", "Beton ", "Beton a výztuž")]})
+    assert response.status_code == 200
+    assert response.json()["operations"][0]["items_merged"] == 1
+
+    stored = _stored_items(client, round_id, budget["id"])
+    items = budget_items.normalize_items(stored)
+    assert [(item["name"], item["price"]) for item in items] == [("Beton a výztuž", 150.0)]
+    if shape == "list_wrapper":
+        assert isinstance(stored, dict) and stored["list"] == items
+
+
+def _backfill(client, project):
+    response = client.post(f"/projects/{project}/item-catalog/backfill")
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.parametrize("shape", ["list_wrapper", "double_serialized", "string_items"])
+def test_backfill_adds_catalog_ids_and_keeps_wrapper(client, make_budget, project, round_id, shape):
+    budget = make_budget(STORED_SHAPES[shape])
+    assert _backfill(client, project)["budgets_updated"] == 1
+
+    stored = _stored_items(client, round_id, budget["id"])
+    items = budget_items.normalize_items(stored)
+    assert all(isinstance(item["catalog_id"], int) for item in items)
+    assert [item["name"] for item in items] == [item["name"] for item in ITEMS]
+    if shape == "list_wrapper":
+        assert isinstance(stored, dict) and stored["list"] == items
+
+    # Druhý průchod už nic nemění – ani tvar uložení, ani verzi
+    assert _backfill(client, project)["budgets_updated"] == 0
+
+
+def test_backfill_does_not_rewrite_container_only(client, make_budget, project, round_id):
+    with_ids = _stored_items(client, round_id, make_budget(ITEMS)["id"])
+    serialized = make_budget(json.dumps(with_ids), name="Firma B")
+    assert _backfill(client, project)["budgets_updated"] == 0
+    assert _stored_items(client, round_id, serialized["id"]) == json.dumps(with_ids)
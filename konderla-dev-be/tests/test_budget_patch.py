@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+import pytest
+
+import budget_items
+
+ITEMS = [
+    {"number": "1", "name": "Beton", "price": 100.0},
+    {"number": "2", "name": "Výztuž", "price": 50.0},
+    {"number": "3", "name": "Bednění", "price": 25.0},
+]
+
+
+def op(kind, **fields):
+    return SimpleNamespace(**{"op": kind, "index": None, "number": None, "price": None, "name": None,
+                              "item": None, **fields})
+
+
+def test_operations_return_total_price_delta():
+    items, delta = budget_items.apply_item_operations(ITEMS, [
+        op("set_price", number="1", price=130.0),              # +30
+        op("insert", index=0, item={"name": "Lešení", "price": 12.5}),  # +12.5
+        op("delete", number="3"),                              # -25
+        op("rename", index=1, name="Beton C25/30"),
+    ])
+    assert delta == pytest.approx(17.5)
+    assert [(it["name"], it["price"]) for it in items] == [
+        ("Lešení", 12.5), ("Beton C25/30", 130.0), ("Výztuž", 50.0),
+    ]
+    assert ITEMS[0]["price"] == 100.0  # vstup se nemění
+
+
+def test_delta_counts_only_section_headers_when_present():
+    items = [
+        {"number": "1", "name": "Zemní práce", "price": 300.0, "is_section_header": True},
+        {"number": "1.1", "name": "Výkop", "price": 300.0},
+    ]
+    _, delta = budget_items.apply_item_operations(items, [op("set_price", number="1.1", price=500.0)])
+    assert delta == 0.0
+    _, delta = budget_items.apply_item_operations(items, [op("set_price", number="1.1", price=500.0)],
+                                                  include_subsections=True)
+    assert delta == 200.0
+    # Smazání poslední sekční hlavičky mění základ výpočtu – celková cena se přepočítá celá
+    _, delta = budget_items.apply_item_operations(items, [op("delete", index=0)])
+    assert delta is None
+
+
+@pytest.mark.parametrize("operation, message", [
+    (op("delete", index=3), "out of range"),
+    (op("set_price", number="99", price=1.0), "not found"),
+    (op("set_price", index=0), "needs 'price'"),
+    (op("insert", index=9, item={"name": "X"}), "out of range"),
+    (op("delete"), "needs 'index' or 'number'"),
+])
+def test_invalid_operation_raises(operation, message):
+    with pytest.raises(budget_items.ItemPatchError, match=message):
+        budget_items.apply_item_operations(ITEMS, [op("set_price", index=0, price=1.0), operation])
+
+
+def _patch(client, budget_id, operations, version=None):
+    body = {"operations": operations, **({"version": version} if version is not None else {})}
+    return client.patch(f"/budgets/{budget_id}/items", json=body)
+
+
+def _stored(client, round_id, budget_id):
+    return next(b for b in client.get(f"/rounds/{round_id}/budgets/").json() if b["id"] == budget_id)
+
+
+def test_patch_updates_total_price_by_delta(client, make_budget, round_id):
+    budget = make_budget(ITEMS, labels={"total_price": 175.0})
+    response = _patch(client, budget["id"], [{"op": "set_price", "number": "2", "price": 80.0}], version=0)
+    assert response.status_code == 200
+    assert response.json() == {"id": budget["id"], "version": 1, "items_count": 3, "total_price": 205.0}
+
+    response = _patch(client, budget["id"], [{"op": "insert", "item": {"name": "Lešení", "price": 20.0}}], version=1)
+    assert response.json()["total_price"] == 225.0
+    response = _patch(client, budget["id"], [{"op": "delete", "index": 0}], version=2)
+    assert (response.json()["total_price"], response.json()["items_count"]) == (125.0, 3)
+
+    stored = _stored(client, round_id, budget["id"])
+    assert [(it["name"], it["price"]) for it in stored["items"]] == [("Výztuž", 80.0), ("Bednění", 25.0), ("Lešení", 20.0)]
+    assert stored["labels"]["total_price"] == 125.0
+
+
+def test_patch_with_stale_version_is_409_and_changes_nothing(client, make_budget, round_id):
+    budget = make_budget(ITEMS, labels={"total_price": 175.0})
+    assert _patch(client, budget["id"], [{"op": "set_price", "index": 0, "price": 1.0}], version=0).status_code == 200
+
+    stale = _patch(client, budget["id"], [{"op": "delete", "index": 0}], version=0)
+    assert stale.status_code == 409
+    assert stale.json()["detail"]["version"] == 1
+    stored = _stored(client, round_id, budget["id"])
+    assert (len(stored["items"]), stored["version"], stored["labels"]["total_price"]) == (3, 1, 76.0)
+
+
+def test_patch_keeps_list_wrapper(client, make_budget, round_id):
+    budget = make_budget({"list": ITEMS, "source": "excel"})
+    response = _patch(client, budget["id"], [
+        {"op": "set_price", "number": "3", "price": 30.0},
+        {"op": "delete", "index": 0},
+    ])
+    assert response.status_code == 200
+    assert response.json()["items_count"] == 2
+    stored = _stored(client, round_id, budget["id"])["items"]
+    assert stored["source"] == "excel"
+    assert [(it["name"], it["price"]) for it in stored["list"]] == [("Výztuž", 50.0), ("Bednění", 30.0)]
+
+
+def test_patch_errors(client, make_budget):
+    budget = make_budget(ITEMS)
+    assert _patch(client, budget["id"], [{"op": "delete", "index": 5}]).status_code == 400
+    assert _patch(client, "00000000-0000-0000-0000-000000000000", [{"op": "delete", "index": 0}]).status_code == 404
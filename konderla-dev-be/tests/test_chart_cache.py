@@ -0,0 +1,148 @@
+import os
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+
+import chart_cache
+import pdf_export
+from database import SessionLocal
+
+ITEMS = [
+    {"number": "1", "name": "Beton", "price": 100.0},
+    {"number": "2", "name": "Výztuž", "price": 50.0},
+]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    # Vlastní adresář místo uploads/chart_cache – počítadla i obsah jen pro test
+    test_cache = chart_cache.ChartCache(str(tmp_path / "chart_cache"))
+    monkeypatch.setattr(chart_cache, "cache", test_cache)
+    return test_cache
+
+
+def _budget(items=ITEMS, labels=None):
+    return SimpleNamespace(name="Firma", client_name=None, labels=labels or {}, items=items)
+
+
+def _file(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return str(path)
+
+
+def test_put_get_and_copy(tmp_path):
+    cache = chart_cache.ChartCache(str(tmp_path / "cache"))
+    key = chart_cache.make_key({"rows": [["Beton", 100.0]]})
+    assert cache.get(key) is None
+    source = _file(tmp_path, "chart.png", 100)
+    cache.put(key, source)
+
+    target = str(tmp_path / "copy.png")
+    assert cache.copy_to(key, target)
+    assert open(target, "rb").read() == open(source, "rb").read()
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"], stats["stores"]) == (1, 100, 1, 1, 1)
+
+
+def test_eviction_keeps_cache_under_max_bytes(tmp_path):
+    cache = chart_cache.ChartCache(str(tmp_path / "cache"), max_bytes=1000)
+    for idx in range(20):
+        key = chart_cache.make_key({"chart": idx})
+        cache.put(key, _file(tmp_path, f"chart_{idx}.png", 150 + idx * 10))
+        stats = cache.stats()
+        assert stats["bytes"] <= cache.max_bytes
+        assert cache.get(key) is not None  # právě uložený graf se nevyhazuje
+    assert cache.stats()["evictions"] > 0
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = chart_cache.ChartCache(str(tmp_path / "cache"), max_bytes=300)
+    keys = [chart_cache.make_key({"chart": idx}) for idx in range(4)]
+    for idx, key in enumerate(keys[:3]):
+        cache.put(key, _file(tmp_path, f"chart_{idx}.png", 100))
+        os.utime(cache.get(key), (1000 + idx, 1000 + idx))
+    os.utime(cache.get(keys[0]), (2000, 2000))  # nejnověji použitý
+    cache.put(keys[3], _file(tmp_path, "chart_3.png", 100))
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], keys[3]))
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = chart_cache.ChartCache(str(tmp_path / "cache"), max_bytes=0)
+    cache.put("klic", _file(tmp_path, "chart.png", 10))
+    assert cache.get("klic") is None
+    assert not os.path.exists(cache.directory)
+
+
+def test_chart_keys_follow_drawn_inputs():
+    keys = pdf_export._chart_cache_keys(_budget(), "Firma", None)
+    assert keys == pdf_export._chart_cache_keys(_budget([dict(item) for item in ITEMS]), "Firma", None)
+
+    repriced = [ITEMS[0], {**ITEMS[1], "price": 60.0}]
+    changed = pdf_export._chart_cache_keys(_budget(repriced), "Firma", None)
+    assert changed["pie"] != keys["pie"] and changed["bar"] != keys["bar"]
+
+    recolored = pdf_export._chart_cache_keys(_budget(), "Firma", {"beton": "#123456"})
+    assert recolored["pie"] != keys["pie"] and recolored["bar"] != keys["bar"]
+    # Barva labelu, který graf nekreslí, klíč nemění
+    assert pdf_export._chart_cache_keys(_budget(), "Firma", {"omítka": "#123456"}) == keys
+
+    assert pdf_export._chart_cache_keys(_budget(), "Jiný titulek", None) != keys
+    assert pdf_export._chart_cache_keys(_budget([{"name": "Zdarma", "price": 0}]), "Firma", None) == {"pie": None, "bar": None}
+
+
+def _jobs(tmp_path, run, budgets):
+    return [
+        (budget, f"Firma {idx}", str(tmp_path / f"{run}_{idx}_pie.png"), str(tmp_path / f"{run}_{idx}_bar.png"), None)
+        for idx, budget in enumerate(budgets)
+    ]
+
+
+def test_second_render_serves_charts_from_cache(tmp_path, cache, monkeypatch):
+    budgets = [_budget(), _budget([{"name": "Omítka", "price": 30.0}, *ITEMS])]
+    first = pdf_export.render_budget_charts(_jobs(tmp_path, "a", budgets), workers=0)
+    assert [len(row) for row in first] == [2, 2]
+    assert cache.stats()["stores"] == 4
+
+    def not_called(*args):
+        raise AssertionError("graf se měl vzít z chart_cache")
+
+    monkeypatch.setattr(pdf_export, "_render_budget_chart_row", not_called)
+    hits = cache.hits
+    second = pdf_export.render_budget_charts(_jobs(tmp_path, "b", budgets), workers=0)
+    assert cache.hits == hits + 4
+    for row_a, row_b in zip(first, second):
+        for (path_a, title_a), (path_b, title_b) in zip(row_a, row_b):
+            assert title_a == title_b
+            assert open(path_a, "rb").read() == open(path_b, "rb").read()
+
+
+def test_pool_render_matches_in_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(chart_cache, "cache", chart_cache.ChartCache(str(tmp_path / "off"), max_bytes=0))
+    budgets = [_budget(), _budget([{"name": "Omítka", "price": 30.0}])]
+    try:
+        pooled = pdf_export.render_budget_charts(_jobs(tmp_path, "pool", budgets), workers=2)
+    finally:
+        pdf_export._chart_pool.reset()
+    local = pdf_export.render_budget_charts(_jobs(tmp_path, "local", budgets), workers=0)
+    assert pooled == [[(path.replace("local_", "pool_"), title) for path, title in row] for row in local]
+    assert all(os.path.getsize(path) > 0 for row in pooled for path, _ in row)
+
+
+def test_second_round_export_reuses_cached_charts(tmp_path, cache, make_budget, round_id):
+    make_budget(ITEMS, name="Firma A")
+    make_budget([{"name": "Omítka", "price": 30.0}, *ITEMS], name="Firma B")
+    db = SessionLocal()
+    try:
+        pdf_export.generate_pdf_export(UUID(round_id), db, str(tmp_path / "first.pdf"), chart_backend="raster")
+        stores, hits = cache.stores, cache.hits
+        assert stores == 4
+        pdf_export.generate_pdf_export(UUID(round_id), db, str(tmp_path / "second.pdf"), chart_backend="raster")
+    finally:
+        db.close()
+        pdf_export._chart_pool.reset()
+    assert cache.stores == stores
+    assert cache.hits == hits + 4
+    assert os.path.getsize(tmp_path / "second.pdf") > 0
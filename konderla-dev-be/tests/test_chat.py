@@ -0,0 +1,203 @@
+"""
+POST /chat/ a /chat/stream nad FakeChatModel (bez sítě) přes httpx.ASGITransport.
+"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import chat_models
+
+REPLY = "Nejlevnější je Firma 2 s cenou 1 200 000 Kč."
+
+
+@pytest.fixture(autouse=True)
+def fresh_semaphore(monkeypatch):
+    # Semafor se váže na event loop; každý test běží ve vlastním asyncio.run
+    monkeypatch.setattr(chat_models, "_semaphore", None)
+    monkeypatch.setattr(chat_models, "MODEL_CONCURRENCY", 4)
+
+
+@pytest.fixture
+def use_model(app_main, monkeypatch):
+    def use(**kwargs):
+        monkeypatch.setattr(app_main, "model", chat_models.FakeChatModel(**kwargs))
+    return use
+
+
+@pytest.fixture
+def app(app_main):
+    return app_main.app
+
+
+def _client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=30)
+
+
+async def _new_session(client: httpx.AsyncClient, project_id: str) -> str:
+    return (await client.post(f"/projects/{project_id}/sessions/")).raise_for_status().json()["id"]
+
+
+async def _history(client: httpx.AsyncClient, project_id: str, session_id: str):
+    response = await client.get(f"/projects/{project_id}/chat/", params={"session_id": session_id})
+    return [(message["role"], message["content"]) for message in response.raise_for_status().json()]
+
+
+def _events(body: str):
+    """Seznam (event, data) ze SSE odpovědi."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _collapsed(names):
+    return [name for idx, name in enumerate(names) if idx == 0 or names[idx - 1] != name]
+
+
+def test_concurrent_chat_requests_overlap(app, project, use_model):
+    use_model(latency=0.5, tokens_per_sec=0, reply=REPLY)
+
+    async def run():
+        async with _client(app) as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.post("/chat/", json={"project_id": project, "message": f"Otázka {idx}"}) for idx in range(4)
+            ])
+            return responses, time.perf_counter() - started
+
+    responses, elapsed = asyncio.run(run())
+    assert [r.json()["content"] for r in responses] == [REPLY] * 4
+    assert elapsed < 0.5 * 2  # sériově by to byly 2 s
+
+
+def test_chat_saves_full_answer(app, project, use_model):
+    use_model(latency=0.01, tokens_per_sec=0, reply=REPLY)
+
+    async def run():
+        async with _client(app) as client:
+            session_id = await _new_session(client, project)
+            response = await client.post("/chat/", json={"project_id": project, "session_id": session_id,
+                                                          "message": "Kdo je nejlevnější?"})
+            return response, await _history(client, project, session_id)
+
+    response, history = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.json()["content"] == REPLY
+    assert history == [("user", "Kdo je nejlevnější?"), ("model", REPLY)]
+
+
+def test_chat_timeout_returns_error_text(app, project, use_model, monkeypatch):
+    use_model(latency=0.6, tokens_per_sec=0, reply=REPLY)
+    monkeypatch.setattr(chat_models, "MODEL_TIMEOUT", 0.2)
+
+    async def run():
+        async with _client(app) as client:
+            session_id = await _new_session(client, project)
+            response = await client.post("/chat/", json={"project_id": project, "session_id": session_id,
+                                                          "message": "Kdo je nejlevnější?"})
+            return response, await _history(client, project, session_id)
+
+    response, history = asyncio.run(run())
+    error_text = "I encountered an error: Model did not respond within 0.2 s"
+    assert response.json()["content"] == error_text
+    assert history[-1] == ("model", error_text)
+
+
+def test_chat_stream_events_and_saved_answer(app, project, use_model):
+    use_model(latency=0.01, tokens_per_sec=0, reply=REPLY)
+
+    async def run():
+        async with _client(app) as client:
+            session_id = await _new_session(client, project)
+            response = await client.post("/chat/stream", json={"project_id": project, "session_id": session_id,
+                                                                "message": "Kdo je nejlevnější?"})
+            return response, await _history(client, project, session_id)
+
+    response, history = asyncio.run(run())
+    events = _events(response.text)
+    assert _collapsed([name for name, _ in events]) == ["session", "chunk", "done"]
+    assert "".join(data["text"] for name, data in events if name == "chunk") == REPLY
+    assert events[-1][1]["content"] == REPLY
+    assert history == [("user", "Kdo je nejlevnější?"), ("model", REPLY)]
+
+
+def test_chat_stream_timeout_mid_answer(app, project, use_model, monkeypatch):
+    # Části po 0.1 s, limit 0.35 s – pár částí projde, pak `error` a `done` s tím, co přišlo
+    use_model(latency=0.01, tokens_per_sec=10, reply_tokens=30)
+    monkeypatch.setattr(chat_models, "MODEL_TIMEOUT", 0.35)
+
+    async def run():
+        async with _client(app) as client:
+            session_id = await _new_session(client, project)
+            response = await client.post("/chat/stream", json={"project_id": project, "session_id": session_id,
+                                                                "message": "Kdo je nejlevnější?"})
+            return response, await _history(client, project, session_id)
+
+    response, history = asyncio.run(run())
+    events = _events(response.text)
+    assert _collapsed([name for name, _ in events]) == ["session", "chunk", "error", "done"]
+    partial = "".join(data["text"] for name, data in events if name == "chunk")
+    assert dict(events)["error"]["detail"] == "Model did not respond within 0.35 s"
+    assert events[-1][1]["content"] == partial
+    assert history[-1] == ("model", partial)
+
+
+async def _stream_until_first_chunk(app, body: dict) -> bytes:
+    """POST /chat/stream přímo přes ASGI; po první části `chunk` klient „odpojí“ spojení."""
+    disconnected = asyncio.Event()
+    received = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": json.dumps(body).encode(), "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            received.append(message.get("body", b""))
+            if b"event: chunk" in message.get("body", b""):
+                disconnected.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/chat/stream", "raw_path": b"/chat/stream",
+        "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json"), (b"host", b"test")],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return b"".join(received)
+
+
+def test_chat_stream_saves_partial_answer_on_disconnect(app, project, use_model):
+    use_model(latency=0.01, tokens_per_sec=20, reply_tokens=40)
+
+    async def run():
+        async with _client(app) as client:
+            session_id = await _new_session(client, project)
+            body = await _stream_until_first_chunk(app, {"project_id": project, "session_id": session_id,
+                                                    "message": "Kdo je nejlevnější?"})
+            # Částečná odpověď se ukládá v executoru až po zrušení streamu
+            for _ in range(50):
+                history = await _history(client, project, session_id)
+                if len(history) == 2:
+                    break
+                await asyncio.sleep(0.05)
+            return body.decode(), history
+
+    body, history = asyncio.run(run())
+    events = _events(body)
+    assert "done" not in [name for name, _ in events]
+    received = "".join(data["text"] for name, data in events if name == "chunk")
+    assert history[0] == ("user", "Kdo je nejlevnější?")
+    role, saved = history[1]
+    assert role == "model"
+    assert saved.startswith(received)
+    assert len(saved.split()) < 40
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+
+import chat_models
+
+
+@pytest.fixture(autouse=True)
+def fresh_semaphore(monkeypatch):
+    # Semafor se váže na event loop; každý test běží ve vlastním asyncio.run
+    monkeypatch.setattr(chat_models, "_semaphore", None)
+    monkeypatch.setattr(chat_models, "MODEL_CONCURRENCY", 4)
+
+
+def test_generate_async_runs_calls_concurrently():
+    model = chat_models.FakeChatModel(latency=0.3, tokens_per_sec=0, reply="ok")
+
+    async def run():
+        started = time.perf_counter()
+        answers = await asyncio.gather(*[chat_models.generate_async(model, f"q{idx}", timeout=5) for idx in range(4)])
+        return answers, time.perf_counter() - started
+
+    answers, elapsed = asyncio.run(run())
+    assert answers == ["ok"] * 4
+    assert elapsed < 0.3 * 2  # sériově by to bylo 1.2 s
+
+
+def test_generate_async_timeout_keeps_slot_until_thread_finishes(monkeypatch):
+    monkeypatch.setattr(chat_models, "MODEL_CONCURRENCY", 1)
+    model = chat_models.FakeChatModel(latency=0.3, tokens_per_sec=0, reply="ok")
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await chat_models.generate_async(model, "slow", timeout=0.05)
+        # Vlákno modelu pořád běží – slot se nesmí uvolnit dřív než ono
+        assert chat_models._get_semaphore().locked()
+        with pytest.raises(asyncio.TimeoutError):
+            await chat_models.generate_async(model, "queued", timeout=0.05)
+        await asyncio.sleep(0.4)
+        assert not chat_models._get_semaphore().locked()
+        return await chat_models.generate_async(model, "next", timeout=5)
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_stream_async_yields_parts_and_releases_slot_after_close():
+    model = chat_models.FakeChatModel(latency=0.01, tokens_per_sec=50, reply_tokens=30)
+
+    async def run():
+        full = "".join([part async for part in chat_models.stream_async(model, "q", timeout=5)])
+        parts = chat_models.stream_async(model, "q", timeout=5)
+        first = await parts.__anext__()
+        await parts.aclose()
+        # Vlákno se zastaví u další části (1/50 s) a teprve pak vrátí slot
+        await asyncio.sleep(0.2)
+        return full, first, chat_models._get_semaphore()._value
+
+    full, first, free_slots = asyncio.run(run())
+    assert len(full.split()) == 30
+    assert full.startswith(first)
+    assert free_slots == 4
+
+
+def test_chat_model_requires_stream():
+    with pytest.raises(TypeError):
+        chat_models.ChatModel()
+
+    class Echo(chat_models.ChatModel):
+        def stream(self, prompt):
+            yield from prompt.split()
+
+    assert Echo().generate("a b") == "ab"
+    assert Echo().generate("") is None
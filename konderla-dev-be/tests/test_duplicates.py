@@ -0,0 +1,113 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+import duplicates
+from bench_duplicates import synthetic_names
+
+
+def find_duplicates_naive(names):
+    """Referenční porovnání všech dvojic – výsledek blockingu se s ním musí shodovat."""
+    result = []
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            name1, name2 = names[i], names[j]
+            if name1 == name2:
+                continue
+            if name1.lower() == name2.lower():
+                result.append(duplicates._match_data(name1, name2, "case_insensitive", 1.0))
+                continue
+            ratio = SequenceMatcher(None, name1.lower(), name2.lower()).ratio()
+            if ratio > duplicates.FUZZY_THRESHOLD:
+                result.append(duplicates._match_data(name1, name2, "fuzzy", ratio))
+    return result
+
+
+def item_names(n, seed):
+    # Syntetické názvy položek a k části z nich varianta s překlepem nebo jinou velikostí písmen
+    rnd = random.Random(seed)
+    names = set(synthetic_names(n // 2, seed=seed))
+    for name in sorted(names):
+        roll = rnd.random()
+        if roll < 0.2:
+            names.add(name.swapcase())
+        elif roll < 0.6:
+            pos = rnd.randrange(len(name))
+            names.add(name[:pos] + rnd.choice("aeiouy ") + name[pos + 1:])
+    return sorted(names)
+
+
+def short_names(n, seed):
+    # Krátké řetězce z malé abecedy: hodně dvojic těsně kolem prahu
+    rnd = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        name = "".join(rnd.choice("aAbBc ") for _ in range(rnd.randint(1, 12)))
+        names.add(name)
+    return sorted(names)
+
+
+def _pairs(matches):
+    return {(m["item_a_name"], m["item_b_name"], m["match_type"], m["similarity"]) for m in matches}
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_blocked_detection_matches_naive_on_item_names(seed):
+    names = item_names(200, seed)
+    expected = find_duplicates_naive(names)
+    assert {m["match_type"] for m in expected} == {"fuzzy", "case_insensitive"}
+    assert duplicates.find_duplicates(names) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_blocked_detection_matches_naive_on_short_names(seed):
+    names = short_names(200, seed)
+    assert duplicates.find_duplicates(names) == find_duplicates_naive(names)
+
+
+def test_unsorted_names_with_exact_repeats():
+    names = ["Beton C 25/30", "beton c 25/30", "Beton C 25/30", "Beton C 30/37", "BETON C 25/30", "Výztuž"]
+    assert duplicates.find_duplicates(names) == find_duplicates_naive(names)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_detection_completes_full_result(seed):
+    names = item_names(160, seed)
+    rnd = random.Random(seed)
+    existing = rnd.sample(names, len(names) // 2)
+    new = [name for name in names if name not in existing]
+    signatures = {name.lower(): duplicates.name_signature(name) for name in existing}
+
+    combined = duplicates.find_duplicates(sorted(existing)) + duplicates.find_new_duplicates(existing, new, signatures)
+    expected = find_duplicates_naive(names)
+    assert len(combined) == len(expected)
+    assert _pairs(combined) == _pairs(expected)
+    assert duplicates.find_new_duplicates(existing, existing) == []
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    # Pool i pro malá kola a víc dávek; sleduje, že výsledky opravdu přišly z poolu
+    monkeypatch.setattr(duplicates, "_PARALLEL_MIN_NAMES", 10)
+    monkeypatch.setattr(duplicates, "_PARALLEL_MIN_PAIRS", 10)
+    monkeypatch.setattr(duplicates, "_CHUNK_SIZE", 50)
+    pooled = []
+    run_chunks = duplicates._run_chunks
+
+    def spy(fn, chunks, deadline, workers):
+        results, complete = run_chunks(fn, chunks, deadline, workers)
+        pooled.append((fn.__name__, len(chunks), results is not None))
+        return results, complete
+
+    monkeypatch.setattr(duplicates, "_run_chunks", spy)
+    yield pooled
+    duplicates._pool.reset()
+
+
+def test_parallel_detection_matches_naive(parallel):
+    names = item_names(200, 5) + short_names(100, 5)
+    matches, complete = duplicates.detect_matches(names, workers=2)
+    assert complete
+    assert matches == find_duplicates_naive(names)
+    assert {fn for fn, chunks, ok in parallel if ok and chunks > 1} == {"_probe_chunk", "_score_chunk"}
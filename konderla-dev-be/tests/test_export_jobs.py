@@ -0,0 +1,188 @@
+import os
+import tempfile
+import threading
+from uuid import UUID
+
+import pytest
+
+import chart_cache
+import export_jobs
+import pdf_export
+from database import SessionLocal
+
+ITEMS = [
+    {"number": "1", "name": "Beton", "price": 100.0},
+    {"number": "2", "name": "Výztuž", "price": 50.0},
+]
+
+
+@pytest.fixture
+def exports(tmp_path, monkeypatch):
+    # Exporty i grafy do adresářů testu; grafy se kreslí v aktuálním procesu a bez cache
+    monkeypatch.setattr(export_jobs, "ROUND_CACHE_DIR", str(tmp_path / "rounds"))
+    monkeypatch.setattr(chart_cache, "cache", chart_cache.ChartCache(str(tmp_path / "charts"), max_bytes=0))
+    monkeypatch.setattr(pdf_export, "PDF_CHART_WORKERS", 0)
+    return tmp_path / "rounds"
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Počítá skutečná generování PDF (ne čtení z cache)."""
+    calls = []
+    generate = pdf_export.generate_pdf_export
+
+    def counting(round_id, db, output_path, chart_backend=None):
+        calls.append(round_id)
+        return generate(round_id, db, output_path, chart_backend=chart_backend)
+
+    monkeypatch.setattr(pdf_export, "generate_pdf_export", counting)
+    return calls
+
+
+def _stored(exports):
+    return sorted(os.listdir(exports)) if exports.exists() else []
+
+
+def _is_pdf(path):
+    with open(path, "rb") as f:
+        return f.read(5) == b"%PDF-"
+
+
+def test_concurrent_exports_use_isolated_workspaces(tmp_path, exports, make_budget, round_id, monkeypatch):
+    make_budget(ITEMS, name="Firma A")
+    make_budget([{"name": "Omítka", "price": 30.0}, *ITEMS], name="Firma B")
+    workspaces = tmp_path / "tmp"
+    workspaces.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(workspaces))
+    errors = []
+
+    def export(idx):
+        db = SessionLocal()
+        try:
+            pdf_export.generate_pdf_export(UUID(round_id), db, str(tmp_path / f"export_{idx}.pdf"), chart_backend="raster")
+        except Exception as e:  # pragma: no cover - hlášeno assertem níže
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=export, args=(idx,)) for idx in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert all(_is_pdf(tmp_path / f"export_{idx}.pdf") for idx in range(3))
+    assert os.listdir(workspaces) == []  # pracovní adresáře exportů se po sestavení smažou
+
+
+def test_round_pdf_is_cached_per_revision(client, exports, builds, make_budget, round_id):
+    budget = make_budget(ITEMS)
+    url = f"/rounds/{round_id}/export-pdf?charts=vector"
+    first = client.get(url)
+    assert first.status_code == 200 and first.content.startswith(b"%PDF-")
+    assert client.get(url).content == first.content
+    assert len(builds) == 1
+    [stored] = _stored(exports)
+    assert f"_v{export_jobs.EXPORT_FORMAT_VERSION}_" in stored and stored.endswith("_vector.pdf")
+
+    # Změna kola = nová revize; starší PDF se po uložení novějšího smaže
+    client.put(f"/budgets/{budget['id']}", json={"name": "Firma (opraveno)"}).raise_for_status()
+    assert client.get(url).status_code == 200
+    assert len(builds) == 2
+    [newer] = _stored(exports)
+    assert newer != stored
+
+    # Jiný typ grafů je samostatný export
+    assert client.get(f"/rounds/{round_id}/export-pdf?charts=raster").status_code == 200
+    assert len(_stored(exports)) == 2
+
+
+def test_remove_older_revisions_keeps_newer(exports, round_id):
+    exports.mkdir()
+    version = export_jobs.EXPORT_FORMAT_VERSION
+    names = [f"round_{round_id}_v{version}_r{r}_p{p}_vector.pdf" for r, p in [(1, 1), (2, 1), (3, 2), (4, 1)]]
+    names.append(f"round_{round_id}_v{version - 1}_r9_p9_vector.pdf")
+    names.append(f"round_{round_id}_v{version}_r1_p1_raster.pdf")
+    for name in names:
+        (exports / name).write_bytes(b"%PDF-")
+    export_jobs._remove_older_revisions(UUID(round_id), "vector", stored=str(exports / names[1]))
+    assert _stored(exports) == sorted([names[1], names[2], names[3], names[5]])
+
+
+def test_export_job_flow(client, exports, builds, make_budget, round_id):
+    make_budget(ITEMS)
+    created = client.post(f"/rounds/{round_id}/export-pdf/jobs", params={"charts": "vector"})
+    assert created.status_code == 202
+    job = created.json()
+    assert (job["status"], job["download_url"]) == (export_jobs.STATUS_QUEUED, None)
+
+    # TestClient spustí background task ještě před návratem z requestu
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == export_jobs.STATUS_DONE and status["cached"] is False
+    download = client.get(status["download_url"])
+    assert download.status_code == 200 and download.content.startswith(b"%PDF-")
+
+    again = client.post(f"/rounds/{round_id}/export-pdf/jobs", params={"charts": "vector"}).json()
+    assert (again["status"], again["cached"]) == (export_jobs.STATUS_DONE, True)
+    assert len(builds) == 1
+
+    [stored] = _stored(exports)
+    os.remove(exports / stored)
+    assert client.get(status["download_url"]).status_code == 410
+
+
+def test_export_job_errors(client, exports, make_budget, round_id, monkeypatch):
+    assert client.get("/export-jobs/neexistuje").status_code == 404
+    assert client.get("/export-jobs/neexistuje/download").status_code == 404
+    assert client.post("/rounds/00000000-0000-0000-0000-000000000000/export-pdf/jobs").status_code == 404
+    assert client.post(f"/rounds/{round_id}/export-pdf/jobs", params={"charts": "svg"}).status_code == 400
+
+    db = SessionLocal()
+    try:
+        queued = export_jobs.create_round_job(db, UUID(round_id), "vector")
+    finally:
+        db.close()
+    assert client.get(f"/export-jobs/{queued.id}/download").status_code == 409
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("export selhal")
+
+    monkeypatch.setattr(pdf_export, "generate_pdf_export", broken)
+    job = client.post(f"/rounds/{round_id}/export-pdf/jobs", params={"charts": "vector"}).json()
+    status = client.get(job["status_url"]).json()
+    assert (status["status"], status["error"]) == (export_jobs.STATUS_FAILED, "export selhal")
+    assert client.get(f"/export-jobs/{job['id']}/download").status_code == 500
+
+
+def test_failed_build_releases_lock_and_temp_file(exports, round_id, monkeypatch):
+    def broken(round_id, db, output_path, chart_backend=None):
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-")
+        raise RuntimeError("export selhal")
+
+    monkeypatch.setattr(pdf_export, "generate_pdf_export", broken)
+    db = SessionLocal()
+    try:
+        with pytest.raises(RuntimeError):
+            export_jobs.get_or_build_round_pdf(db, UUID(round_id), "vector")
+    finally:
+        db.close()
+    assert export_jobs._build_locks == {}
+    assert _stored(exports) == []
+
+
+def test_deleting_round_or_project_removes_its_exports(client, exports, make_budget, project, round_id):
+    make_budget(ITEMS)
+    other_round = client.post("/rounds/", json={"name": "2. kolo", "order": 2, "project_id": project}).json()["id"]
+    make_budget(ITEMS, target_round_id=other_round)
+    for target in (round_id, other_round):
+        assert client.get(f"/rounds/{target}/export-pdf?charts=vector").status_code == 200
+    assert len(_stored(exports)) == 2
+
+    client.delete(f"/rounds/{round_id}").raise_for_status()
+    assert [name for name in _stored(exports) if round_id in name] == []
+    assert len(_stored(exports)) == 1
+
+    client.delete(f"/projects/{project}").raise_for_status()
+    assert _stored(exports) == []
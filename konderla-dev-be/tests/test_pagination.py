@@ -0,0 +1,61 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+import models
+import pagination
+
+BUDGET_KEY = [models.Budget.created_at, models.Budget.id]
+
+
+def test_cursor_round_trip_restores_column_types():
+    created_at, budget_id = datetime(2025, 3, 1, 12, 30, tzinfo=timezone.utc), uuid4()
+    cursor = pagination.encode_cursor([created_at.isoformat(), budget_id])
+    assert pagination.decode_cursor(cursor, BUDGET_KEY) == [created_at, budget_id]
+
+
+@pytest.mark.parametrize("cursor", ["není base64!", pagination.encode_cursor([1]), pagination.encode_cursor({"a": 1})])
+def test_decode_cursor_rejects_invalid(cursor):
+    with pytest.raises(pagination.InvalidCursor):
+        pagination.decode_cursor(cursor, BUDGET_KEY)
+
+
+def _walk(client, url, limit):
+    """Projde všechny stránky přes X-Next-Cursor; vrací (id v pořadí, počet stránek)."""
+    ids, pages, cursor = [], 0, None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= limit
+        ids += [row["id"] for row in page]
+        pages += 1
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return ids, pages
+
+
+def test_budget_pages_cover_round_exactly_once(client, make_budget, round_id):
+    created = [make_budget([{"name": f"Položka {idx}", "price": idx}], name=f"Firma {idx}")["id"] for idx in range(5)]
+    ids, pages = _walk(client, f"/rounds/{round_id}/budgets/", limit=2)
+    assert pages == 3
+    assert ids == created
+    unpaged = [row["id"] for row in client.get(f"/rounds/{round_id}/budgets/").json()]
+    assert unpaged == created
+
+
+def test_round_pages_follow_order(client, project):
+    created = [
+        client.post("/rounds/", json={"name": f"{idx}. kolo", "order": idx, "project_id": project}).json()["id"]
+        for idx in range(1, 4)
+    ]
+    ids, pages = _walk(client, f"/projects/{project}/rounds/", limit=1)
+    assert ids == created
+    assert pages == 3
+
+
+def test_invalid_cursor_is_400(client, round_id):
+    response = client.get(f"/rounds/{round_id}/budgets/", params={"limit": 2, "cursor": "xyz"})
+    assert response.status_code == 400
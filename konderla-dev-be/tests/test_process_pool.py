@@ -0,0 +1,17 @@
+import process_pool
+
+
+def test_spawn_pool_is_reused_until_workers_change_or_reset():
+    pool = process_pool.SpawnPool()
+    try:
+        first = pool.get(2)
+        assert pool.get(2) is first
+        assert first._mp_context.get_start_method() == "spawn"
+        assert first.submit(pow, 2, 10).result(timeout=60) == 1024
+
+        resized = pool.get(3)
+        assert resized is not first
+        pool.reset()
+        assert pool.get(3) is not resized
+    finally:
+        pool.reset()
@@ -0,0 +1,69 @@
+from uuid import UUID, uuid4
+
+import pytest
+
+import crud
+import models
+from database import SessionLocal
+
+
+@pytest.fixture
+def db(app_main):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _child(db, parent, name, items):
+    # Podrozpočty vznikají při nahrání Excelu; API pro jejich založení není
+    child = models.Budget(round_id=parent.round_id, project_id=parent.project_id, parent_budget_id=parent.id,
+                          name=name, items=items, labels={"type": "type2"})
+    db.add(child)
+    db.commit()
+    return child
+
+
+def _promote(client, project, round_id, budget_ids, name="2. kolo"):
+    return client.post("/promote/", json={"project_id": project, "current_round_id": round_id,
+                                          "budget_ids": budget_ids, "new_round_name": name})
+
+
+def test_promote_copies_selected_budget_trees(client, db, make_budget, project, round_id):
+    items = [{"number": "1", "name": "Beton", "price": 100.0}]
+    kept = make_budget(items, name="Firma A", labels={"type": "type2", "total_price": 100.0})
+    make_budget(items, name="Firma B")
+    kept_row = db.get(models.Budget, UUID(kept["id"]))
+    child = _child(db, kept_row, "SO 01", [{"name": "Výkop", "price": 40.0}])
+    grandchild = _child(db, child, "SO 01.1", [{"name": "Odvoz", "price": 10.0}])
+
+    response = _promote(client, project, round_id, [kept["id"]])
+    assert response.status_code == 200
+    new_round = response.json()
+    assert (new_round["name"], new_round["order"], new_round["project_id"]) == ("2. kolo", 2, project)
+
+    copies = {b.name: b for b in crud.get_budgets_by_round(db, UUID(new_round["id"]))}
+    assert set(copies) == {"Firma A", "SO 01", "SO 01.1"}
+    assert copies["Firma A"].parent_budget_id == kept_row.id  # návaznost na originál z minulého kola
+    assert copies["SO 01"].parent_budget_id == copies["Firma A"].id
+    assert copies["SO 01.1"].parent_budget_id == copies["SO 01"].id
+    assert copies["Firma A"].labels["total_price"] == 100.0
+    assert copies["SO 01.1"].items == grandchild.items
+    assert {b.id for b in copies.values()}.isdisjoint({kept_row.id, child.id, grandchild.id})
+    assert len(crud.get_budgets_by_round(db, UUID(round_id))) == 4  # originály zůstaly
+
+
+def test_promote_without_budgets_creates_empty_round(client, db, project, round_id):
+    response = _promote(client, project, round_id, [])
+    assert response.status_code == 200
+    assert crud.get_budgets_by_round(db, UUID(response.json()["id"])) == []
+
+
+def test_promote_ignores_budgets_from_other_rounds(client, db, make_budget, project, round_id):
+    other_round = client.post("/rounds/", json={"name": "Jiné", "order": 5, "project_id": project}).json()["id"]
+    foreign = make_budget([], name="Cizí", target_round_id=other_round)
+    response = _promote(client, project, round_id, [foreign["id"]])
+    assert crud.get_budgets_by_round(db, UUID(response.json()["id"])) == []
+
+
+def test_promote_unknown_round_is_400(client, project):
+    assert _promote(client, project, str(uuid4()), []).status_code == 400
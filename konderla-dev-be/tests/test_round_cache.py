@@ -0,0 +1,104 @@
+from uuid import UUID
+
+import crud
+from database import SessionLocal
+from round_cache import RevisionCache, cache as round_cache
+
+
+def test_get_set_counts_hits_and_misses():
+    cache = RevisionCache(max_bytes=1000)
+    key = cache.make_key("matrix", "kolo", 1)
+    assert cache.get(key) is None
+    cache.set(key, b"x" * 10)
+    assert cache.get(key) == b"x" * 10
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes"]) == (1, 1, 10)
+    assert stats["views"] == {"matrix": {"entries": 1, "bytes": 10}}
+
+
+def test_eviction_keeps_bytes_under_cap_and_drops_least_recently_used():
+    cache = RevisionCache(max_bytes=300, max_entry_bytes=300)
+    for idx in range(3):
+        cache.set(cache.make_key("budgets", "kolo", idx), b"x" * 100)
+    cache.get(cache.make_key("budgets", "kolo", 0))  # 0 je teď nejnověji použitý
+    cache.set(cache.make_key("budgets", "kolo", 3), b"x" * 100)
+
+    assert cache.get(cache.make_key("budgets", "kolo", 1)) is None
+    for idx in (0, 2, 3):
+        assert cache.get(cache.make_key("budgets", "kolo", idx)) is not None
+    stats = cache.stats()
+    assert stats["bytes"] == 300 and stats["evictions"] == 1
+
+    for idx in range(4, 50):
+        cache.set(cache.make_key("budgets", "kolo", idx), b"x" * (idx % 7 * 20 + 1))
+        assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_oversized_entry_is_rejected_without_evicting():
+    cache = RevisionCache(max_bytes=400)  # max_entry_bytes = 100
+    cache.set(cache.make_key("matrix", "kolo", 1), b"x" * 50)
+    cache.set(cache.make_key("matrix", "kolo", 2), b"x" * 101)
+    stats = cache.stats()
+    assert (stats["entries"], stats["rejected"], stats["evictions"]) == (1, 1, 0)
+
+
+def test_replacing_entry_recounts_size():
+    cache = RevisionCache(max_bytes=1000)
+    key = cache.make_key("matrix", "kolo", 1)
+    cache.set(key, b"x" * 100)
+    cache.set(key, b"x" * 40)
+    assert cache.stats()["bytes"] == 40
+
+
+def test_get_or_compute_does_not_cache_none():
+    cache = RevisionCache(max_bytes=1000)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_compute("matrix", "kolo", 1, compute) is None
+    assert cache.get_or_compute("matrix", "kolo", 1, compute) is None
+    assert len(calls) == 2
+    assert cache.get_or_compute("matrix", "kolo", 1, lambda: {"rows": []}) == {"rows": []}
+    assert cache.get_or_compute("matrix", "kolo", 1, compute) == {"rows": []}
+
+
+def test_invalidate_scope_drops_every_view_and_revision():
+    cache = RevisionCache(max_bytes=1000)
+    cache.set(cache.make_key("matrix", "kolo A", 1), b"a")
+    cache.set(cache.make_key("budgets", "kolo A", 2, None, 50), b"b")
+    cache.set(cache.make_key("matrix", "kolo B", 1), b"c")
+    assert cache.invalidate_scope("kolo A") == 2
+    assert cache.get(cache.make_key("matrix", "kolo B", 1)) == b"c"
+    assert cache.stats()["bytes"] == 1
+
+
+def test_touch_round_bumps_revisions_and_invalidates_round_and_project(app_main, project, round_id):
+    round_uuid, project_uuid = UUID(round_id), UUID(project)
+    round_cache.set(round_cache.make_key("matrix", round_uuid, 0), b"matice")
+    round_cache.set(round_cache.make_key("chat_context", project_uuid, 0), b"kontext")
+    db = SessionLocal()
+    try:
+        before = crud.get_round_export_revisions(db, round_uuid)
+        crud.touch_round(db, round_uuid)
+        db.commit()
+        after = crud.get_round_export_revisions(db, round_uuid)
+    finally:
+        db.close()
+    assert after == (before[0] + 1, before[1] + 1)
+    assert round_cache.get(round_cache.make_key("matrix", round_uuid, 0)) is None
+    assert round_cache.get(round_cache.make_key("chat_context", project_uuid, 0)) is None
+
+
+def test_cached_budget_list_reflects_updates(client, make_budget, round_id):
+    budget = make_budget([{"name": "Beton", "price": 1}], name="Firma")
+    url = f"/rounds/{round_id}/budgets/"
+    assert [b["name"] for b in client.get(url).json()] == ["Firma"]
+    hits = round_cache.stats()["hits"]
+    assert [b["name"] for b in client.get(url).json()] == ["Firma"]
+    assert round_cache.stats()["hits"] == hits + 1
+
+    client.put(f"/budgets/{budget['id']}", json={"name": "Firma s.r.o."}).raise_for_status()
+    assert [b["name"] for b in client.get(url).json()] == ["Firma s.r.o."]
@@ -0,0 +1,87 @@
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+import round_matrix
+
+
+def _matrix(prices_by_item):
+    n_budgets = len(next(iter(prices_by_item.values())))
+    return {
+        "budgets": [{"id": idx, "name": f"Firma {idx}"} for idx in range(n_budgets)],
+        "rows": [{"name": name, "number": str(idx + 1), "prices": prices}
+                 for idx, (name, prices) in enumerate(prices_by_item.items())],
+    }
+
+
+def _stats(prices_by_item, **kwargs):
+    return {item["name"]: item for item in round_matrix.compute_item_statistics(_matrix(prices_by_item), **kwargs)["items"]}
+
+
+def test_item_statistics_min_max_median_and_deviations():
+    item = _stats({"Beton": [100.0, 120.0, 110.0, 1000.0]})["Beton"]
+    assert (item["count"], item["min"], item["max"], item["median"]) == (4, 100.0, 1000.0, 115.0)
+    assert item["spread"] == 900.0
+    assert item["spread_pct"] == pytest.approx(900.0 / 115.0 * 100.0)
+    assert item["deviations"] == [-15.0, 5.0, -5.0, 885.0]
+    assert item["deviations_pct"] == pytest.approx([d / 115.0 * 100.0 for d in item["deviations"]])
+    # Q1 = 107.5, Q3 = 340, IQR = 232.5 → horní hranice 688.75
+    assert item["outliers"] == [False, False, False, True]
+
+
+def test_unpriced_cells_are_left_out():
+    stats = _stats({"Beton": [0.0, 100.0, 200.0], "Nenaceněno": [0.0, 0.0, 0.0]})
+    beton = stats["Beton"]
+    assert (beton["count"], beton["median"]) == (2, 150.0)
+    assert beton["deviations"] == [None, -50.0, 50.0]
+    # Méně než tři nacenění – o odlehlosti se nerozhoduje
+    assert beton["outliers"] == [False, False, False]
+
+    empty = stats["Nenaceněno"]
+    assert (empty["count"], empty["median"], empty["spread"]) == (0, None, None)
+    assert empty["deviations"] == [None, None, None]
+
+
+def test_outlier_factor_controls_flags():
+    prices = {"Beton": [100.0, 110.0, 120.0, 130.0, 190.0]}
+    assert _stats(prices)["Beton"]["outliers"][-1] is True
+    assert _stats(prices, outlier_factor=3.0)["Beton"]["outliers"][-1] is False
+
+
+def test_empty_matrix():
+    assert round_matrix.compute_item_statistics({"budgets": [], "rows": []}) == {"budgets": [], "items": []}
+
+
+def test_statistics_match_reference_on_random_prices():
+    rnd = random.Random(7)
+    prices = {
+        f"Položka {idx}": [rnd.choice([0.0, round(rnd.uniform(1, 5000), 2)]) for _ in range(6)]
+        for idx in range(200)
+    }
+    stats = _stats(prices)
+    for name, row in prices.items():
+        valid = [p for p in row if p > 0]
+        item = stats[name]
+        assert item["count"] == len(valid)
+        if not valid:
+            assert item["median"] is None
+            continue
+        assert item["min"] == min(valid) and item["max"] == max(valid)
+        assert item["median"] == pytest.approx(statistics.median(valid))
+        q1, q3 = np.percentile(valid, [25, 75])
+        bounds = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+        expected = [p > 0 and len(valid) >= 3 and not bounds[0] <= p <= bounds[1] for p in row]
+        assert item["outliers"] == expected
+
+
+def test_item_stats_endpoint(client, make_budget, round_id):
+    for idx, price in enumerate([100.0, 120.0, 110.0, 1000.0]):
+        make_budget([{"number": "1", "name": "Beton", "price": price}], name=f"Firma {idx}")
+    response = client.get(f"/rounds/{round_id}/item-stats")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["round_id"] == round_id
+    [item] = body["items"]
+    assert (item["median"], item["outliers"]) == (115.0, [False, False, False, True])
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+ITEMS = [
+    {"number": "1", "name": "Beton", "price": 100.0},
+    {"number": "2", "name": "Výztuž", "price": 50.0},
+]
+
+
+def _without_catalog_id(item):
+    return {key: value for key, value in item.items() if key != "catalog_id"}
+
+
+def _ndjson(client, round_id):
+    response = client.get(f"/rounds/{round_id}/export.ndjson")
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize("stored", [
+    ITEMS,
+    {"list": ITEMS},
+    json.dumps(ITEMS),
+    [json.dumps(item) for item in ITEMS],
+], ids=["list", "list_wrapper", "double_serialized", "string_items"])
+def test_ndjson_export_streams_items_of_every_stored_shape(client, make_budget, round_id, stored):
+    budget = make_budget(stored)
+    lines = _ndjson(client, round_id)
+    assert lines[0]["type"] == "budget" and lines[0]["id"] == budget["id"]
+    assert lines[0]["item_count"] == 2
+    assert [(line["position"], _without_catalog_id(line["item"])) for line in lines[1:]] == list(enumerate(ITEMS))
+
+
+def test_matrix_etag_returns_304_until_round_changes(client, make_budget, round_id):
+    budget = make_budget(ITEMS)
+    first = client.get(f"/rounds/{round_id}/matrix")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get(f"/rounds/{round_id}/matrix", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+    assert client.get(f"/rounds/{round_id}/matrix", headers={"If-None-Match": f'"jiny", W/{etag}'}).status_code == 304
+
+    client.put(f"/budgets/{budget['id']}", json={"name": "Firma (opraveno)"}).raise_for_status()
+    changed = client.get(f"/rounds/{round_id}/matrix", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_matrix_of_missing_round_is_404(client, app_main):
+    assert client.get("/rounds/00000000-0000-0000-0000-000000000000/matrix").status_code == 404